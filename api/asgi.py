@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "api.settings")
 
 application = get_asgi_application()
+
+# Unlike runserver, uvicorn serves no files: in DEBUG the static files of the
+# admin and the browsable API come from here, media from the static() route
+# in api/urls.py.
+if settings.DEBUG:
+    application = ASGIStaticFilesHandler(application)
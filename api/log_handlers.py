@@ -0,0 +1,162 @@
+"""Logging handlers that keep disk I/O out of the request thread.
+
+A BackgroundHandler only puts the record on a bounded queue; a
+QueueListener thread formats it and hands it to the real handler, which
+may then rotate and gzip its file without the request waiting.
+"""
+
+import copy
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+from datetime import datetime, timezone
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
+from pathlib import Path
+
+# attributes every LogRecord has, anything else was passed in ``extra``
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, with the ``extra`` fields included."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES and name not in entry:
+                entry[name] = value
+        return json.dumps(entry, default=str)
+
+
+def gzip_rotator(source, dest):
+    with open(source, "rb") as source_file, gzip.open(dest, "wb") as dest_file:
+        shutil.copyfileobj(source_file, dest_file)
+    os.remove(source)
+
+
+def rotating_file_handler(
+    filename, max_bytes=0, backup_count=0, when=None, interval=1, compress=True
+) -> logging.Handler:
+    """A file handler rotating at ``when`` if given, else at ``max_bytes``."""
+    Path(filename).parent.mkdir(parents=True, exist_ok=True)
+    if when:
+        handler = TimedRotatingFileHandler(
+            filename,
+            when=when,
+            interval=interval,
+            backupCount=backup_count,
+            encoding="utf-8",
+            delay=True,
+            utc=True,
+        )
+    else:
+        handler = RotatingFileHandler(
+            filename,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+            delay=True,
+        )
+    if compress:
+        handler.namer = lambda name: name + ".gz"
+        handler.rotator = gzip_rotator
+    return handler
+
+
+class BackgroundHandler(QueueHandler):
+    """Hand records to ``target`` on a listener thread.
+
+    The queue holds at most ``queue_size`` records. When the writer falls
+    that far behind, new records are dropped and counted in ``dropped``
+    rather than making the caller wait. The formatter set on this handler
+    is applied by the listener thread.
+    """
+
+    def __init__(self, target, queue_size=10_000):
+        super().__init__(queue.Queue(queue_size))
+        self.target = target
+        self.dropped = 0
+        self.closed = False
+        self.listener = QueueListener(self.queue, target)
+        self.listener.start()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # what QueueHandler.prepare() keeps, minus the formatting
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.stack_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Wait until the listener has written every queued record."""
+        if not self.closed:
+            self.queue.join()
+        self.target.flush()
+
+    def close(self):
+        if not self.closed:
+            self.flush()
+            self.closed = True
+            self.listener.stop()
+            self.target.close()
+        super().close()
+
+
+class BackgroundFileHandler(BackgroundHandler):
+    """BackgroundHandler writing to a rotating, gzip-compressing file."""
+
+    def __init__(
+        self,
+        filename,
+        max_bytes=0,
+        backup_count=0,
+        when=None,
+        interval=1,
+        compress=True,
+        queue_size=10_000,
+    ):
+        super().__init__(
+            rotating_file_handler(
+                filename, max_bytes, backup_count, when, interval, compress
+            ),
+            queue_size,
+        )
+
+
+class BackgroundStreamHandler(BackgroundHandler):
+    """BackgroundHandler writing to ``stream``, stderr by default."""
+
+    def __init__(self, stream=None, queue_size=10_000):
+        super().__init__(logging.StreamHandler(stream), queue_size)
@@ -12,7 +12,9 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 import os
 import sys
+import tempfile
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 from decouple import config
 
@@ -29,6 +31,8 @@ SECRET_KEY = config("SECRET")
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+TESTING = "test" in sys.argv
+
 ALLOWED_HOSTS = [
     # setting for tg_bot
     "127.0.0.1",
@@ -59,18 +63,23 @@ AUTH_USER_MODEL = "user.User"
 
 
 MIDDLEWARE = [
+    "planetarium.timing.ServerTimingMiddleware",
+    "planetarium.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
-    "planetarium.c_middleware.LogFailedLoginAttemptsMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
+# clients allowed to scrape /metrics
+METRICS_ALLOWED_IPS = config(
+    "METRICS_ALLOWED_IPS", default="127.0.0.1", cast=lambda value: value.split(",")
+)
 
 ROOT_URLCONF = "api.urls"
 
@@ -96,10 +105,24 @@ WSGI_APPLICATION = "api.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# SQLite production profile: seconds a writer waits for the database lock,
+# per-connection pragmas (planetarium/sqlite.py) and in-process queueing of
+# booking transactions
+SQLITE_BUSY_TIMEOUT = config("SQLITE_BUSY_TIMEOUT", default=20, cast=int)
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # KiB
+}
+SQLITE_SERIALIZE_WRITES = config("SQLITE_SERIALIZE_WRITES", default=True, cast=bool)
+SQLITE_WRITE_LOCK_TIMEOUT = SQLITE_BUSY_TIMEOUT
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {"timeout": SQLITE_BUSY_TIMEOUT},
     }
 }
 # DATABASES = {
@@ -165,35 +188,132 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_PAGINATION_CLASS": "planetarium.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
+    "DEFAULT_RENDERER_CLASSES": [
+        "planetarium.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "rest_framework.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
+# application/msgpack for machine clients, when msgpack is installed
+if find_spec("msgpack"):
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].append(
+        "planetarium.renderers.MessagePackRenderer"
+    )
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"].append(
+        "planetarium.renderers.MessagePackParser"
+    )
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
 }
 
+# How long seats stay reserved for a customer during checkout
+SEAT_HOLD_TTL = timedelta(minutes=10)
+
+# The model versions must be shared by every worker and management command,
+# or their writes do not invalidate the cached responses and ETags of the
+# others. The file cache covers the processes of one host; use a memcached
+# or redis backend for "versions" when the API runs on several.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "planetarium",
+    },
+    "versions": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": config(
+            "PLANETARIUM_VERSION_CACHE_DIR",
+            default=str(BASE_DIR / ".cache" / "versions"),
+        ),
+    },
+}
+
+# Shared with tele_bot.py, which reads reservations by telegram_username
+# with it in the X-Service-Token header. Empty disables that access.
+TELEGRAM_SERVICE_TOKEN = config("TG_SERVICE_TOKEN", default="")
+
+# Read-through cache of catalog responses, see planetarium/cache.py
+PLANETARIUM_VERSION_CACHE_ALIAS = "versions"
+PLANETARIUM_RESPONSE_CACHE_TIMEOUT = 60
+PLANETARIUM_RESPONSE_CACHE_LOCK_TIMEOUT = 5
+
+# Failed login tracking, see user/login_attempts.py: LOGIN_FAILURE_LIMIT
+# failures within the window lock the account or client address out for
+# LOGIN_LOCKOUT_BASE seconds, doubling with every further failure. Set
+# LOGIN_FAILURE_CACHE_ALIAS to share the counters between processes.
+LOGIN_FAILURE_WINDOW = 15 * 60
+LOGIN_FAILURE_LIMIT = 5
+LOGIN_LOCKOUT_BASE = 30
+LOGIN_LOCKOUT_MAX = 15 * 60
+LOGIN_FAILURE_MAX_KEYS = 10_000
+LOGIN_FAILURE_CACHE_ALIAS = None
+
+# Sampled profiling, see planetarium/profiling.py and `manage.py profile_report`.
+# WSGI-only: requests served by api.asgi are not profiled.
+# One request in PROFILING_SAMPLE_RATE is profiled (0 for none), plus every
+# request to the URL names in PROFILING_ROUTES, and every request from
+# INTERNAL_IPS carrying PROFILING_HEADER ("cpu" or "memory"). URL names in
+# PROFILING_MEMORY_ROUTES are traced with tracemalloc instead of cProfile.
+PROFILING_ENABLED = config("PROFILING_ENABLED", default=False, cast=bool)
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default=0, cast=int)
+PROFILING_ROUTES = []
+PROFILING_MEMORY_ROUTES = []
+PROFILING_HEADER = "X-Profile"
+PROFILING_DIR = config("PROFILING_DIR", default=str(BASE_DIR / "profiles"))
+PROFILING_MAX_FILES = 500
+
+# Log files are written by background threads, see api/log_handlers.py.
+# They rotate every LOG_ROTATE_WHEN (e.g. "midnight") when it is set, at
+# LOG_MAX_BYTES otherwise, and rotated files are gzipped. Test runs log to
+# the temporary directory instead of the repository.
+LOG_DIR = (
+    Path(tempfile.gettempdir()) / "planetarium-test-logs"
+    if TESTING
+    else BASE_DIR / "logs"
+)
+LOG_ROTATE_WHEN = config("LOG_ROTATE_WHEN", default="")
+LOG_MAX_BYTES = config("LOG_MAX_BYTES", default=10 * 1024 * 1024, cast=int)
+LOG_BACKUP_COUNT = config("LOG_BACKUP_COUNT", default=10, cast=int)
+LOG_ROTATION = {
+    "class": "api.log_handlers.BackgroundFileHandler",
+    "formatter": "json",
+    "when": LOG_ROTATE_WHEN,
+    "max_bytes": LOG_MAX_BYTES,
+    "backup_count": LOG_BACKUP_COUNT,
+}
 
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "api.log_handlers.JSONFormatter"},
+    },
     "handlers": {
         "file": {
+            **LOG_ROTATION,
             "level": "WARNING",
-            "class": "logging.FileHandler",
-            "filename": "logs/login_failures.log",  # Login Failures
+            "filename": LOG_DIR / "login_failures.log",  # Login Failures
         },
         "error_file": {
+            **LOG_ROTATION,
             "level": "ERROR",
-            "class": "logging.FileHandler",
-            "filename": "logs/server_errors.log",  # Server Errors
+            "filename": LOG_DIR / "server_errors.log",  # Server Errors
         },
         "critical_file": {
+            **LOG_ROTATION,
             "level": "CRITICAL",
-            "class": "logging.FileHandler",
-            "filename": "logs/server_critical.log",  # Critical Errors
+            "filename": LOG_DIR / "server_critical.log",  # Critical Errors
         },
         "console": {
             "level": "DEBUG",
-            "class": "logging.StreamHandler",
+            "class": "api.log_handlers.BackgroundStreamHandler",
         },
     },
     "loggers": {
@@ -207,6 +327,17 @@ LOGGING = {
             "level": "ERROR",
             "propagate": False,
         },
+        # one line per request, at WARNING when over the view's query budget
+        "planetarium.timing": {
+            "handlers": ["console"],
+            "level": config("REQUEST_TIMING_LOG_LEVEL", default="INFO"),
+            "propagate": False,
+        },
+        "user.login_attempts": {
+            "handlers": ["file"],
+            "level": "WARNING",
+            "propagate": False,
+        },
         "django.security": {
             "handlers": ["critical_file", "console"],
             "level": "CRITICAL",
@@ -227,7 +358,14 @@ if not os.environ.get("RUNNING_TESTS"):
     )
 
 
-TESTING = "test" in sys.argv
+if TESTING:
+    LOGGING["loggers"]["planetarium.timing"]["level"] = "ERROR"
+    # the test run is a single process
+    CACHES["versions"] = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "planetarium-versions",
+    }
+    SILENCED_SYSTEM_CHECKS = ["planetarium.W001"]
 
 if not TESTING:
     INSTALLED_APPS += [
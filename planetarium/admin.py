@@ -8,6 +8,7 @@ from .models import (
     ShowSession,
     Reservation,
     Ticket,
+    SeatHold,
 )
 
 
@@ -44,4 +45,10 @@ class TicketAdmin(admin.ModelAdmin):
     list_filter = ["show_session", "reservation"]
 
 
+@admin.register(SeatHold)
+class SeatHoldAdmin(admin.ModelAdmin):
+    list_display = ["show_session", "row", "seat", "user", "expires_at"]
+    list_filter = ["show_session"]
+
+
 admin.site.unregister(Group)
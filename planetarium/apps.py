@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class PlanetariumConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "planetarium"
+
+    def ready(self):
+        from django.core import checks
+        from django.db.backends.signals import connection_created
+
+        from planetarium import signals  # noqa: F401
+        from planetarium.cache import check_version_cache
+        from planetarium.sqlite import apply_pragmas
+        from planetarium.timing import install_query_counter
+
+        connection_created.connect(apply_pragmas, dispatch_uid="sqlite_pragmas")
+        connection_created.connect(
+            install_query_counter, dispatch_uid="request_query_counter"
+        )
+        checks.register(check_version_cache, checks.Tags.caches)
@@ -0,0 +1,136 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import Http404, HttpResponse
+from django.utils.http import http_date
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.exceptions import ValidationError as DRFValidationError
+
+from planetarium.renderers import FastJSONRenderer
+from planetarium.seating import SeatMap, aload_seat_map
+
+CHUNK_SIZE = 2000
+
+
+class AsyncReadView(View):
+    """Async twin of the list or retrieve ``action`` of a DRF ``viewset``.
+
+    The viewset still authenticates, checks permissions and throttles, builds
+    the queryset and the serializer and computes the ETag, so filters and
+    payloads match the sync route. Only the row fetching goes through the
+    async ORM (``aiterator()``/``aget()``), which frees the worker while a
+    slow client or a slow query is pending under ASGI.
+    """
+
+    http_method_names = ["get", "head"]
+    viewset = None
+    action = "list"
+    # extra prefetches for nested serializers, resolved inside the async fetch
+    prefetch = ()
+
+    def get_viewset(self, request, *args, **kwargs):
+        view = self.viewset(action_map={"get": self.action, "head": self.action})
+        view.get = view.head = getattr(view, self.action)
+        view.args, view.kwargs = args, kwargs
+        view.request = view.initialize_request(request, *args, **kwargs)
+        view.headers = view.default_response_headers
+        return view
+
+    async def get(self, request, *args, **kwargs):
+        view = self.get_viewset(request, *args, **kwargs)
+        validators = None
+        try:
+            await sync_to_async(view.initial)(view.request, *args, **kwargs)
+            validators = getattr(view, "validators", None)
+            if validators and view.is_not_modified(view.request, *validators):
+                response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                handler = getattr(self, self.action)
+                response = self.render(await handler(view, *args, **kwargs))
+        except Http404 as exc:
+            response = self.render(
+                {"detail": str(exc) or "Not found."}, status.HTTP_404_NOT_FOUND
+            )
+        except APIException as exc:
+            detail = exc.detail
+            if not isinstance(detail, (list, dict)):
+                detail = {"detail": detail}
+            response = self.render(detail, exc.status_code)
+            if getattr(exc, "wait", None):
+                response["Retry-After"] = "%d" % exc.wait
+
+        if validators and response.status_code in (
+            status.HTTP_200_OK,
+            status.HTTP_304_NOT_MODIFIED,
+        ):
+            etag, last_modified = validators
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            FastJSONRenderer().render(data),
+            content_type="application/json",
+            status=status_code,
+        )
+
+    def get_queryset(self, view):
+        queryset = view.filter_queryset(view.get_queryset())
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch)
+        return queryset
+
+    async def list(self, view, *args, **kwargs):
+        queryset = self.get_queryset(view)
+        paginator = view.paginator
+
+        if getattr(view, "use_fast_list", None) and view.use_fast_list(view.request):
+            serializer = view.fast_list_serializer()
+            queryset = (
+                queryset.select_related(None)
+                .prefetch_related(None)
+                .values(*serializer.values)
+            )
+            serialize = serializer.ato_representation
+        else:
+
+            async def serialize(rows):
+                return view.get_serializer(rows, many=True).data
+
+        if paginator is None:
+            rows = [row async for row in queryset.aiterator(chunk_size=CHUNK_SIZE)]
+            return await serialize(rows)
+        page = await paginator.apaginate_queryset(queryset, view.request, view)
+        return paginator.get_paginated_response(await serialize(page)).data
+
+    async def retrieve(self, view, *args, **kwargs):
+        queryset = self.get_queryset(view)
+        lookup = {view.lookup_field: kwargs[view.lookup_url_kwarg or view.lookup_field]}
+        try:
+            instance = await queryset.aget(**lookup)
+        except (ObjectDoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404(
+                f"No {queryset.model._meta.object_name} matches the given query."
+            )
+        return view.get_serializer(instance).data
+
+
+class AsyncSeatMapView(AsyncReadView):
+    """Async twin of ShowSessionViewSet.seats."""
+
+    action = "seats"
+
+    async def seats(self, view, pk, **kwargs):
+        encoding = view.request.query_params.get("encoding", "bitset")
+        if encoding not in SeatMap.ENCODINGS:
+            raise DRFValidationError(
+                {"encoding": f"Must be one of: {', '.join(SeatMap.ENCODINGS)}"}
+            )
+
+        seat_map = await aload_seat_map(pk)
+        if seat_map is None:
+            raise Http404
+        return seat_map.to_representation(pk, encoding)
@@ -0,0 +1,408 @@
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+
+from planetarium.cache import bump_versions
+from planetarium.metrics import registry
+from planetarium.models import (
+    ShowSession,
+    Reservation,
+    Ticket,
+    SeatHold,
+)
+from planetarium.reports import count_sales
+from planetarium.seating import SeatMap, occupied_seats
+from planetarium.sqlite import serialized_writes
+
+ALLOCATION_ATTEMPTS = 3
+
+
+class SeatsUnavailable(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Some of the requested seats are already taken."
+    default_code = "seats_unavailable"
+
+    def __init__(self, seats):
+        super().__init__()
+        registry.inc("booking_conflicts_total")
+        self.seats = sorted(seats)
+        self.detail = {
+            "detail": self.detail,
+            "taken": [[row, seat] for row, seat in self.seats],
+        }
+
+
+class NoAdjacentSeats(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "No block of adjacent free seats of the requested size."
+    default_code = "no_adjacent_seats"
+
+
+@dataclass
+class Purchase:
+    reservation: Reservation
+    show_session: ShowSession
+    tickets: list
+
+    @property
+    def total_price(self):
+        return self.show_session.planetarium_dome.price_per_seat * len(self.tickets)
+
+
+@dataclass
+class Hold:
+    token: uuid.UUID
+    show_session: ShowSession
+    seats: list
+    expires_at: datetime
+
+
+def count_sold(show_session_id, delta):
+    """Shift the availability counters of a session by ``delta`` sold seats."""
+    ShowSession.objects.filter(pk=show_session_id).update(
+        tickets_sold=F("tickets_sold") + delta,
+        tickets_available=F("tickets_available") - delta,
+        updated_at=timezone.now(),
+    )
+    bump_versions(ShowSession)
+
+
+def count_reserved(reservation_id, delta, amount):
+    """Shift the totals of a reservation by ``delta`` tickets paid ``amount``."""
+    Reservation.objects.filter(pk=reservation_id).update(
+        ticket_count=F("ticket_count") + delta,
+        total_price=F("total_price") + amount,
+    )
+    bump_versions(Reservation)
+
+
+def release_tickets(tickets, deleted):
+    """Take ``tickets`` off the counters before a cascading delete removes them.
+
+    ``deleted`` is the session or reservation the tickets go with, its own
+    counters are left alone. Every other session and reservation is shifted
+    with one UPDATE for all of its tickets, instead of one per ticket.
+    """
+    sessions = defaultdict(lambda: [0, 0])
+    reservations = defaultdict(lambda: [0, 0])
+    for show_session_id, reservation_id, sold, amount in (
+        tickets.order_by()
+        .values("show_session", "reservation")
+        .annotate(sold=Count("id"), amount=Sum("price"))
+        .values_list("show_session", "reservation", "sold", "amount")
+    ):
+        for totals in (sessions[show_session_id], reservations[reservation_id]):
+            totals[0] += sold
+            totals[1] += amount
+    if not sessions:
+        return
+
+    if isinstance(deleted, ShowSession):
+        sold, amount = sessions[deleted.pk]
+        count_sales(deleted, -sold, -amount)
+    else:
+        for show_session in ShowSession.objects.filter(pk__in=sessions):
+            sold, amount = sessions[show_session.pk]
+            count_sold(show_session.pk, -sold)
+            count_sales(show_session, -sold, -amount)
+    if not isinstance(deleted, Reservation):
+        for reservation_id, (sold, amount) in reservations.items():
+            count_reserved(reservation_id, -sold, -amount)
+    bump_versions(Ticket)
+
+
+def recount_ticket_counters() -> int:
+    """Recompute the counters of every session with one GROUP BY over Ticket.
+
+    Returns the number of sessions whose counters were out of date.
+    """
+    sold = dict(
+        Ticket.objects.order_by()
+        .values("show_session")
+        .annotate(sold=Count("id"))
+        .values_list("show_session", "sold")
+    )
+    stale = []
+    now = timezone.now()
+    for session in ShowSession.objects.select_related("planetarium_dome").only(
+        "tickets_sold",
+        "tickets_available",
+        "planetarium_dome__rows",
+        "planetarium_dome__seats_in_row",
+    ):
+        tickets_sold = sold.get(session.id, 0)
+        tickets_available = session.planetarium_dome.capacity - tickets_sold
+        if (session.tickets_sold, session.tickets_available) != (
+            tickets_sold,
+            tickets_available,
+        ):
+            session.tickets_sold = tickets_sold
+            session.tickets_available = tickets_available
+            session.updated_at = now
+            stale.append(session)
+
+    ShowSession.objects.bulk_update(
+        stale, [*ShowSession.COUNTER_FIELDS, "updated_at"], batch_size=500
+    )
+    if stale:
+        bump_versions(ShowSession)
+    return len(stale)
+
+
+def recount_reservation_totals() -> int:
+    """Recompute ticket_count/total_price of every reservation from its tickets.
+
+    Returns the number of reservations whose totals were out of date.
+    """
+    totals = {
+        reservation_id: (ticket_count, total_price)
+        for reservation_id, ticket_count, total_price in Ticket.objects.order_by()
+        .values("reservation")
+        .annotate(
+            ticket_count=Count("id"),
+            total_price=Sum("price"),
+        )
+        .values_list("reservation", "ticket_count", "total_price")
+    }
+    stale = []
+    for reservation in Reservation.objects.only("ticket_count", "total_price"):
+        ticket_count, total_price = totals.get(reservation.id, (0, 0))
+        if (reservation.ticket_count, reservation.total_price) != (
+            ticket_count,
+            total_price,
+        ):
+            reservation.ticket_count = ticket_count
+            reservation.total_price = total_price
+            stale.append(reservation)
+
+    Reservation.objects.bulk_update(stale, Reservation.TOTAL_FIELDS, batch_size=500)
+    if stale:
+        bump_versions(Reservation)
+    return len(stale)
+
+
+def seats_filter(seats) -> Q:
+    return reduce(or_, (Q(row=row, seat=seat) for row, seat in seats))
+
+
+def taken_seats(show_session, seats) -> set:
+    """Return the subset of ``seats`` that already have a ticket, in one query."""
+    seats = set(seats)
+    existing = (
+        Ticket.objects.filter(
+            show_session=show_session, row__in={row for row, _ in seats}
+        )
+        .order_by()
+        .values_list("row", "seat")
+    )
+    return seats.intersection(existing)
+
+
+def held_seats(show_session, seats, user=None) -> set:
+    """Return the subset of ``seats`` under an active hold of another user."""
+    seats = set(seats)
+    holds = SeatHold.objects.filter(
+        show_session=show_session,
+        row__in={row for row, _ in seats},
+        expires_at__gt=timezone.now(),
+    )
+    if user is not None:
+        holds = holds.exclude(user=user)
+    return seats.intersection(holds.values_list("row", "seat"))
+
+
+def unavailable_seats(show_session, seats, user=None) -> set:
+    return taken_seats(show_session, seats) | held_seats(show_session, seats, user)
+
+
+@serialized_writes
+def create_tickets(reservation, show_session, seats) -> list:
+    """Insert tickets with one bulk query.
+
+    The ``unique_together`` constraint on Ticket is the source of truth for
+    conflicts: a violation is translated into SeatsUnavailable with the exact
+    seats that were taken meanwhile.
+    """
+    price = show_session.planetarium_dome.price_per_seat
+    tickets = [
+        Ticket(
+            row=row,
+            seat=seat,
+            show_session=show_session,
+            reservation=reservation,
+            price=price,
+        )
+        for row, seat in seats
+    ]
+    try:
+        with transaction.atomic():
+            Ticket.objects.bulk_create(tickets)
+            bump_versions(Ticket)
+            count_sold(show_session.pk, len(tickets))
+            count_reserved(reservation.pk, len(tickets), price * len(tickets))
+            count_sales(show_session, len(tickets), price * len(tickets))
+            transaction.on_commit(
+                lambda: registry.inc("seats_sold_total", len(tickets))
+            )
+    except IntegrityError:
+        taken = taken_seats(show_session, seats)
+        if not taken:
+            raise
+        raise SeatsUnavailable(taken)
+    return tickets
+
+
+@serialized_writes
+def purchase_tickets(user, show_session, seats) -> Purchase:
+    """Create a reservation with all requested tickets, or nothing at all.
+
+    Seats held by ``user`` are purchasable and their holds are released.
+    """
+    unavailable = unavailable_seats(show_session, seats, user)
+    if unavailable:
+        raise SeatsUnavailable(unavailable)
+
+    with transaction.atomic():
+        reservation = Reservation.objects.create(user=user)
+        tickets = create_tickets(reservation, show_session, seats)
+        SeatHold.objects.filter(
+            seats_filter(seats), show_session=show_session, user=user
+        ).delete()
+        bump_versions(SeatHold)
+
+    return Purchase(reservation, show_session, tickets)
+
+
+def allocate_seats(show_session, count) -> list:
+    """Pick the best block of ``count`` adjacent free seats of a session."""
+    dome = show_session.planetarium_dome
+    seat_map = SeatMap.from_seats(
+        dome.rows, dome.seats_in_row, occupied_seats(show_session.pk)
+    )
+    seats = seat_map.find_block(count)
+    if seats is None:
+        raise NoAdjacentSeats()
+    return seats
+
+
+def purchase_best_available(user, show_session, count) -> Purchase:
+    """Buy ``count`` adjacent seats chosen by the allocator.
+
+    Losing a race for the chosen block means re-allocating on a fresh seat
+    map, up to ALLOCATION_ATTEMPTS times.
+    """
+    for _ in range(ALLOCATION_ATTEMPTS - 1):
+        try:
+            return purchase_tickets(
+                user, show_session, allocate_seats(show_session, count)
+            )
+        except SeatsUnavailable:
+            continue
+    return purchase_tickets(user, show_session, allocate_seats(show_session, count))
+
+
+@serialized_writes
+def hold_seats(user, show_session, seats) -> Hold:
+    """Reserve ``seats`` for ``user`` until SEAT_HOLD_TTL passes.
+
+    Expired holds on the requested rows are dropped first, so expiry does not
+    depend on the sweeper having run.
+    """
+    taken = taken_seats(show_session, seats)
+    if taken:
+        raise SeatsUnavailable(taken)
+
+    now = timezone.now()
+    token = uuid.uuid4()
+    expires_at = now + settings.SEAT_HOLD_TTL
+    holds = [
+        SeatHold(
+            token=token,
+            show_session=show_session,
+            row=row,
+            seat=seat,
+            user=user,
+            expires_at=expires_at,
+        )
+        for row, seat in seats
+    ]
+
+    with transaction.atomic():
+        expired, _ = SeatHold.objects.filter(
+            show_session=show_session,
+            row__in={row for row, _ in seats},
+            expires_at__lte=now,
+        ).delete()
+        try:
+            with transaction.atomic():
+                SeatHold.objects.bulk_create(holds)
+        except IntegrityError:
+            raise SeatsUnavailable(held_seats(show_session, seats))
+        bump_versions(SeatHold)
+        transaction.on_commit(lambda: count_holds(len(holds), expired))
+
+    return Hold(token, show_session, holds, expires_at)
+
+
+def count_holds(created, expired):
+    registry.inc("holds_created_total", created)
+    if expired:
+        registry.inc("holds_expired_total", expired)
+
+
+def sweep_expired_holds() -> int:
+    """Delete every expired seat hold, returns how many."""
+    deleted, _ = SeatHold.objects.filter(expires_at__lte=timezone.now()).delete()
+    if deleted:
+        bump_versions(SeatHold)
+        registry.inc("holds_expired_total", deleted)
+    return deleted
+
+
+def active_holds(user) -> list:
+    """Group the active seat holds of ``user`` by hold token."""
+    holds = {}
+    for seat_hold in (
+        SeatHold.objects.filter(user=user, expires_at__gt=timezone.now())
+        .select_related("show_session")
+        .order_by("token", "row", "seat")
+    ):
+        hold = holds.setdefault(
+            seat_hold.token,
+            Hold(seat_hold.token, seat_hold.show_session, [], seat_hold.expires_at),
+        )
+        hold.seats.append(seat_hold)
+    return list(holds.values())
+
+
+@serialized_writes
+def release_hold(user, token) -> int:
+    deleted, _ = SeatHold.objects.filter(user=user, token=token).delete()
+    if deleted:
+        bump_versions(SeatHold)
+    return deleted
+
+
+def confirm_hold(user, token) -> Purchase:
+    """Turn an active hold into a purchase of exactly the held seats."""
+    holds = list(
+        SeatHold.objects.filter(
+            user=user, token=token, expires_at__gt=timezone.now()
+        ).select_related("show_session__planetarium_dome")
+    )
+    if not holds:
+        raise NotFound("Hold not found or expired.")
+
+    return purchase_tickets(
+        user, holds[0].show_session, [(hold.row, hold.seat) for hold in holds]
+    )
@@ -0,0 +1,173 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework.response import Response
+
+from planetarium.metrics import registry
+
+VERSION_PREFIX = "planetarium:version"
+RESPONSE_PREFIX = "planetarium:response"
+
+
+def get_cache():
+    return caches[getattr(settings, "PLANETARIUM_CACHE_ALIAS", "default")]
+
+
+def get_version_cache():
+    """The cache holding the model versions, shared between processes."""
+    return caches[getattr(settings, "PLANETARIUM_VERSION_CACHE_ALIAS", "default")]
+
+
+def check_version_cache(app_configs, **kwargs):
+    """Warn when the model versions live in one process only."""
+    if isinstance(get_version_cache(), (LocMemCache, DummyCache)):
+        return [
+            checks.Warning(
+                "The model versions are kept in a per-process cache.",
+                hint=(
+                    "Writes from management commands and other workers will "
+                    "not invalidate cached responses and ETags. Point "
+                    "PLANETARIUM_VERSION_CACHE_ALIAS at a shared cache, or "
+                    "run a single process."
+                ),
+                id="planetarium.W001",
+            )
+        ]
+    return []
+
+
+def version_key(model) -> str:
+    return f"{VERSION_PREFIX}:{model._meta.label_lower}"
+
+
+def model_versions(models) -> list:
+    """Current version of every model in ``models``, with one cache round trip.
+
+    A model without a stored version (cold or evicted cache) gets a fresh one,
+    which can only make older cache entries unreachable, never stale.
+    """
+    cache = get_version_cache()
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*models):
+    """Invalidate every cached response that depends on ``models``.
+
+    The bump is repeated when the surrounding transaction commits, so a
+    response computed from pre-commit data in the meantime does not survive.
+    """
+
+    def bump():
+        get_version_cache().set_many(
+            {version_key(model): time.time_ns() for model in models}, None
+        )
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def request_key(request) -> str:
+    """Host, path and query parameters of ``request`` in a canonical order."""
+    params = sorted(
+        (name, sorted(values)) for name, values in request.query_params.lists()
+    )
+    return f"{request.get_host()}{request.path}?{params}"
+
+
+def entry_key(key, suffix) -> str:
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return f"{RESPONSE_PREFIX}:{digest}:{suffix}"
+
+
+def read_through(key, models, compute):
+    """Return the cached value of ``key`` for the current ``models`` versions.
+
+    On a miss only one caller computes the value, under a short lock. The
+    others get the last value computed for ``key`` under any version, or wait
+    for the lock holder when there is none. ``compute`` returning None means
+    the result must not be cached.
+    """
+    cache = get_cache()
+    timeout = getattr(settings, "PLANETARIUM_RESPONSE_CACHE_TIMEOUT", 60)
+    lock_timeout = getattr(settings, "PLANETARIUM_RESPONSE_CACHE_LOCK_TIMEOUT", 5)
+
+    stale_key = entry_key(key, "stale")
+    lock_key = entry_key(key, "lock")
+    fresh_key = entry_key(
+        key, ".".join(str(version) for version in model_versions(models))
+    )
+
+    value = cache.get(fresh_key)
+    if value is not None:
+        registry.inc("response_cache_requests_total", result="hit")
+        return value
+
+    if not cache.add(lock_key, 1, lock_timeout):
+        value = cache.get(stale_key)
+        if value is not None:
+            registry.inc("response_cache_requests_total", result="stale")
+            return value
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = cache.get(fresh_key)
+            if value is not None:
+                registry.inc("response_cache_requests_total", result="wait")
+                return value
+
+    registry.inc("response_cache_requests_total", result="miss")
+    try:
+        value = compute()
+        if value is not None:
+            cache.set_many({fresh_key: value, stale_key: value}, timeout)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+class CachedResponseMixin:
+    """Serve ``cache_actions`` of a viewset from the response cache.
+
+    Entries are keyed on the request and the versions of ``version_models``,
+    which are bumped by planetarium.signals on every write.
+    """
+
+    cache_actions = ("list", "retrieve")
+    version_models = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # dispatch() looks the handler up after initial(), i.e. after the
+        # permission and throttle checks, so it can be swapped for a cached one
+        if request.method == "GET" and self.action in self.cache_actions:
+            handler = self.get
+            self.get = lambda request, *args, **kwargs: self.cached_response(
+                handler, request, *args, **kwargs
+            )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        response = None
+
+        def compute():
+            nonlocal response
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                return response.data
+            return None
+
+        data = read_through(request_key(request), self.version_models, compute)
+        if response is not None:
+            return response
+        return Response(data)
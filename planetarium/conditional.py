@@ -0,0 +1,116 @@
+import hashlib
+import time
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from planetarium.cache import model_versions, request_key
+
+
+class ConditionalGetMixin:
+    """ETag and Last-Modified validators for ``conditional_actions``.
+
+    Validators come from the versions of ``version_models`` alone, so a
+    matching If-None-Match/If-Modified-Since is answered with 304 before any
+    queryset is evaluated. Responses that also depend on the clock set
+    ``etag_ttl`` (seconds) and those that depend on the caller set
+    ``etag_per_user``. Retrieve ETags also carry the ``etag_timestamps``
+    lookups of the object, e.g. its ``updated_at``, at one cheap query.
+    """
+
+    conditional_actions = ("list", "retrieve")
+    version_models = ()
+    etag_ttl = None
+    etag_per_user = False
+    etag_timestamps = ()
+
+    def get_validators(self, request):
+        versions = model_versions(self.version_models)
+        parts = [request_key(request), *versions]
+        if self.action == "retrieve" and self.etag_timestamps:
+            parts.append(self.get_timestamps())
+        if self.etag_per_user:
+            parts.append(request.user.pk)
+        if self.etag_ttl:
+            parts.append(int(time.time() // self.etag_ttl))
+        etag = '"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()
+        return etag, self.get_last_modified(versions)
+
+    def get_timestamps(self):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        model = self.queryset.model
+        try:
+            return (
+                model._default_manager.filter(**{self.lookup_field: lookup})
+                .values_list(*self.etag_timestamps)
+                .first()
+            )
+        except (ValueError, ValidationError):
+            return None
+
+    @staticmethod
+    def get_last_modified(versions):
+        """The second of the latest version, once that second is over.
+
+        HTTP dates have no fractions: sent earlier, a Last-Modified would
+        also stand for a later write within the same second and answer its
+        If-Modified-Since with a false 304.
+        """
+        if not versions:
+            return None
+        last_modified = max(versions) // 10**9
+        if time.time_ns() // 10**9 <= last_modified:
+            return None
+        return last_modified
+
+    def is_not_modified(self, request, etag, last_modified) -> bool:
+        # the ETag wins over the timestamp when the client sends both
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return "*" in etags or etag in etags or f"W/{etag}" in etags
+
+        if_modified_since = parse_http_date_safe(
+            request.headers.get("If-Modified-Since", "")
+        )
+        return (
+            if_modified_since is not None
+            and last_modified is not None
+            and last_modified <= if_modified_since
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validators = None
+        if request.method not in ("GET", "HEAD"):
+            return
+        if self.action not in self.conditional_actions:
+            return
+
+        self.validators = self.get_validators(request)
+        if self.is_not_modified(request, *self.validators):
+            setattr(
+                self,
+                request.method.lower(),
+                lambda request, *args, **kwargs: Response(
+                    status=status.HTTP_304_NOT_MODIFIED
+                ),
+            )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, "validators", None)
+        if validators and response.status_code in (
+            status.HTTP_200_OK,
+            status.HTTP_304_NOT_MODIFIED,
+        ):
+            etag, last_modified = validators
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+            if self.etag_per_user:
+                patch_vary_headers(response, ["Authorization"])
+        return response
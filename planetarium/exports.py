@@ -0,0 +1,140 @@
+import csv
+import zlib
+from dataclasses import dataclass
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from planetarium.models import Reservation, ShowSession, Ticket
+
+CHUNK_SIZE = 2000
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+@dataclass(frozen=True)
+class Export:
+    model: type
+    columns: tuple
+    date_field: str
+    dome_field: str
+
+    def rows(self, start=None, end=None, dome_id=None):
+        """values_list() rows, read through a server-side cursor."""
+        queryset = self.model.objects.order_by("id")
+        if start is not None:
+            queryset = queryset.filter(**{f"{self.date_field}__gte": start})
+        if end is not None:
+            queryset = queryset.filter(**{f"{self.date_field}__lt": end})
+        if dome_id is not None:
+            queryset = queryset.filter(**{self.dome_field: dome_id}).distinct()
+        lookups = [lookup for _, lookup in self.columns]
+        return queryset.values_list(*lookups).iterator(chunk_size=CHUNK_SIZE)
+
+    @property
+    def header(self) -> list:
+        return [name for name, _ in self.columns]
+
+
+EXPORTS = {
+    "tickets": Export(
+        model=Ticket,
+        columns=(
+            ("id", "id"),
+            ("row", "row"),
+            ("seat", "seat"),
+            ("show_session", "show_session_id"),
+            ("show", "show_session__astronomy_show__title"),
+            ("dome", "show_session__planetarium_dome__name"),
+            ("show_time", "show_session__show_time"),
+            ("price", "price"),
+            ("reservation", "reservation_id"),
+            ("user_email", "reservation__user__email"),
+            ("reserved_at", "reservation__created_at"),
+        ),
+        date_field="show_session__show_time",
+        dome_field="show_session__planetarium_dome",
+    ),
+    "reservations": Export(
+        model=Reservation,
+        columns=(
+            ("id", "id"),
+            ("user_email", "user__email"),
+            ("created_at", "created_at"),
+            ("ticket_count", "ticket_count"),
+            ("total_price", "total_price"),
+        ),
+        date_field="created_at",
+        dome_field="tickets__show_session__planetarium_dome",
+    ),
+    "show_sessions": Export(
+        model=ShowSession,
+        columns=(
+            ("id", "id"),
+            ("show", "astronomy_show__title"),
+            ("dome", "planetarium_dome__name"),
+            ("show_time", "show_time"),
+            ("tickets_sold", "tickets_sold"),
+            ("tickets_available", "tickets_available"),
+        ),
+        date_field="show_time",
+        dome_field="planetarium_dome",
+    ),
+}
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(
+            [
+                value.isoformat() if hasattr(value, "isoformat") else value
+                for value in row
+            ]
+        )
+
+
+def ndjson_lines(header, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    for row in rows:
+        yield encoder.encode(dict(zip(header, row))) + "\n"
+
+
+def batched(lines, size=64 * 1024):
+    """Join lines into UTF-8 chunks of about ``size`` bytes."""
+    buffer = []
+    length = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        length += len(data)
+        if length >= size:
+            yield b"".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(name, export_format="csv", compress=False, **filters):
+    """Byte chunks of the ``name`` export, filtered by start/end/dome_id."""
+    export = EXPORTS[name]
+    lines = {"csv": csv_lines, "ndjson": ndjson_lines}[export_format](
+        export.header, export.rows(**filters)
+    )
+    chunks = batched(lines)
+    return gzipped(chunks) if compress else chunks
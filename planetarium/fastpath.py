@@ -0,0 +1,189 @@
+from abc import ABC, abstractmethod
+from decimal import Decimal
+
+from django.utils import timezone
+from rest_framework.response import Response
+
+from planetarium.fieldsets import EXPAND_PARAM, FIELDS_PARAM
+from planetarium.models import ShowTheme
+from planetarium.timing import mark_serializer
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+CENTS = Decimal("0.01")
+
+
+class FastListSerializer(ABC):
+    """Builds list payloads straight from ``values()`` rows.
+
+    Each subclass mirrors one DRF list serializer and must produce exactly
+    the same output; the parity tests in planetarium/tests.py check that.
+    """
+
+    values = ()
+
+    @abstractmethod
+    def to_representation(self, rows) -> list:
+        """The list payload of ``rows``, as the DRF serializer renders it."""
+
+    async def ato_representation(self, rows) -> list:
+        """to_representation() for async views; override if it queries."""
+        return self.to_representation(rows)
+
+
+class ShowSessionListFastSerializer(FastListSerializer):
+    """Mirror of ShowSessionListSerializer."""
+
+    values = (
+        "id",
+        "astronomy_show__title",
+        "planetarium_dome__name",
+        "show_time",
+        "tickets_available",
+    )
+
+    def to_representation(self, rows) -> list:
+        current_timezone = timezone.get_current_timezone()
+        return [
+            {
+                "id": row["id"],
+                "astronomy_show": row["astronomy_show__title"],
+                "planetarium_dome": row["planetarium_dome__name"],
+                "show_time": row["show_time"]
+                .astimezone(current_timezone)
+                .strftime(DATETIME_FORMAT),
+                "tickets_available": row["tickets_available"],
+            }
+            for row in rows
+        ]
+
+
+class AstronomyShowListFastSerializer(FastListSerializer):
+    """Mirror of AstronomyShowListSerializer, themes with one extra query."""
+
+    values = ("id", "title", "description")
+
+    def theme_names(self, show_ids):
+        return ShowTheme.objects.filter(shows__in=show_ids).values_list("shows", "name")
+
+    def to_representation(self, rows) -> list:
+        themes = {row["id"]: [] for row in rows}
+        for show_id, name in self.theme_names(themes):
+            themes[show_id].append(name)
+        return self.represent(rows, themes)
+
+    async def ato_representation(self, rows) -> list:
+        themes = {row["id"]: [] for row in rows}
+        async for show_id, name in self.theme_names(themes):
+            themes[show_id].append(name)
+        return self.represent(rows, themes)
+
+    def represent(self, rows, themes) -> list:
+        return [
+            {
+                "id": row["id"],
+                "title": row["title"],
+                "description": row["description"],
+                "theme": themes[row["id"]],
+            }
+            for row in rows
+        ]
+
+
+class TicketListFastSerializer(FastListSerializer):
+    """Mirror of TicketListSerializer.
+
+    Session and reservation parts are formatted once per session and per
+    reservation instead of once per ticket.
+    """
+
+    values = (
+        "id",
+        "row",
+        "seat",
+        "show_session_id",
+        "show_session__astronomy_show__title",
+        "show_session__planetarium_dome__name",
+        "show_session__show_time",
+        "reservation_id",
+        "reservation__user__email",
+        "reservation__created_at",
+        "reservation__total_price",
+        "reservation__ticket_count",
+    )
+
+    def to_representation(self, rows) -> list:
+        sessions = {}
+        reservations = {}
+        tickets = []
+        for row in rows:
+            session_info = sessions.get(row["show_session_id"])
+            if session_info is None:
+                session_info = sessions[row["show_session_id"]] = (
+                    f"{row['show_session__astronomy_show__title']} in "
+                    f"{row['show_session__planetarium_dome__name']} at "
+                    f"{row['show_session__show_time'].strftime(DATETIME_FORMAT)}"
+                )
+
+            reservation = reservations.get(row["reservation_id"])
+            if reservation is None:
+                reservation = reservations[row["reservation_id"]] = (
+                    {
+                        "id": row["reservation_id"],
+                        "user": row["reservation__user__email"],
+                        "created_at": row["reservation__created_at"].strftime(
+                            DATETIME_FORMAT
+                        ),
+                    },
+                    "{:f}".format(row["reservation__total_price"].quantize(CENTS)),
+                    row["reservation__ticket_count"],
+                )
+            reservation_info, total_price, ticket_count = reservation
+
+            tickets.append(
+                {
+                    "id": row["id"],
+                    "row": row["row"],
+                    "seat": row["seat"],
+                    "show_session_info": session_info,
+                    "reservation_info": dict(reservation_info),
+                    "total_price": total_price,
+                    "tickets": ticket_count,
+                }
+            )
+        return tickets
+
+
+class FastListMixin:
+    """Serve the list action through ``fast_list_serializer``.
+
+    Switched per viewset with ``fast_list``. Requests shaped with ``?fields=``
+    or ``?expand=`` always take the regular serializer.
+    """
+
+    fast_list = True
+    fast_list_serializer = None
+
+    def use_fast_list(self, request) -> bool:
+        return (
+            self.fast_list
+            and self.fast_list_serializer is not None
+            and not request.query_params.get(FIELDS_PARAM)
+            and not request.query_params.get(EXPAND_PARAM)
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list(request):
+            return super().list(request, *args, **kwargs)
+
+        mark_serializer()
+        serializer = self.fast_list_serializer()
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .select_related(None)
+            .prefetch_related(None)
+            .values(*serializer.values)
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation(page))
+        return Response(serializer.to_representation(queryset))
@@ -0,0 +1,152 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+FIELDS_PARAM = "fields"
+EXPAND_PARAM = "expand"
+
+
+def parse_paths(value) -> dict:
+    """Turn ``"a.b,a.c,d"`` into ``{"a": {"b": {}, "c": {}}, "d": {}}``."""
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+class DynamicFieldsMixin:
+    """Serializer shaped by ``?fields=`` and ``?expand=``.
+
+    ``fields`` keeps only the listed fields, dotted paths reach into nested
+    serializers. ``expand`` swaps a field for the serializer registered in
+    ``expandable_fields`` as ``name: (serializer_class, options)``. Sources
+    that are model properties list the concrete fields they read in
+    ``source_fields`` so the queryset can still be narrowed with only().
+    """
+
+    expandable_fields = {}
+    source_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        expand = kwargs.pop("expand", None)
+        super().__init__(*args, **kwargs)
+
+        if fields is None and expand is None:
+            request = self.context.get("request")
+            if request is None:
+                return
+            fields = parse_paths(request.query_params.get(FIELDS_PARAM, ""))
+            expand = parse_paths(request.query_params.get(EXPAND_PARAM, ""))
+        self.apply_shape(fields or {}, expand or {})
+
+    def apply_shape(self, fields, expand):
+        expanded = set()
+        for name, nested_expand in expand.items():
+            if name in self.expandable_fields:
+                serializer_class, options = self.expandable_fields[name]
+                self.fields[name] = serializer_class(
+                    fields=fields.get(name, {}), expand=nested_expand, **options
+                )
+                expanded.add(name)
+
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+        for name in (set(fields) | set(expand)) - expanded:
+            field = self.fields.get(name)
+            nested = getattr(field, "child", field)
+            if isinstance(nested, DynamicFieldsMixin):
+                nested.apply_shape(fields.get(name, {}), expand.get(name, {}))
+
+
+def related_lookups(serializer, model, prefix=""):
+    """only(), select_related() and prefetch_related() lookups of a shape.
+
+    ``only`` is None when some field reads model data that cannot be mapped
+    to concrete fields, in which case every column has to be loaded.
+    """
+    only, select, prefetch = [prefix + model._meta.pk.name], [], []
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == "*":
+            only = None
+            continue
+
+        name = field.source_attrs[0]
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            sources = getattr(serializer, "source_fields", {}).get(field.field_name)
+            if sources is None:
+                only = None
+            elif only is not None:
+                only.extend(prefix + source for source in sources)
+            continue
+
+        if model_field.many_to_many or model_field.one_to_many:
+            prefetch.append(prefix + name)
+            continue
+        if only is not None:
+            only.append(prefix + name)
+        if not model_field.is_relation or isinstance(
+            field, serializers.PrimaryKeyRelatedField
+        ):
+            continue
+
+        select.append(prefix + name)
+        if len(field.source_attrs) > 1:
+            only = None
+            continue
+        related_model = model_field.related_model
+        if isinstance(field, serializers.BaseSerializer):
+            nested_only, nested_select, nested_prefetch = related_lookups(
+                field, related_model, f"{prefix}{name}__"
+            )
+            select += nested_select
+            prefetch += nested_prefetch
+            if only is not None and nested_only is not None:
+                only += nested_only
+            else:
+                only = None
+        elif isinstance(field, serializers.SlugRelatedField):
+            if only is not None:
+                only.append(f"{prefix}{name}__{field.slug_field}")
+        else:
+            only = None
+
+    return only, select, prefetch
+
+
+class DynamicFieldsViewMixin:
+    """Narrow the queryset of ``shaped_actions`` to the requested shape.
+
+    Only requests with ``?fields=`` or ``?expand=`` are rewritten; the
+    declared select_related/prefetch_related are kept otherwise.
+    """
+
+    shaped_actions = ("list", "retrieve")
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
+        if self.action not in self.shaped_actions or not (
+            params.get(FIELDS_PARAM) or params.get(EXPAND_PARAM)
+        ):
+            return queryset
+
+        only, select, prefetch = related_lookups(self.get_serializer(), queryset.model)
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if only is not None:
+            ordering = getattr(self.paginator, "ordering", ())
+            queryset = queryset.only(*only, *ordering)
+        return queryset
@@ -0,0 +1,200 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from wsgiref.util import setup_testing_defaults
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+
+from planetarium.models import AstronomyShow, PlanetariumDome, ShowSession
+
+ASYNC_PREFIX = "/api/planetarium/async/"
+SYNC_PREFIX = "/api/planetarium/"
+
+
+class Command(BaseCommand):
+    """Django command to compare sync WSGI and async ASGI read throughput"""
+
+    help = (
+        "Drive the WSGI application with a thread pool and the ASGI "
+        "application with an event loop, in process and against the current "
+        "database, and report requests per second per concurrency level."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            default="1,8,32",
+            help="Comma-separated numbers of concurrent clients.",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=300, help="Requests per measurement."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="WSGI worker threads, like gunicorn --threads.",
+        )
+        parser.add_argument(
+            "--client-delay",
+            type=float,
+            default=0,
+            help="Milliseconds each client takes to read a response body.",
+        )
+
+    def get_paths(self):
+        show = AstronomyShow.objects.values_list("id", flat=True).first()
+        dome = PlanetariumDome.objects.values_list("id", flat=True).first()
+        session = ShowSession.objects.values_list("id", flat=True).first()
+        if None in (show, dome, session):
+            raise CommandError("Load some shows, domes and sessions first.")
+        return [
+            "themes/",
+            "shows/",
+            f"shows/{show}/",
+            "domes/",
+            f"domes/{dome}/",
+            "show_sessions/",
+            f"show_sessions/{session}/",
+            f"show_sessions/{session}/seats/",
+        ]
+
+    @staticmethod
+    def client_address(number):
+        # one address per request keeps the anonymous throttle out of the way
+        return f"10.{number >> 16 & 255}.{number >> 8 & 255}.{number & 255}"
+
+    def run_wsgi(self, paths, requests, concurrency, workers, delay):
+        application = get_wsgi_application()
+        numbers = count()
+
+        def call(path):
+            environ = {
+                "PATH_INFO": path,
+                "HTTP_HOST": "localhost",
+                "REMOTE_ADDR": self.client_address(next(numbers)),
+            }
+            setup_testing_defaults(environ)
+            status = []
+            body = application(
+                environ, lambda code, headers: status.append(int(code.split()[0]))
+            )
+            for _ in body:
+                # a slow client keeps the worker thread busy while it reads
+                time.sleep(delay)
+            body.close()
+            return status[0]
+
+        def client(client_paths):
+            return [pool.submit(call, path).result() for path in client_paths]
+
+        with ThreadPoolExecutor(workers) as pool:
+            with ThreadPoolExecutor(concurrency) as clients:
+                started = time.perf_counter()
+                statuses = [
+                    status
+                    for result in clients.map(
+                        client, self.split(paths, requests, concurrency)
+                    )
+                    for status in result
+                ]
+                return time.perf_counter() - started, statuses
+
+    def run_asgi(self, paths, requests, concurrency, delay):
+        application = get_asgi_application()
+        numbers = count()
+
+        async def call(path):
+            status = []
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": b"",
+                "headers": [(b"host", b"localhost")],
+                "client": (self.client_address(next(numbers)), 50000),
+                "server": ("localhost", 80),
+            }
+
+            requested = False
+            finished = asyncio.Event()
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await finished.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+                    return
+                if message.get("body"):
+                    await asyncio.sleep(delay)
+                if not message.get("more_body"):
+                    finished.set()
+
+            await application(scope, receive, send)
+            return status[0]
+
+        async def client(client_paths):
+            return [await call(path) for path in client_paths]
+
+        async def main():
+            started = time.perf_counter()
+            results = await asyncio.gather(
+                *(client(chunk) for chunk in self.split(paths, requests, concurrency))
+            )
+            return time.perf_counter() - started, [
+                status for result in results for status in result
+            ]
+
+        return asyncio.run(main())
+
+    @staticmethod
+    def split(paths, requests, concurrency):
+        """``requests`` paths round-robin over the routes, one list per client."""
+        calls = [paths[number % len(paths)] for number in range(requests)]
+        return [calls[index::concurrency] for index in range(concurrency)]
+
+    def report(self, name, elapsed, statuses):
+        failed = sum(status != 200 for status in statuses)
+        self.stdout.write(
+            f"  {name:<20} {len(statuses) / elapsed:>9.1f} req/s"
+            + (f"  ({failed} non-200)" if failed else "")
+        )
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options["concurrency"].split(",")]
+        except ValueError:
+            raise CommandError("--concurrency takes comma-separated integers.")
+        routes = self.get_paths()
+        requests = options["requests"]
+        delay = options["client_delay"] / 1000
+
+        sync_paths = [SYNC_PREFIX + path for path in routes]
+        async_paths = [ASYNC_PREFIX + path for path in routes]
+        for level in levels:
+            self.stdout.write(f"concurrency {level}:")
+            self.report(
+                "wsgi, sync views",
+                *self.run_wsgi(sync_paths, requests, level, options["workers"], delay),
+            )
+            self.report(
+                "asgi, sync views",
+                *self.run_asgi(sync_paths, requests, level, delay),
+            )
+            self.report(
+                "asgi, async views",
+                *self.run_asgi(async_paths, requests, level, delay),
+            )
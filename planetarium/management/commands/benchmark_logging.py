@@ -0,0 +1,183 @@
+import logging
+import statistics
+import tempfile
+import threading
+import time
+from itertools import count
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from wsgiref.util import setup_testing_defaults
+
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+
+from api.log_handlers import BackgroundFileHandler, JSONFormatter
+
+PATH = "/api/planetarium/themes/"
+BURST_LOGGER = "planetarium.benchmark"
+# loggers written to during the run, as in LOGGING
+LOGGERS = ("planetarium.timing", BURST_LOGGER)
+
+
+class Command(BaseCommand):
+    """Django command to measure request latency during a burst of log records"""
+
+    help = (
+        "Serve requests through the WSGI application while other threads log "
+        "errors with tracebacks, once with file handlers writing in the "
+        "calling thread and once with the background handlers of "
+        "api/log_handlers.py, and report the request latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=500, help="Requests per measurement."
+        )
+        parser.add_argument(
+            "--burst-threads",
+            type=int,
+            default=4,
+            help="Threads logging errors while the requests run.",
+        )
+        parser.add_argument(
+            "--burst-rate",
+            type=int,
+            default=1000,
+            help="Error records per second, over all burst threads.",
+        )
+        parser.add_argument(
+            "--disk-latency",
+            type=float,
+            default=1,
+            help="Milliseconds every write waits, like a busy disk.",
+        )
+        parser.add_argument(
+            "--max-bytes",
+            type=int,
+            default=1024 * 1024,
+            help="Rotate the log files at this size.",
+        )
+
+    def make_handler(self, kind, directory, max_bytes, disk_latency):
+        filename = Path(directory) / f"{kind}.log"
+        if kind == "background":
+            handler = BackgroundFileHandler(
+                filename, max_bytes=max_bytes, backup_count=3
+            )
+            writer = handler.target
+        else:
+            handler = writer = RotatingFileHandler(
+                filename, maxBytes=max_bytes, backupCount=3, encoding="utf-8"
+            )
+        handler.setFormatter(JSONFormatter())
+
+        emit = writer.emit
+
+        def slow_emit(record):
+            time.sleep(disk_latency)
+            emit(record)
+
+        writer.emit = slow_emit
+        return handler
+
+    def serve(self, application, requests):
+        numbers = count()
+        latencies = []
+        for _ in range(requests):
+            number = next(numbers)
+            environ = {
+                "PATH_INFO": PATH,
+                "HTTP_HOST": "localhost",
+                # one address per request keeps the anonymous throttle away
+                "REMOTE_ADDR": f"10.{number >> 8 & 255}.{number & 255}.1",
+            }
+            setup_testing_defaults(environ)
+            started = time.perf_counter()
+            body = application(environ, lambda status, headers: None)
+            b"".join(body)
+            body.close()
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    def burst(self, threads, rate, stop):
+        logger = logging.getLogger(BURST_LOGGER)
+        sent = [0] * threads
+        interval = threads / rate
+
+        def run(index):
+            started = time.perf_counter()
+            while not stop.is_set():
+                try:
+                    raise ValueError("benchmark")
+                except ValueError:
+                    logger.error("burst %s", sent[index], exc_info=True)
+                sent[index] += 1
+                # keep to the rate, catching up after a slow write
+                delay = started + sent[index] * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+        workers = [
+            threading.Thread(target=run, args=(index,)) for index in range(threads)
+        ]
+        for worker in workers:
+            worker.start()
+        return workers, sent
+
+    def measure(self, application, handler, options):
+        loggers = [logging.getLogger(name) for name in LOGGERS]
+        saved = [
+            (logger.handlers, logger.level, logger.propagate) for logger in loggers
+        ]
+        for logger in loggers:
+            logger.handlers, logger.propagate = [handler], False
+            logger.setLevel(logging.INFO)
+        try:
+            quiet = self.serve(application, options["requests"])
+            stop = threading.Event()
+            workers, sent = self.burst(
+                options["burst_threads"], options["burst_rate"], stop
+            )
+            try:
+                loud = self.serve(application, options["requests"])
+            finally:
+                stop.set()
+                for worker in workers:
+                    worker.join()
+            started = time.perf_counter()
+            handler.flush()
+            drained = time.perf_counter() - started
+        finally:
+            for logger, (handlers, level, propagate) in zip(loggers, saved):
+                logger.handlers, logger.propagate = handlers, propagate
+                logger.setLevel(level)
+            handler.close()
+        return quiet, loud, sum(sent), drained
+
+    @staticmethod
+    def percentiles(latencies):
+        cuts = statistics.quantiles(latencies, n=100)
+        return f"p50 {cuts[49] * 1000:7.2f} ms  p99 {cuts[98] * 1000:7.2f} ms"
+
+    def handle(self, *args, **options):
+        application = get_wsgi_application()
+        # warm up the url resolver, the serializers and the response cache
+        self.serve(application, 20)
+
+        with tempfile.TemporaryDirectory() as directory:
+            for kind in ("sync", "background"):
+                handler = self.make_handler(
+                    kind,
+                    directory,
+                    options["max_bytes"],
+                    options["disk_latency"] / 1000,
+                )
+                quiet, loud, sent, drained = self.measure(application, handler, options)
+                self.stdout.write(f"{kind} file handler:")
+                self.stdout.write(f"  quiet  {self.percentiles(quiet)}")
+                self.stdout.write(f"  burst  {self.percentiles(loud)}")
+                self.stdout.write(
+                    f"  {sent} burst records, "
+                    f"{getattr(handler, 'dropped', 0)} dropped, "
+                    f"{drained * 1000:.0f} ms to drain the queue"
+                )
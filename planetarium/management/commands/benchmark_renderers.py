@@ -0,0 +1,74 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from planetarium import renderers
+from planetarium.models import AstronomyShow, ShowSession, Ticket
+from planetarium.serializers import (
+    AstronomyShowListSerializer,
+    ShowSessionListSerializer,
+    TicketListSerializer,
+)
+
+
+class Command(BaseCommand):
+    """Django command to compare response renderers on real payloads"""
+
+    help = (
+        "Render the show session, show and ticket lists of the current "
+        "database with every available renderer and report the timings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=500, help="Rows per payload.")
+        parser.add_argument(
+            "--number", type=int, default=50, help="Renders per measurement."
+        )
+
+    def get_payloads(self, limit):
+        return {
+            "show_sessions": ShowSessionListSerializer(
+                ShowSession.objects.select_related(
+                    "astronomy_show", "planetarium_dome"
+                )[:limit],
+                many=True,
+            ).data,
+            "shows": AstronomyShowListSerializer(
+                AstronomyShow.objects.prefetch_related("theme")[:limit], many=True
+            ).data,
+            "tickets": TicketListSerializer(
+                Ticket.objects.select_related(
+                    "show_session__astronomy_show",
+                    "show_session__planetarium_dome",
+                    "reservation__user",
+                )[:limit],
+                many=True,
+            ).data,
+        }
+
+    def get_renderers(self):
+        available = {"json (stdlib)": JSONRenderer()}
+        if renderers.orjson is not None:
+            available["json (orjson)"] = renderers.FastJSONRenderer()
+        if renderers.msgpack is not None:
+            available["msgpack"] = renderers.MessagePackRenderer()
+        return available
+
+    def handle(self, *args, **options):
+        number = options["number"]
+        available = self.get_renderers()
+
+        for name, payload in self.get_payloads(options["limit"]).items():
+            self.stdout.write(f"{name}: {len(payload)} rows")
+            for renderer_name, renderer in available.items():
+                size = len(renderer.render(payload))
+                seconds = min(
+                    timeit.repeat(
+                        lambda: renderer.render(payload), number=number, repeat=3
+                    )
+                )
+                self.stdout.write(
+                    f"  {renderer_name:<14} {size:>10} bytes "
+                    f"{seconds / number * 1000:>9.3f} ms/render"
+                )
@@ -0,0 +1,150 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from planetarium.booking import purchase_tickets
+from planetarium.models import AstronomyShow, PlanetariumDome, ShowSession
+from planetarium.sqlite import WriteQueueTimeout
+
+
+class Command(BaseCommand):
+    """Django command to compare SQLite profiles under concurrent purchases"""
+
+    help = (
+        "Migrate a scratch SQLite database per profile, buy seats from many "
+        "threads at once and report throughput, latency and lock errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument(
+            "--purchases", type=int, default=20, help="Purchases per thread."
+        )
+        parser.add_argument("--seats", type=int, default=2, help="Seats per purchase.")
+
+    def get_profiles(self):
+        return {
+            "rollback journal": {
+                "pragmas": {"journal_mode": "delete"},
+                "timeout": 5,
+                "serialize": False,
+            },
+            "production": {
+                "pragmas": settings.SQLITE_PRAGMAS,
+                "timeout": settings.SQLITE_BUSY_TIMEOUT,
+                "serialize": True,
+            },
+        }
+
+    @contextmanager
+    def scratch_database(self, path, timeout):
+        """Point the default alias at ``path`` for every new connection."""
+        settings_dict = connections["default"].settings_dict
+        saved = settings_dict["NAME"], settings_dict["OPTIONS"]
+        connections.close_all()
+        settings_dict["NAME"] = path
+        settings_dict["OPTIONS"] = {**settings_dict["OPTIONS"], "timeout": timeout}
+        try:
+            yield
+        finally:
+            connections.close_all()
+            settings_dict["NAME"], settings_dict["OPTIONS"] = saved
+
+    def create_session(self, rows, seats_in_row):
+        return ShowSession.objects.select_related("planetarium_dome").get(
+            pk=ShowSession.objects.create(
+                astronomy_show=AstronomyShow.objects.create(
+                    title="Benchmark", description="Benchmark"
+                ),
+                planetarium_dome=PlanetariumDome.objects.create(
+                    name="Benchmark",
+                    rows=rows,
+                    seats_in_row=seats_in_row,
+                    price_per_seat=10,
+                ),
+                show_time=timezone.now() + timedelta(days=1),
+            ).pk
+        )
+
+    def run_purchases(self, threads, purchases, seats):
+        session = self.create_session(threads, purchases * seats)
+        user = get_user_model().objects.create_user(
+            email="benchmark@example.com", password=None
+        )
+        connections.close_all()
+
+        latencies = []
+        errors = []
+        start = threading.Barrier(threads)
+
+        def buyer(row):
+            try:
+                start.wait()
+                for purchase in range(purchases):
+                    first = purchase * seats + 1
+                    requested = [(row, seat) for seat in range(first, first + seats)]
+                    started = time.perf_counter()
+                    try:
+                        purchase_tickets(user, session, requested)
+                    except (OperationalError, WriteQueueTimeout) as error:
+                        errors.append(error)
+                    else:
+                        latencies.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+
+        workers = [
+            threading.Thread(target=buyer, args=(row,)) for row in range(1, threads + 1)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return time.perf_counter() - started, latencies, errors
+
+    def report(self, name, elapsed, latencies, errors):
+        self.stdout.write(f"{name}:")
+        self.stdout.write(
+            f"  {len(latencies)} purchases, {len(errors)} failed, "
+            f"{len(latencies) / elapsed:.1f} purchases/s"
+        )
+        if len(latencies) > 1:
+            quantiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f"  latency p50 {quantiles[49] * 1000:.1f} ms, "
+                f"p99 {quantiles[98] * 1000:.1f} ms"
+            )
+        if errors:
+            self.stdout.write(f"  first error: {errors[0]}")
+
+    def handle(self, *args, **options):
+        if connections["default"].vendor != "sqlite":
+            raise CommandError("The default database is not SQLite.")
+
+        for name, profile in self.get_profiles().items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "benchmark.sqlite3")
+                with self.scratch_database(path, profile["timeout"]), override_settings(
+                    SQLITE_PRAGMAS=profile["pragmas"],
+                    SQLITE_SERIALIZE_WRITES=profile["serialize"],
+                ):
+                    call_command("migrate", verbosity=0)
+                    self.report(
+                        name,
+                        *self.run_purchases(
+                            options["threads"], options["purchases"], options["seats"]
+                        ),
+                    )
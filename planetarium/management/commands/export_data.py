@@ -0,0 +1,64 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from planetarium.exports import EXPORTS, FORMATS, export_chunks
+
+
+def moment(value):
+    """ISO date or datetime argument as an aware datetime."""
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = day and datetime.combine(day, time.min)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise CommandError(f"{value!r} is not an ISO 8601 date or datetime.")
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+class Command(BaseCommand):
+    """Django command to export tickets, reservations or show sessions"""
+
+    help = "Stream a CSV or NDJSON export to a file or to stdout."
+
+    def add_arguments(self, parser):
+        parser.add_argument("export", choices=sorted(EXPORTS))
+        parser.add_argument("--type", choices=sorted(FORMATS), default="csv")
+        parser.add_argument("--from", dest="start", help="Rows at or after this time.")
+        parser.add_argument("--to", dest="end", help="Rows before this time.")
+        parser.add_argument("--dome", type=int, help="PlanetariumDome id.")
+        parser.add_argument("--gzip", action="store_true", help="Gzip the output.")
+        parser.add_argument("--output", "-o", help="File to write instead of stdout.")
+
+    def handle(self, *args, **options):
+        chunks = export_chunks(
+            options["export"],
+            options["type"],
+            options["gzip"],
+            start=options["start"] and moment(options["start"]),
+            end=options["end"] and moment(options["end"]),
+            dome_id=options["dome"],
+        )
+
+        if options["output"]:
+            with open(options["output"], "wb") as output:
+                for chunk in chunks:
+                    output.write(chunk)
+            self.stderr.write(f"Exported {options['export']} to {options['output']}.")
+            return
+
+        buffer = getattr(self.stdout, "buffer", None)
+        if buffer is None and options["gzip"]:
+            raise CommandError("Use --output for gzip exports.")
+        for chunk in chunks:
+            if buffer is None:
+                self.stdout.write(chunk.decode(), ending="")
+            else:
+                buffer.write(chunk)
+        if buffer is not None:
+            buffer.flush()
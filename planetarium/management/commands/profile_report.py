@@ -0,0 +1,100 @@
+import json
+import pstats
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from planetarium.profiling import view_of
+
+
+class Command(BaseCommand):
+    """Django command to rank the hot spots of the sampled profiles per view"""
+
+    help = (
+        "Merge the cProfile and tracemalloc profiles of PROFILING_DIR per view "
+        "and print the functions with the most own time and the allocation "
+        "sites holding the most memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=None, help="Defaults to PROFILING_DIR.")
+        parser.add_argument(
+            "--view", help="Only this view, e.g. planetarium:ticket-list."
+        )
+        parser.add_argument("--limit", type=int, default=15, help="Rows per view.")
+        parser.add_argument(
+            "--sort",
+            choices=("tottime", "cumtime"),
+            default="tottime",
+            help="Rank by own time or by time including callees.",
+        )
+
+    def collect(self, directory, pattern, view):
+        files = defaultdict(list)
+        for path in sorted(directory.glob(pattern)):
+            name = view_of(path)
+            if view is None or name == view.replace(":", "."):
+                files[name].append(path)
+        return files
+
+    def report_cpu(self, view, paths, limit, sort):
+        stats = pstats.Stats(*(str(path) for path in paths))
+        column = 2 if sort == "tottime" else 3
+        rows = sorted(stats.stats.items(), key=lambda item: -item[1][column])
+        requests = len(paths)
+
+        self.stdout.write(
+            f"{view}: {requests} profiles, "
+            f"{stats.total_tt / requests * 1000:.1f} ms per request"
+        )
+        self.stdout.write(
+            f"  {'calls/req':>10} {'own ms/req':>11} {'cum ms/req':>11}  function"
+        )
+        for (filename, line, function), (_, calls, own, cumulative, _) in rows[:limit]:
+            self.stdout.write(
+                f"  {calls / requests:>10.1f} {own / requests * 1000:>11.2f} "
+                f"{cumulative / requests * 1000:>11.2f}  "
+                f"{function} ({filename}:{line})"
+            )
+
+    def report_memory(self, view, paths, limit):
+        profiles = [json.loads(path.read_text()) for path in paths]
+        requests = len(profiles)
+        sizes = defaultdict(int)
+        counts = defaultdict(int)
+        for profile in profiles:
+            for site in profile["sites"]:
+                sizes[site["site"]] += site["size"]
+                counts[site["site"]] += site["count"]
+
+        peaks = [profile["peak"] for profile in profiles]
+        self.stdout.write(
+            f"{view}: {requests} memory profiles, peak "
+            f"{sum(peaks) / requests / 1024:.0f} KiB per request, "
+            f"max {max(peaks) / 1024:.0f} KiB"
+        )
+        self.stdout.write(f"  {'KiB/req':>9} {'blocks/req':>11}  allocation site")
+        for site, size in sorted(sizes.items(), key=lambda item: -item[1])[:limit]:
+            self.stdout.write(
+                f"  {size / requests / 1024:>9.1f} "
+                f"{counts[site] / requests:>11.1f}  {site}"
+            )
+
+    def handle(self, *args, **options):
+        directory = Path(options["dir"] or settings.PROFILING_DIR)
+        if not directory.is_dir():
+            raise CommandError(f"No profiles in {directory}.")
+
+        cpu = self.collect(directory, "*.prof", options["view"])
+        memory = self.collect(directory, "*.mem.json", options["view"])
+        if not cpu and not memory:
+            raise CommandError(f"No profiles in {directory}.")
+
+        for view, paths in sorted(cpu.items()):
+            self.report_cpu(view, paths, options["limit"], options["sort"])
+            self.stdout.write("")
+        for view, paths in sorted(memory.items()):
+            self.report_memory(view, paths, options["limit"])
+            self.stdout.write("")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from planetarium.reports import rebuild_summaries
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the daily sales summaries"""
+
+    help = (
+        "Recompute every DailySales row from the show sessions and tickets, "
+        "e.g. after bulk imports."
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_summaries()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily sales rows."))
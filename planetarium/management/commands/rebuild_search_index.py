@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from planetarium.cache import bump_versions
+from planetarium.models import AstronomyShow
+from planetarium.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the astronomy show search index"""
+
+    help = "Reindex every AstronomyShow in the configured search backend."
+
+    def handle(self, *args, **options):
+        indexed = get_search_backend().rebuild()
+        bump_versions(AstronomyShow)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} astronomy shows."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from planetarium.booking import recount_ticket_counters, recount_reservation_totals
+
+
+class Command(BaseCommand):
+    """Django command to repair the ticket counters and reservation totals"""
+
+    help = (
+        "Recompute tickets_sold/tickets_available of every show session and "
+        "ticket_count/total_price of every reservation."
+    )
+
+    def handle(self, *args, **options):
+        repaired = recount_ticket_counters()
+        self.stdout.write(
+            self.style.SUCCESS(f"Repaired counters of {repaired} show sessions.")
+        )
+        repaired = recount_reservation_totals()
+        self.stdout.write(
+            self.style.SUCCESS(f"Repaired totals of {repaired} reservations.")
+        )
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from planetarium.booking import sweep_expired_holds
+
+
+class Command(BaseCommand):
+    """Django command to delete expired seat holds"""
+
+    help = "Delete expired seat holds, once or every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep sweeping every N seconds instead of running once.",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            deleted = sweep_expired_holds()
+            self.stdout.write(f"Deleted {deleted} expired seat holds.")
+
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,221 @@
+import threading
+import weakref
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+# answered from the response cache, as opposed to "miss"
+CACHE_HITS = ("hit", "stale", "wait")
+
+
+class Shard:
+    """Metrics of one thread, written by that thread only."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def merge(self, other):
+        for key, value in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, series in other.histograms.items():
+            total = self.histograms.setdefault(key, [0] * len(series))
+            for index, value in enumerate(series):
+                total[index] += value
+
+
+class Registry:
+    """In-process counters and histograms, one shard per thread.
+
+    Recording touches the shard of the calling thread only, so it takes no
+    lock; shards are merged when /metrics is scraped. Shards of finished
+    threads are folded into ``retired``, so that counters never go down and
+    the shard list stays as long as the live threads. Every process (worker)
+    has its own registry.
+    """
+
+    def __init__(self):
+        self.families = {}
+        # (weak reference to the thread, its shard)
+        self.shards = []
+        self.retired = Shard()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self.families[name] = (kind, help_text, buckets)
+
+    def shard(self) -> Shard:
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = Shard()
+            with self.lock:
+                self.retire_finished()
+                self.shards.append((weakref.ref(threading.current_thread()), shard))
+            return shard
+
+    def retire_finished(self):
+        """Fold the shards of finished threads into ``retired``, under lock."""
+        live = []
+        for reference, shard in self.shards:
+            thread = reference()
+            if thread is not None and thread.is_alive():
+                live.append((reference, shard))
+            else:
+                self.retired.merge(shard)
+        self.shards = live
+
+    def inc(self, name, amount=1, **labels):
+        counters = self.shard().counters
+        key = (name, tuple(sorted(labels.items())))
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        histograms = self.shard().histograms
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self.families[name][2]
+        # per-bucket counts, the +Inf bucket, then the sum
+        series = histograms.get(key)
+        if series is None:
+            series = histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+        series[bisect_left(buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self):
+        """Counters and histograms of every shard, summed per series."""
+        with self.lock:
+            self.retire_finished()
+            counters = dict(self.retired.counters)
+            histograms = {
+                key: list(series) for key, series in self.retired.histograms.items()
+            }
+            shards = [shard for _, shard in self.shards]
+        for shard in shards:
+            for key, value in dict(shard.counters).items():
+                counters[key] = counters.get(key, 0) + value
+            for key, series in dict(shard.histograms).items():
+                total = histograms.setdefault(key, [0] * len(series))
+                for index, value in enumerate(list(series)):
+                    total[index] += value
+        return counters, histograms
+
+    def render(self) -> str:
+        counters, histograms = self.collect()
+        gauges = {
+            ("response_cache_hit_ratio", ()): cache_hit_ratio(counters),
+        }
+        lines = []
+        for name, (kind, help_text, buckets) in self.families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (series_name, labels), series in sorted(histograms.items()):
+                    if series_name == name:
+                        lines.extend(histogram_lines(name, labels, buckets, series))
+                continue
+            values = counters if kind == "counter" else gauges
+            for (series_name, labels), value in sorted(values.items()):
+                if series_name == name:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{%s}" % ",".join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+def histogram_lines(name, labels, buckets, series):
+    cumulative = 0
+    for bound, count in zip((*buckets, "+Inf"), series):
+        cumulative += count
+        yield f"{name}_bucket{format_labels((*labels, ('le', bound)))} {cumulative}"
+    yield f"{name}_sum{format_labels(labels)} {series[-1]}"
+    yield f"{name}_count{format_labels(labels)} {cumulative}"
+
+
+def cache_hit_ratio(counters) -> float:
+    results = {
+        dict(labels)["result"]: value
+        for (name, labels), value in counters.items()
+        if name == "response_cache_requests_total"
+    }
+    total = sum(results.values())
+    if not total:
+        return 0.0
+    return sum(results.get(result, 0) for result in CACHE_HITS) / total
+
+
+registry = Registry()
+registry.describe(
+    "http_requests_total", "counter", "Requests by route, method and status."
+)
+registry.describe(
+    "http_request_duration_seconds",
+    "histogram",
+    "Request latency by route.",
+    LATENCY_BUCKETS,
+)
+registry.describe(
+    "db_queries_per_request",
+    "histogram",
+    "Database queries per request by route.",
+    QUERY_BUCKETS,
+)
+registry.describe(
+    "db_duration_seconds",
+    "histogram",
+    "Database time per request by route.",
+    LATENCY_BUCKETS,
+)
+registry.describe(
+    "response_cache_requests_total",
+    "counter",
+    "Response cache lookups by result (hit, stale, wait, miss).",
+)
+registry.describe(
+    "response_cache_hit_ratio",
+    "gauge",
+    "Share of response cache lookups answered without computing.",
+)
+registry.describe("seats_sold_total", "counter", "Tickets sold.")
+registry.describe(
+    "booking_conflicts_total",
+    "counter",
+    "Purchases and holds refused because seats were taken or held.",
+)
+registry.describe("holds_created_total", "counter", "Seats put on hold.")
+registry.describe("holds_expired_total", "counter", "Expired seat holds deleted.")
+
+
+def record_request(request, response, timings):
+    """Count a request finished by ServerTimingMiddleware."""
+    match = request.resolver_match
+    route = match.view_name if match else "unmatched"
+    registry.inc(
+        "http_requests_total",
+        route=route,
+        method=request.method,
+        status=response.status_code,
+    )
+    registry.observe("http_request_duration_seconds", timings.elapsed, route=route)
+    registry.observe("db_queries_per_request", timings.queries, route=route)
+    registry.observe("db_duration_seconds", timings.db_time, route=route)
+
+
+def metrics_view(request):
+    """Text exposition of the registry, for the scrapers in METRICS_ALLOWED_IPS."""
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
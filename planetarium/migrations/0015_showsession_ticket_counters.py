@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-17 04:49
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_ticket_counters(apps, schema_editor):
+    ShowSession = apps.get_model("planetarium", "ShowSession")
+    Ticket = apps.get_model("planetarium", "Ticket")
+
+    sold = dict(
+        Ticket.objects.order_by()
+        .values("show_session")
+        .annotate(sold=Count("id"))
+        .values_list("show_session", "sold")
+    )
+    sessions = list(ShowSession.objects.select_related("planetarium_dome"))
+    for session in sessions:
+        dome = session.planetarium_dome
+        session.tickets_sold = sold.get(session.id, 0)
+        session.tickets_available = dome.rows * dome.seats_in_row - session.tickets_sold
+    ShowSession.objects.bulk_update(
+        sessions, ["tickets_sold", "tickets_available"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planetarium", "0014_seathold"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="showsession",
+            name="tickets_available",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="showsession",
+            name="tickets_sold",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_ticket_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+FTS_TABLE = "planetarium_astronomyshow_fts"
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    AstronomyShow = apps.get_model("planetarium", "AstronomyShow")
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        f"USING fts5(title, description, themes, "
+        f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    for show in AstronomyShow.objects.prefetch_related("theme"):
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, themes) "
+            f"VALUES (%s, %s, %s, %s)",
+            [
+                show.id,
+                show.title,
+                show.description,
+                " ".join(theme.name for theme in show.theme.all()),
+            ],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planetarium", "0015_showsession_ticket_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
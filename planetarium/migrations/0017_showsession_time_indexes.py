@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-17 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planetarium", "0016_astronomyshow_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="showsession",
+            index=models.Index(fields=["show_time"], name="showsession_time_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="showsession",
+            index=models.Index(
+                fields=["planetarium_dome", "show_time"],
+                name="showsession_dome_time_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="showsession",
+            index=models.Index(
+                fields=["astronomy_show", "show_time"], name="showsession_show_time_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-17 05:01
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_reservation_totals(apps, schema_editor):
+    Reservation = apps.get_model("planetarium", "Reservation")
+    Ticket = apps.get_model("planetarium", "Ticket")
+
+    totals = {
+        reservation_id: (ticket_count, total_price)
+        for reservation_id, ticket_count, total_price in Ticket.objects.order_by()
+        .values("reservation")
+        .annotate(
+            ticket_count=Count("id"),
+            total_price=Sum("show_session__planetarium_dome__price_per_seat"),
+        )
+        .values_list("reservation", "ticket_count", "total_price")
+    }
+    reservations = list(Reservation.objects.filter(id__in=totals))
+    for reservation in reservations:
+        reservation.ticket_count, reservation.total_price = totals[reservation.id]
+    Reservation.objects.bulk_update(
+        reservations, ["ticket_count", "total_price"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planetarium", "0017_showsession_time_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reservation",
+            name="ticket_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="reservation",
+            name="total_price",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=8
+            ),
+        ),
+        migrations.RunPython(fill_reservation_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.0.6 on 2026-10-17 05:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_daily_sales(apps, schema_editor):
+    DailySales = apps.get_model("planetarium", "DailySales")
+    ShowSession = apps.get_model("planetarium", "ShowSession")
+    Ticket = apps.get_model("planetarium", "Ticket")
+
+    summaries = {}
+    for row in (
+        ShowSession.objects.order_by()
+        .annotate(day=TruncDate("show_time"))
+        .values("day", "astronomy_show", "planetarium_dome")
+        .annotate(
+            sessions=Count("id"),
+            capacity=Sum(
+                F("planetarium_dome__rows") * F("planetarium_dome__seats_in_row")
+            ),
+        )
+    ):
+        summaries[(row["day"], row["astronomy_show"], row["planetarium_dome"])] = (
+            DailySales(
+                day=row["day"],
+                astronomy_show_id=row["astronomy_show"],
+                planetarium_dome_id=row["planetarium_dome"],
+                sessions=row["sessions"],
+                capacity=row["capacity"],
+            )
+        )
+    for day, show_id, dome_id, sold_seats, revenue in (
+        Ticket.objects.order_by()
+        .annotate(day=TruncDate("show_session__show_time"))
+        .values("day", "show_session__astronomy_show", "show_session__planetarium_dome")
+        .annotate(
+            sold_seats=Count("id"),
+            revenue=Sum("show_session__planetarium_dome__price_per_seat"),
+        )
+        .values_list(
+            "day",
+            "show_session__astronomy_show",
+            "show_session__planetarium_dome",
+            "sold_seats",
+            "revenue",
+        )
+    ):
+        summary = summaries[(day, show_id, dome_id)]
+        summary.sold_seats, summary.revenue = sold_seats, revenue
+    DailySales.objects.bulk_create(summaries.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planetarium", "0019_catalog_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("sessions", models.IntegerField(default=0)),
+                ("capacity", models.IntegerField(default=0)),
+                ("sold_seats", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "astronomy_show",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales",
+                        to="planetarium.astronomyshow",
+                    ),
+                ),
+                (
+                    "planetarium_dome",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales",
+                        to="planetarium.planetariumdome",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Daily Sales",
+                "verbose_name_plural": "Daily Sales",
+                "ordering": ["day", "id"],
+                "indexes": [
+                    models.Index(
+                        fields=["planetarium_dome", "day"],
+                        name="dailysales_dome_day_idx",
+                    ),
+                    models.Index(
+                        fields=["astronomy_show", "day"], name="dailysales_show_day_idx"
+                    ),
+                ],
+                "unique_together": {("day", "astronomy_show", "planetarium_dome")},
+            },
+        ),
+        migrations.RunPython(fill_daily_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-17 07:10
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_ticket_prices(apps, schema_editor):
+    PlanetariumDome = apps.get_model("planetarium", "PlanetariumDome")
+    Ticket = apps.get_model("planetarium", "Ticket")
+
+    # the price at the time of sale is unknown, the current one is the best guess
+    Ticket.objects.update(
+        price=Subquery(
+            PlanetariumDome.objects.filter(sessions=OuterRef("show_session")).values(
+                "price_per_seat"
+            )[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planetarium", "0020_daily_sales"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ticket",
+            name="price",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=6
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_ticket_prices, migrations.RunPython.noop),
+    ]
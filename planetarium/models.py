@@ -4,12 +4,14 @@ from datetime import datetime
 
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import F
 from django.conf import settings
 from django.utils.text import slugify
 
 
 class ShowTheme(models.Model):
     name = models.CharField(max_length=255, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -31,6 +33,7 @@ class AstronomyShow(models.Model):
     description = models.TextField(max_length=400)
     theme = models.ManyToManyField(ShowTheme, related_name="shows")
     image = models.ImageField(null=True, upload_to=show_image_file_path)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
@@ -46,6 +49,7 @@ class PlanetariumDome(models.Model):
     rows = models.IntegerField()
     seats_in_row = models.IntegerField()
     price_per_seat = models.DecimalField(max_digits=6, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -54,6 +58,10 @@ class PlanetariumDome(models.Model):
     def capacity(self) -> int:
         return self.rows * self.seats_in_row
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.sessions.update(tickets_available=self.capacity - F("tickets_sold"))
+
     class Meta:
         verbose_name = "Planetarium"
         verbose_name_plural = "Planetariums"
@@ -69,6 +77,11 @@ class ShowSession(models.Model):
     show_time = models.DateTimeField(
         help_text="Enter the show time in the format YYYY-MM-DD HH:MM:SS"
     )
+    tickets_sold = models.IntegerField(default=0, editable=False)
+    tickets_available = models.IntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTER_FIELDS = ("tickets_sold", "tickets_available")
 
     @property
     def info(self):
@@ -90,13 +103,59 @@ class ShowSession(models.Model):
             f"{show_time_obj.strftime('%Y-%m-%d %H:%M:%S')}"
         )
 
+    def save(self, *args, **kwargs):
+        # The counters are maintained with F() updates by concurrent sales, so
+        # a stale instance must never write them back.
+        if self._state.adding:
+            self.tickets_available = self.planetarium_dome.capacity - self.tickets_sold
+            return super().save(*args, **kwargs)
+
+        if kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        ShowSession.objects.filter(pk=self.pk).update(
+            tickets_available=self.planetarium_dome.capacity - F("tickets_sold")
+        )
+
     class Meta:
         ordering = ["show_time"]
+        indexes = [
+            models.Index(fields=["show_time"], name="showsession_time_idx"),
+            models.Index(
+                fields=["planetarium_dome", "show_time"],
+                name="showsession_dome_time_idx",
+            ),
+            models.Index(
+                fields=["astronomy_show", "show_time"],
+                name="showsession_show_time_idx",
+            ),
+        ]
 
 
 class Reservation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    ticket_count = models.IntegerField(default=0, editable=False)
+    total_price = models.DecimalField(
+        max_digits=8, decimal_places=2, default=0, editable=False
+    )
+
+    TOTAL_FIELDS = ["ticket_count", "total_price"]
+
+    def save(self, *args, **kwargs):
+        # totals are maintained with F() updates by planetarium.booking,
+        # a stale instance must never write them back.
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.TOTAL_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"#{self.id} Reserved by {self.user} at {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
@@ -111,6 +170,8 @@ class Ticket(models.Model):
     reservation = models.ForeignKey(
         Reservation, on_delete=models.CASCADE, related_name="tickets"
     )
+    # price_per_seat of the dome at the time of sale
+    price = models.DecimalField(max_digits=6, decimal_places=2, editable=False)
 
     @staticmethod
     def validate_ticket(row, seat, planetarium_dome, error_to_raise):
@@ -144,7 +205,8 @@ class Ticket(models.Model):
         using=None,
         update_fields=None,
     ):
-
+        if self.price is None:
+            self.price = self.show_session.planetarium_dome.price_per_seat
         self.full_clean()
         return super(Ticket, self).save(
             force_insert, force_update, using, update_fields
@@ -162,3 +224,63 @@ class Ticket(models.Model):
         unique_together = ("show_session", "row", "seat")
         verbose_name = "Ticket"
         verbose_name_plural = "Tickets"
+
+
+class SeatHold(models.Model):
+    token = models.UUIDField(default=uuid.uuid4, db_index=True)
+    show_session = models.ForeignKey(
+        ShowSession, on_delete=models.CASCADE, related_name="holds"
+    )
+    row = models.IntegerField()
+    seat = models.IntegerField()
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="seat_holds"
+    )
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Hold {self.row}x{self.seat} of {self.show_session} until {self.expires_at}"
+
+    class Meta:
+        unique_together = ("show_session", "row", "seat")
+        verbose_name = "Seat Hold"
+        verbose_name_plural = "Seat Holds"
+
+
+class DailySales(models.Model):
+    """Sales of a show in a dome on one day, kept by planetarium.reports."""
+
+    day = models.DateField()
+    astronomy_show = models.ForeignKey(
+        AstronomyShow, on_delete=models.CASCADE, related_name="daily_sales"
+    )
+    planetarium_dome = models.ForeignKey(
+        PlanetariumDome, on_delete=models.CASCADE, related_name="daily_sales"
+    )
+    sessions = models.IntegerField(default=0)
+    capacity = models.IntegerField(default=0)
+    sold_seats = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    SUMMARY_FIELDS = ("sessions", "capacity", "sold_seats", "revenue")
+
+    @property
+    def occupancy(self) -> float:
+        return self.sold_seats / self.capacity if self.capacity else 0.0
+
+    def __str__(self):
+        return f"{self.astronomy_show} in {self.planetarium_dome} on {self.day}"
+
+    class Meta:
+        ordering = ["day", "id"]
+        unique_together = ("day", "astronomy_show", "planetarium_dome")
+        indexes = [
+            models.Index(
+                fields=["planetarium_dome", "day"], name="dailysales_dome_day_idx"
+            ),
+            models.Index(
+                fields=["astronomy_show", "day"], name="dailysales_show_day_idx"
+            ),
+        ]
+        verbose_name = "Daily Sales"
+        verbose_name_plural = "Daily Sales"
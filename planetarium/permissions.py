@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from rest_framework.permissions import SAFE_METHODS, BasePermission
 
 
@@ -7,3 +9,17 @@ class IsAdminOrReadOnly(BasePermission):
             (request.method in SAFE_METHODS and request.user)
             or (request.user and request.user.is_staff)
         )
+
+
+class IsTelegramService(BasePermission):
+    """Read access for the telegram bot, by TELEGRAM_SERVICE_TOKEN."""
+
+    header = "X-Service-Token"
+
+    def has_permission(self, request, view):
+        token = settings.TELEGRAM_SERVICE_TOKEN
+        return bool(
+            token
+            and request.method in SAFE_METHODS
+            and constant_time_compare(request.headers.get(self.header, ""), token)
+        )
@@ -0,0 +1,156 @@
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from itertools import count
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.asgi import ASGIRequest
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+CPU = "cpu"
+MEMORY = "memory"
+# allocation sites kept per memory profile
+MEMORY_SITES = 50
+TRACEMALLOC_FRAMES = 10
+
+
+def profile_name(view_name, suffix) -> str:
+    """``<view>__<time>_<pid>.<suffix>``, the view as the report groups it."""
+    view = (view_name or "unmatched").replace(":", ".")
+    return f"{view}__{time.time_ns()}_{os.getpid()}.{suffix}"
+
+
+def view_of(path) -> str:
+    return Path(path).name.split("__", 1)[0]
+
+
+def rotate(directory, keep):
+    """Delete the oldest profiles beyond the ``keep`` newest."""
+    profiles = sorted(
+        (entry for entry in os.scandir(directory) if entry.is_file()),
+        key=lambda entry: entry.stat().st_mtime_ns,
+    )
+    for entry in profiles[: max(len(profiles) - keep, 0)]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+class ProfilingMiddleware:
+    """Profile sampled requests, see PROFILING_* in the settings.
+
+    One request in PROFILING_SAMPLE_RATE, every request to PROFILING_ROUTES
+    and every request from INTERNAL_IPS with a PROFILING_HEADER is profiled
+    with cProfile. Requests to PROFILING_MEMORY_ROUTES, or with the header
+    set to "memory", are traced with tracemalloc instead, one at a time.
+    Profiles land in PROFILING_DIR; ``manage.py profile_report`` ranks them
+    per view. WSGI only: cProfile sees the calling thread, which under ASGI
+    is the sync adapter rather than the view, so requests served by ASGI are
+    passed through unprofiled.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.routes = set(settings.PROFILING_ROUTES)
+        self.memory_routes = set(settings.PROFILING_MEMORY_ROUTES)
+        self.header = settings.PROFILING_HEADER
+        self.directory = Path(settings.PROFILING_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.requests = count()
+        # tracemalloc traces the whole process
+        self.memory_lock = threading.Lock()
+        self.warned_asgi = False
+
+    def get_mode(self, request):
+        requested = request.headers.get(self.header)
+        if requested and request.META.get("REMOTE_ADDR") in settings.INTERNAL_IPS:
+            return MEMORY if requested.lower() == MEMORY else CPU
+
+        if self.routes or self.memory_routes:
+            try:
+                view_name = resolve(request.path_info).view_name
+            except Resolver404:
+                view_name = None
+            if view_name in self.memory_routes:
+                return MEMORY
+            if view_name in self.routes:
+                return CPU
+
+        if self.sample_rate and next(self.requests) % self.sample_rate == 0:
+            return CPU
+        return None
+
+    def __call__(self, request):
+        if isinstance(request, ASGIRequest):
+            if not self.warned_asgi:
+                self.warned_asgi = True
+                logger.warning("ProfilingMiddleware is WSGI-only, not profiling.")
+            return self.get_response(request)
+        mode = self.get_mode(request)
+        if mode == CPU:
+            return self.profile_cpu(request)
+        if mode == MEMORY and self.memory_lock.acquire(blocking=False):
+            try:
+                return self.trace_memory(request)
+            finally:
+                self.memory_lock.release()
+        return self.get_response(request)
+
+    def profile_cpu(self, request):
+        profiler = cProfile.Profile()
+        response = profiler.runcall(self.get_response, request)
+        profiler.dump_stats(self.path_for(request, "prof"))
+        rotate(self.directory, settings.PROFILING_MAX_FILES)
+        return response
+
+    def trace_memory(self, request):
+        # leave alone a trace started with -X tracemalloc
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        try:
+            tracemalloc.reset_peak()
+            response = self.get_response(request)
+            # the response still holds the serialized data and the body
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started:
+                tracemalloc.stop()
+
+        sites = snapshot.filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        ).statistics("lineno")[:MEMORY_SITES]
+        profile = {
+            "path": request.path,
+            "current": current,
+            "peak": peak,
+            "sites": [
+                {
+                    "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size": stat.size,
+                    "count": stat.count,
+                }
+                for stat in sites
+            ],
+        }
+        with open(self.path_for(request, "mem.json"), "w") as file:
+            json.dump(profile, file)
+        rotate(self.directory, settings.PROFILING_MAX_FILES)
+        return response
+
+    def path_for(self, request, suffix) -> Path:
+        match = request.resolver_match
+        return self.directory / profile_name(match and match.view_name, suffix)
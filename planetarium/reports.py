@@ -0,0 +1,189 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from planetarium.cache import bump_versions
+from planetarium.models import DailySales, ShowSession, Ticket
+
+DOME_CAPACITY = F("planetarium_dome__rows") * F("planetarium_dome__seats_in_row")
+
+# output name -> lookup of the columns each dashboard grouping is keyed by
+GROUPS = {
+    "day": {"day": "day"},
+    "show": {"astronomy_show": "astronomy_show", "title": "astronomy_show__title"},
+    "dome": {"planetarium_dome": "planetarium_dome", "name": "planetarium_dome__name"},
+}
+
+
+def summary_key(show_session) -> dict:
+    # show_time is still the assigned string right after create(show_time="...")
+    show_time = ShowSession._meta.get_field("show_time").to_python(
+        show_session.show_time
+    )
+    if timezone.is_naive(show_time):
+        show_time = timezone.make_aware(show_time)
+    return {
+        "day": timezone.localdate(show_time),
+        "astronomy_show_id": show_session.astronomy_show_id,
+        "planetarium_dome_id": show_session.planetarium_dome_id,
+    }
+
+
+def refresh_summary(day, astronomy_show_id, planetarium_dome_id):
+    """Recompute one summary row from its sessions and tickets.
+
+    Revenue is the price paid per ticket. The row is dropped once the show
+    has no session left in the dome on ``day``.
+    """
+    key = {
+        "day": day,
+        "astronomy_show_id": astronomy_show_id,
+        "planetarium_dome_id": planetarium_dome_id,
+    }
+    sessions = ShowSession.objects.filter(
+        astronomy_show_id=astronomy_show_id,
+        planetarium_dome_id=planetarium_dome_id,
+        show_time__date=day,
+    )
+    totals = sessions.aggregate(sessions=Count("id"), capacity=Sum(DOME_CAPACITY))
+    sales = Ticket.objects.filter(show_session__in=sessions).aggregate(
+        sold_seats=Count("id"), revenue=Sum("price")
+    )
+    bump_versions(DailySales)
+
+    if not totals["sessions"]:
+        DailySales.objects.filter(**key).delete()
+        return None
+    summary, _ = DailySales.objects.update_or_create(
+        **key,
+        defaults={
+            "sessions": totals["sessions"],
+            "capacity": totals["capacity"],
+            "sold_seats": sales["sold_seats"],
+            "revenue": sales["revenue"] or 0,
+        },
+    )
+    return summary
+
+
+def shift_summary(key, create=True, **deltas):
+    """Add ``deltas`` to the summary row of ``key`` with one UPDATE.
+
+    A row that does not exist yet is computed from the sessions instead,
+    unless ``create`` is false: removals must not bring back a row that a
+    cascading delete has just dropped.
+    """
+    updated = DailySales.objects.filter(**key).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated and create:
+        refresh_summary(**key)
+    bump_versions(DailySales)
+
+
+def count_sales(show_session, delta, amount):
+    """Shift the summary of ``show_session`` by ``delta`` tickets paid ``amount``."""
+    shift_summary(
+        summary_key(show_session),
+        create=delta > 0,
+        sold_seats=delta,
+        revenue=amount,
+    )
+
+
+def count_session(show_session, delta):
+    """Shift the summary of ``show_session`` by ``delta`` scheduled sessions."""
+    key = summary_key(show_session)
+    shift_summary(
+        key,
+        create=delta > 0,
+        sessions=delta,
+        capacity=show_session.planetarium_dome.capacity * delta,
+    )
+    DailySales.objects.filter(**key, sessions__lte=0).delete()
+
+
+def resize_dome(planetarium_dome):
+    """Follow a change of rows or seats per row of ``planetarium_dome``."""
+    if planetarium_dome.daily_sales.update(
+        capacity=F("sessions") * planetarium_dome.capacity
+    ):
+        bump_versions(DailySales)
+
+
+def rebuild_summaries() -> int:
+    """Replace every summary row with two GROUP BY queries.
+
+    Returns the number of rows written.
+    """
+    summaries = {}
+    for row in (
+        ShowSession.objects.order_by()
+        .annotate(day=TruncDate("show_time"))
+        .values("day", "astronomy_show", "planetarium_dome")
+        .annotate(sessions=Count("id"), capacity=Sum(DOME_CAPACITY))
+    ):
+        key = (row["day"], row["astronomy_show"], row["planetarium_dome"])
+        summaries[key] = DailySales(
+            day=row["day"],
+            astronomy_show_id=row["astronomy_show"],
+            planetarium_dome_id=row["planetarium_dome"],
+            sessions=row["sessions"],
+            capacity=row["capacity"],
+        )
+
+    for day, show_id, dome_id, sold_seats, revenue in (
+        Ticket.objects.order_by()
+        .annotate(day=TruncDate("show_session__show_time"))
+        .values("day", "show_session__astronomy_show", "show_session__planetarium_dome")
+        .annotate(sold_seats=Count("id"), revenue=Sum("price"))
+        .values_list(
+            "day",
+            "show_session__astronomy_show",
+            "show_session__planetarium_dome",
+            "sold_seats",
+            "revenue",
+        )
+    ):
+        summary = summaries[(day, show_id, dome_id)]
+        summary.sold_seats = sold_seats
+        summary.revenue = revenue
+
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        DailySales.objects.bulk_create(summaries.values(), batch_size=500)
+        bump_versions(DailySales)
+    return len(summaries)
+
+
+def sales_totals(queryset, group) -> list:
+    """Sum the summary rows of ``queryset`` per day, show or dome."""
+    columns = GROUPS[group]
+    lookups = list(columns.values())
+    totals = (
+        queryset.order_by()
+        .values(*lookups)
+        .annotate(
+            sessions_total=Sum("sessions"),
+            capacity_total=Sum("capacity"),
+            sold_seats_total=Sum("sold_seats"),
+            revenue_total=Sum("revenue"),
+        )
+        .order_by(*lookups)
+    )
+    return [
+        {
+            **{name: row[lookup] for name, lookup in columns.items()},
+            "sessions": row["sessions_total"],
+            "capacity": row["capacity_total"],
+            "sold_seats": row["sold_seats_total"],
+            "revenue": row["revenue_total"],
+            "occupancy": (
+                row["sold_seats_total"] / row["capacity_total"]
+                if row["capacity_total"]
+                else 0.0
+            ),
+        }
+        for row in totals
+    ]
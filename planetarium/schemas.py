@@ -6,11 +6,12 @@ from drf_spectacular.utils import (
     OpenApiExample,
 )
 
-from datetime import datetime
+from datetime import date, datetime
 from planetarium.serializers import (
     TicketSerializer,
     TicketListSerializer,
     TicketCreateSerializer,
+    TicketPurchaseSerializer,
     ShowSessionSerializer,
     ShowSessionListSerializer,
     PlanetariumDomeSerializer,
@@ -18,9 +19,64 @@ from planetarium.serializers import (
     AstronomyShowRetrieveSerializer,
     AstronomyShowListSerializer,
     ShowThemeSerializer,
+    SeatHoldSerializer,
+    DailySalesSerializer,
+    SalesTotalsSerializer,
 )
 
+FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        name="fields",
+        type=str,
+        description="Comma-separated fields to return, dotted paths for "
+        "nested objects (e.g. `id,show_time,astronomy_show.title`)",
+    ),
+    OpenApiParameter(
+        name="expand",
+        type=str,
+        description="Comma-separated relations to inline as objects "
+        "(e.g. `astronomy_show.theme`)",
+    ),
+]
+
 ticket_schema = extend_schema_view(
+    purchase=extend_schema(
+        request=TicketPurchaseSerializer,
+        responses={201: TicketPurchaseSerializer, 409: OpenApiTypes.OBJECT},
+        examples=[
+            OpenApiExample(
+                "Purchase Example",
+                summary="Buy several seats of one show session at once.",
+                description="Creates a Reservation and all Tickets in one "
+                "transaction. Responds 409 with the taken seats on conflict.",
+                value={
+                    "show_session": 1,
+                    "seats": [{"row": 3, "seat": 5}, {"row": 3, "seat": 6}],
+                },
+                request_only=True,
+            ),
+            OpenApiExample(
+                "Auto Allocate Example",
+                summary="Buy the best block of adjacent seats.",
+                value={"show_session": 1, "auto_allocate": True, "count": 4},
+                request_only=True,
+            ),
+            OpenApiExample(
+                "Purchase Response Example",
+                summary="Created reservation with its tickets.",
+                value={
+                    "show_session": 1,
+                    "reservation": 7,
+                    "tickets": [
+                        {"id": 21, "row": 3, "seat": 5},
+                        {"id": 22, "row": 3, "seat": 6},
+                    ],
+                    "total_price": "31.00",
+                },
+                response_only=True,
+            ),
+        ],
+    ),
     list=extend_schema(
         responses=TicketListSerializer,
         examples=[
@@ -166,18 +222,134 @@ reservation_schema = extend_schema_view(
     )
 )
 show_session_schema = extend_schema_view(
+    adjacent_seats=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="count",
+                type=int,
+                required=True,
+                description="Number of adjacent free seats needed in one row",
+            ),
+            OpenApiParameter(
+                name="from",
+                type=datetime,
+                description="Start of the time window (default: now)",
+            ),
+            OpenApiParameter(
+                name="to",
+                type=datetime,
+                description="End of the time window (default: from + 14 days)",
+            ),
+            OpenApiParameter(
+                name="show_id", type=int, description="Only this AstronomyShow"
+            ),
+            OpenApiParameter(
+                name="dome_id", type=int, description="Only this PlanetariumDome"
+            ),
+        ],
+        responses=ShowSessionListSerializer(many=True),
+        description="Sessions that still have `count` free seats together, "
+        "sorted by show time.",
+    ),
+    suggest=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="count",
+                type=int,
+                description="Number of adjacent seats in one row",
+            ),
+        ],
+        responses=OpenApiTypes.OBJECT,
+        description="Suggest the best block of adjacent free seats: centre rows "
+        "first, then the block closest to the centre of the row. "
+        "`seats` is empty when no such block exists.",
+        examples=[
+            OpenApiExample(
+                "Suggest Example",
+                summary="Three adjacent seats in the middle of row 5",
+                value={
+                    "show_session": 1,
+                    "count": 3,
+                    "seats": [[5, 9], [5, 10], [5, 11]],
+                },
+                response_only=True,
+            )
+        ],
+    ),
+    seats=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="encoding",
+                type=str,
+                enum=["bitset", "rle", "list"],
+                description="bitset: base64 little-endian bitmap, "
+                "bit (row - 1) * seats_in_row + seat - 1 is a taken seat. "
+                "rle: run lengths alternating free/taken, starting with free. "
+                "list: [row, seat] pairs of taken seats.",
+            ),
+        ],
+        responses=OpenApiTypes.OBJECT,
+        examples=[
+            OpenApiExample(
+                "Seat Map Example",
+                summary="Seat map of a 2x3 dome with seats 1x2 and 2x3 taken",
+                value={
+                    "show_session": 1,
+                    "rows": 2,
+                    "seats_in_row": 3,
+                    "capacity": 6,
+                    "taken": 2,
+                    "available": 4,
+                    "encoding": "rle",
+                    "seats": [1, 1, 3, 1],
+                },
+                response_only=True,
+            )
+        ],
+    ),
     list=extend_schema(
         parameters=[
             OpenApiParameter(
                 name="astronomy_show",
                 type=str,
-                description="Filter by the name of the AstronomyShow",
+                description="Filter by words of the AstronomyShow title, "
+                "description or themes",
             ),
             OpenApiParameter(
                 name="planetarium_dome",
                 type=str,
                 description="Filter by the name of the PlanetariumDome",
             ),
+            OpenApiParameter(
+                name="available",
+                type=bool,
+                description="Only sessions with (true) or without (false) free seats",
+            ),
+            OpenApiParameter(
+                name="min_free",
+                type=int,
+                description="Only sessions with at least this many free seats",
+            ),
+            OpenApiParameter(
+                name="from",
+                type=datetime,
+                description="Sessions at or after this time (default: now)",
+            ),
+            OpenApiParameter(
+                name="to", type=datetime, description="Sessions before this time"
+            ),
+            OpenApiParameter(
+                name="date",
+                type=OpenApiTypes.DATE,
+                description="Sessions on this day (YYYY-MM-DD)",
+            ),
+            OpenApiParameter(
+                name="show_id", type=int, description="Filter by AstronomyShow id"
+            ),
+            OpenApiParameter(
+                name="dome_id", type=int, description="Filter by PlanetariumDome id"
+            ),
+            *FIELDSET_PARAMETERS,
         ],
         responses=ShowSessionListSerializer(many=True),
         examples=[
@@ -192,6 +364,7 @@ show_session_schema = extend_schema_view(
                     "planetarium_dome": {"name": "Jupiter Planetarium"},
                     "date": "2023-10-10",
                     "time": "14:15",
+                    "tickets_available": 42,
                 },
             )
         ],
@@ -416,6 +589,23 @@ pl_dome_schema = extend_schema_view(
 )
 
 astronomy_show_schema = extend_schema_view(
+    search=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                type=str,
+                description="Words or word prefixes to look for in the title, "
+                "description and theme names.",
+            ),
+            OpenApiParameter(
+                name="limit",
+                type=int,
+                description="Maximum number of results (default 20, max 100).",
+            ),
+        ],
+        responses=AstronomyShowListSerializer(many=True),
+        description="Full-text search over astronomy shows, best match first.",
+    ),
     create=extend_schema(
         request=AstronomyShowSerializer,
         responses=AstronomyShowSerializer,
@@ -456,7 +646,10 @@ astronomy_show_schema = extend_schema_view(
         responses=AstronomyShowListSerializer,
         parameters=[
             OpenApiParameter(
-                name="show", type=str, description="Filter shows by title."
+                name="show",
+                type=str,
+                description="Filter shows by words (or word prefixes) of the "
+                "title, description or theme names.",
             )
         ],
         examples=[
@@ -557,3 +750,94 @@ show_theme_schema = extend_schema_view(
         ],
     ),
 )
+
+seat_hold_schema = extend_schema_view(
+    create=extend_schema(
+        request=SeatHoldSerializer,
+        responses={201: SeatHoldSerializer, 409: OpenApiTypes.OBJECT},
+        examples=[
+            OpenApiExample(
+                "Hold Example",
+                summary="Hold seats while the customer is in checkout.",
+                description="Held seats are unavailable to other customers "
+                "until the hold expires, is released or is confirmed.",
+                value={
+                    "show_session": 1,
+                    "seats": [{"row": 3, "seat": 5}, {"row": 3, "seat": 6}],
+                },
+                request_only=True,
+            )
+        ],
+    ),
+    list=extend_schema(responses=SeatHoldSerializer(many=True)),
+    destroy=extend_schema(
+        description="Release the held seats.", responses={204: None, 404: None}
+    ),
+    confirm=extend_schema(
+        request=None,
+        responses={201: TicketPurchaseSerializer, 404: None, 409: OpenApiTypes.OBJECT},
+        description="Buy the held seats.",
+    ),
+)
+export_schema = extend_schema_view(
+    list=extend_schema(
+        operation_id="planetarium_exports_list",
+        responses={200: {"type": "string"}},
+        description="Names of the available exports",
+    ),
+    retrieve=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="type",
+                type=str,
+                enum=["csv", "ndjson"],
+                description="Export format (default: csv)",
+            ),
+            OpenApiParameter(
+                name="from", type=datetime, description="Rows at or after this time"
+            ),
+            OpenApiParameter(
+                name="to", type=datetime, description="Rows before this time"
+            ),
+            OpenApiParameter(
+                name="dome_id", type=int, description="Filter by PlanetariumDome id"
+            ),
+            OpenApiParameter(
+                name="gzip", type=bool, description="Gzip the export on the fly"
+            ),
+        ],
+        responses={200: OpenApiTypes.BINARY},
+    ),
+)
+
+SALES_FILTER_PARAMETERS = [
+    OpenApiParameter(name="from", type=date, description="Days on or after this date"),
+    OpenApiParameter(name="to", type=date, description="Days on or before this date"),
+    OpenApiParameter(
+        name="show_id", type=int, description="Filter by AstronomyShow id"
+    ),
+    OpenApiParameter(
+        name="dome_id", type=int, description="Filter by PlanetariumDome id"
+    ),
+]
+
+sales_report_schema = extend_schema_view(
+    list=extend_schema(
+        parameters=SALES_FILTER_PARAMETERS,
+        responses=DailySalesSerializer(many=True),
+        description="Sold seats, revenue and occupancy per show, dome and day.",
+    ),
+    totals=extend_schema(
+        parameters=[
+            *SALES_FILTER_PARAMETERS,
+            OpenApiParameter(
+                name="group",
+                type=str,
+                enum=["day", "show", "dome"],
+                description="Sum the daily rows per day, show or dome "
+                "(default: show)",
+            ),
+        ],
+        responses=SalesTotalsSerializer(many=True),
+    ),
+)
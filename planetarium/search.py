@@ -0,0 +1,147 @@
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from planetarium.models import AstronomyShow
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class SearchBackend(ABC):
+    """Full-text search over AstronomyShow titles, descriptions and themes."""
+
+    @abstractmethod
+    def filter(self, queryset, query):
+        """Narrow an AstronomyShow queryset to the shows matching ``query``."""
+
+    @abstractmethod
+    def search(self, query, limit=20) -> list:
+        """Ids of the best ``limit`` shows matching ``query``, best first."""
+
+    def index(self, show_ids):
+        """Refresh the index entries of ``show_ids``, dropping deleted shows."""
+
+    def rebuild(self) -> int:
+        """Reindex every show and return how many were indexed."""
+        return 0
+
+
+class SimpleSearchBackend(SearchBackend):
+    """Unindexed fallback for databases without a full-text backend."""
+
+    def filter(self, queryset, query):
+        matches = Q()
+        for token in TOKEN_RE.findall(query):
+            matches &= (
+                Q(title__icontains=token)
+                | Q(description__icontains=token)
+                | Q(theme__name__icontains=token)
+            )
+        return queryset.filter(
+            id__in=AstronomyShow.objects.filter(matches).values("id")
+        )
+
+    def search(self, query, limit=20) -> list:
+        return list(
+            self.filter(AstronomyShow.objects.all(), query).values_list(
+                "id", flat=True
+            )[:limit]
+        )
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """SQLite FTS5 index with bm25 ranking and prefix matching.
+
+    The index lives in a standalone FTS5 table whose rowid is the show id;
+    it is created by the planetarium migrations.
+    """
+
+    table = "planetarium_astronomyshow_fts"
+    # bm25 column weights: title, description, themes
+    weights = (10.0, 1.0, 5.0)
+    batch_size = 500
+
+    def match_expression(self, query):
+        tokens = TOKEN_RE.findall(query)
+        return " ".join(f'"{token}"*' for token in tokens) or None
+
+    def filter(self, queryset, query):
+        expression = self.match_expression(query)
+        if expression is None:
+            return queryset.none()
+        return queryset.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s",
+                [expression],
+            )
+        )
+
+    def search(self, query, limit=20) -> list:
+        expression = self.match_expression(query)
+        if expression is None:
+            return []
+        weights = ", ".join(str(weight) for weight in self.weights)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY bm25({self.table}, {weights}) LIMIT %s",
+                [expression, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index(self, show_ids):
+        show_ids = list(show_ids)
+        if not show_ids:
+            return
+
+        documents = {
+            show_id: [title, description, []]
+            for show_id, title, description in AstronomyShow.objects.filter(
+                id__in=show_ids
+            ).values_list("id", "title", "description")
+        }
+        for show_id, theme in AstronomyShow.theme.through.objects.filter(
+            astronomyshow_id__in=show_ids
+        ).values_list("astronomyshow_id", "showtheme__name"):
+            documents[show_id][2].append(theme)
+
+        placeholders = ", ".join(["%s"] * len(show_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})",
+                show_ids,
+            )
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, title, description, themes) "
+                f"VALUES (%s, %s, %s, %s)",
+                [
+                    (show_id, title, description, " ".join(themes))
+                    for show_id, (title, description, themes) in documents.items()
+                ],
+            )
+
+    def rebuild(self) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+        show_ids = list(AstronomyShow.objects.values_list("id", flat=True))
+        for start in range(0, len(show_ids), self.batch_size):
+            self.index(show_ids[start : start + self.batch_size])
+        return len(show_ids)
+
+
+@lru_cache(maxsize=None)
+def get_search_backend() -> SearchBackend:
+    """Backend from PLANETARIUM_SEARCH_BACKEND, or FTS5 on SQLite."""
+    backend = getattr(settings, "PLANETARIUM_SEARCH_BACKEND", None)
+    if backend:
+        return import_string(backend)()
+    if connection.vendor == "sqlite":
+        return SQLiteFTS5Backend()
+    return SimpleSearchBackend()
@@ -0,0 +1,243 @@
+import base64
+from itertools import groupby
+
+from django.utils import timezone
+
+from planetarium.models import PlanetariumDome, Ticket, SeatHold
+
+
+class SeatMap:
+    """Occupancy bitmap of a single show session.
+
+    Seat ``(row, seat)`` is stored in bit ``(row - 1) * seats_in_row + seat - 1``
+    of one Python integer, so a 30x30 dome fits in 900 bits.
+    """
+
+    ENCODINGS = ("bitset", "rle", "list")
+
+    def __init__(self, rows, seats_in_row, bits=0):
+        self.rows = rows
+        self.seats_in_row = seats_in_row
+        self.bits = bits
+
+    @classmethod
+    def from_seats(cls, rows, seats_in_row, seats):
+        seat_map = cls(rows, seats_in_row)
+        for row, seat in seats:
+            seat_map.mark(row, seat)
+        return seat_map
+
+    @property
+    def capacity(self) -> int:
+        return self.rows * self.seats_in_row
+
+    @property
+    def taken(self) -> int:
+        return self.bits.bit_count()
+
+    @property
+    def available(self) -> int:
+        return self.capacity - self.taken
+
+    def index(self, row, seat) -> int:
+        return (row - 1) * self.seats_in_row + seat - 1
+
+    def mark(self, row, seat):
+        if 1 <= row <= self.rows and 1 <= seat <= self.seats_in_row:
+            self.bits |= 1 << self.index(row, seat)
+
+    def is_taken(self, row, seat) -> bool:
+        return bool(self.bits >> self.index(row, seat) & 1)
+
+    def row_bits(self, row) -> int:
+        """Taken seats of ``row``: bit ``seat - 1`` is set for a taken seat."""
+        full = (1 << self.seats_in_row) - 1
+        return self.bits >> (row - 1) * self.seats_in_row & full
+
+    def find_block(self, count):
+        """Return the best ``count`` adjacent free seats in one row, or None.
+
+        Rows are tried from the centre of the dome outwards and within a row
+        the block closest to the centre of the row wins. Each row is checked
+        with ``count - 1`` shift-and steps over its free-seat mask, so the
+        whole search is O(rows * seats_in_row).
+        """
+        if not 1 <= count <= self.seats_in_row:
+            return None
+
+        full = (1 << self.seats_in_row) - 1
+        for row in sorted(
+            range(1, self.rows + 1), key=lambda row: (abs(2 * row - self.rows - 1), row)
+        ):
+            starts = full & ~self.row_bits(row)
+            for _ in range(count - 1):
+                starts &= starts >> 1
+            if not starts:
+                continue
+
+            best = None
+            while starts:
+                low = starts & -starts
+                start = low.bit_length() - 1
+                score = abs(2 * start + count - self.seats_in_row)
+                if best is None or score < best[0]:
+                    best = (score, start)
+                starts ^= low
+            first_seat = best[1] + 1
+            return [(row, seat) for seat in range(first_seat, first_seat + count)]
+
+        return None
+
+    def to_bitset(self) -> str:
+        """Base64 of the bitmap, little-endian: seat 1x1 is bit 0 of byte 0."""
+        size = (self.capacity + 7) // 8
+        return base64.b64encode(self.bits.to_bytes(size, "little")).decode()
+
+    def to_rle(self) -> list:
+        """Run lengths in seat order, alternating free and taken, free first."""
+        flags = format(self.bits, "b").zfill(self.capacity)[::-1]
+        runs = [len(list(group)) for _, group in groupby(flags)]
+        if flags.startswith("1"):
+            runs.insert(0, 0)
+        return runs
+
+    def to_list(self) -> list:
+        bits = self.bits
+        seats_in_row = self.seats_in_row
+        taken = []
+        while bits:
+            low = bits & -bits
+            index = low.bit_length() - 1
+            taken.append([index // seats_in_row + 1, index % seats_in_row + 1])
+            bits ^= low
+        return taken
+
+    def to_representation(self, show_session_id, encoding="bitset"):
+        encoders = {
+            "bitset": self.to_bitset,
+            "rle": self.to_rle,
+            "list": self.to_list,
+        }
+        return {
+            "show_session": show_session_id,
+            "rows": self.rows,
+            "seats_in_row": self.seats_in_row,
+            "capacity": self.capacity,
+            "taken": self.taken,
+            "available": self.available,
+            "encoding": encoding,
+            "seats": encoders[encoding](),
+        }
+
+
+def occupied_seats(show_session_id):
+    """(row, seat) of sold and actively held seats of a session, in one query."""
+    tickets = (
+        Ticket.objects.filter(show_session_id=show_session_id)
+        .order_by()
+        .values_list("row", "seat")
+    )
+    holds = (
+        SeatHold.objects.filter(
+            show_session_id=show_session_id, expires_at__gt=timezone.now()
+        )
+        .order_by()
+        .values_list("row", "seat")
+    )
+    return tickets.union(holds, all=True)
+
+
+def occupied_seats_by_session(show_sessions):
+    """(show_session_id, row, seat) of sold and held seats of many sessions.
+
+    ``show_sessions`` may be a queryset, which is then used as a subquery.
+    """
+    tickets = (
+        Ticket.objects.filter(show_session__in=show_sessions)
+        .order_by()
+        .values_list("show_session_id", "row", "seat")
+    )
+    holds = (
+        SeatHold.objects.filter(
+            show_session__in=show_sessions, expires_at__gt=timezone.now()
+        )
+        .order_by()
+        .values_list("show_session_id", "row", "seat")
+    )
+    return tickets.union(holds, all=True)
+
+
+def sessions_with_free_block(sessions, occupied, count) -> set:
+    """Return the ids of ``sessions`` with ``count`` adjacent free seats in a row.
+
+    ``sessions`` yields (id, rows, seats_in_row) and ``occupied`` yields
+    (session_id, row, seat). Every grid is packed into one integer, each row in
+    ``stride`` bits ending with a zero separator bit and each session starting
+    on a byte boundary, so the contiguity test is ``count - 1`` shift-and steps
+    over all sessions at once.
+    """
+    sessions = [session for session in sessions if 1 <= count <= session[2]]
+    if not sessions:
+        return set()
+
+    stride = max(seats_in_row for _, _, seats_in_row in sessions) + 1
+    row_starts = {}
+    layout = {}
+    free = 0
+    position = 0
+    for session_id, rows, seats_in_row in sessions:
+        row_starts.setdefault(rows, ((1 << rows * stride) - 1) // ((1 << stride) - 1))
+        free |= row_starts[rows] * ((1 << seats_in_row) - 1) << position
+        layout[session_id] = (position, rows, seats_in_row)
+        position += (rows * stride + 7) // 8 * 8
+
+    taken = bytearray(position // 8)
+    for session_id, row, seat in occupied:
+        if session_id in layout:
+            start, rows, seats_in_row = layout[session_id]
+            if 1 <= row <= rows and 1 <= seat <= seats_in_row:
+                bit = start + (row - 1) * stride + seat - 1
+                taken[bit >> 3] |= 1 << (bit & 7)
+
+    starts = free & ~int.from_bytes(taken, "little")
+    for _ in range(count - 1):
+        starts &= starts >> 1
+
+    starts = starts.to_bytes(len(taken), "little")
+    matching = set()
+    for session_id, (start, rows, _) in layout.items():
+        first, last = start // 8, (start + rows * stride + 7) // 8
+        if starts.count(0, first, last) != last - first:
+            matching.add(session_id)
+    return matching
+
+
+def load_seat_map(show_session_id):
+    """Build the seat map of a session with two flat queries, or return None.
+
+    Seats under an active hold are marked as taken.
+    """
+    dome = (
+        PlanetariumDome.objects.filter(sessions=show_session_id)
+        .values_list("rows", "seats_in_row")
+        .first()
+    )
+    if dome is None:
+        return None
+
+    return SeatMap.from_seats(*dome, occupied_seats(show_session_id))
+
+
+async def aload_seat_map(show_session_id):
+    """load_seat_map() on the async ORM."""
+    dome = await (
+        PlanetariumDome.objects.filter(sessions=show_session_id)
+        .values_list("rows", "seats_in_row")
+        .afirst()
+    )
+    if dome is None:
+        return None
+
+    return SeatMap.from_seats(
+        *dome, [seat async for seat in occupied_seats(show_session_id)]
+    )
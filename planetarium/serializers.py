@@ -4,6 +4,14 @@ from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
 from rest_framework import serializers
 
+from planetarium.booking import (
+    create_tickets,
+    held_seats,
+    hold_seats,
+    purchase_best_available,
+    purchase_tickets,
+)
+from planetarium.fieldsets import DynamicFieldsMixin
 from planetarium.models import (
     ShowTheme,
     AstronomyShow,
@@ -11,10 +19,11 @@ from planetarium.models import (
     ShowSession,
     Reservation,
     Ticket,
+    DailySales,
 )
 
 
-class ShowThemeSerializer(serializers.ModelSerializer):
+class ShowThemeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     name = serializers.CharField(
         validators=[
             RegexValidator(
@@ -59,7 +68,7 @@ class AstronomyShowSerializer(serializers.ModelSerializer):
         fields = ("id", "title", "description", "theme", "image")
 
 
-class AstronomyShowListSerializer(serializers.ModelSerializer):
+class AstronomyShowListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     title = serializers.CharField(
         validators=[
             RegexValidator(
@@ -84,12 +93,16 @@ class AstronomyShowListSerializer(serializers.ModelSerializer):
 
     theme = serializers.SlugRelatedField(many=True, read_only=True, slug_field="name")
 
+    expandable_fields = {
+        "theme": (ShowThemeSerializer, {"many": True, "read_only": True}),
+    }
+
     class Meta:
         model = AstronomyShow
         fields = ("id", "title", "description", "theme")
 
 
-class AstronomyShowRetrieveSerializer(serializers.ModelSerializer):
+class AstronomyShowRetrieveSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     theme = ShowThemeSerializer(many=True, read_only=True)
 
     class Meta:
@@ -131,16 +144,29 @@ class PlanetariumDomeSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "rows", "seats_in_row", "capacity", "price_per_seat")
 
 
-class PlanetariumDomeListSerializer(serializers.ModelSerializer):
+class PlanetariumDomeListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    source_fields = {"capacity": ("rows", "seats_in_row")}
+
     class Meta:
         model = PlanetariumDome
         fields = ("id", "name", "capacity")
 
 
-class PlanetariumDomeRetrieveSerializer(serializers.ModelSerializer):
+class PlanetariumDomeRetrieveSerializer(
+    DynamicFieldsMixin, serializers.ModelSerializer
+):
+    source_fields = {"capacity": ("rows", "seats_in_row")}
+
     class Meta:
         model = PlanetariumDome
-        fields = ("id", "name", "rows", "seats_in_row", "capacity", "price_per_seat")
+        fields = (
+            "id",
+            "name",
+            "rows",
+            "seats_in_row",
+            "capacity",
+            "price_per_seat",
+        )
 
 
 class ShowSessionSerializer(serializers.ModelSerializer):
@@ -153,7 +179,7 @@ class ShowSessionSerializer(serializers.ModelSerializer):
         fields = ("id", "astronomy_show", "planetarium_dome", "show_time")
 
 
-class ShowSessionListSerializer(serializers.ModelSerializer):
+class ShowSessionListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     astronomy_show = serializers.SlugRelatedField(
         many=False, read_only=True, slug_field="title"
     )
@@ -162,18 +188,36 @@ class ShowSessionListSerializer(serializers.ModelSerializer):
     )
     show_time = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
 
+    expandable_fields = {
+        "astronomy_show": (AstronomyShowListSerializer, {"read_only": True}),
+        "planetarium_dome": (PlanetariumDomeRetrieveSerializer, {"read_only": True}),
+    }
+
     class Meta:
         model = ShowSession
-        fields = ("id", "astronomy_show", "planetarium_dome", "show_time")
+        fields = (
+            "id",
+            "astronomy_show",
+            "planetarium_dome",
+            "show_time",
+            "tickets_available",
+        )
 
 
-class ShowSessionRetrieveSerializer(serializers.ModelSerializer):
+class ShowSessionRetrieveSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     astronomy_show = AstronomyShowRetrieveSerializer(many=False, read_only=True)
     planetarium_dome = PlanetariumDomeRetrieveSerializer(many=False, read_only=True)
 
     class Meta:
         model = ShowSession
-        fields = ("id", "astronomy_show", "planetarium_dome", "show_time")
+        fields = (
+            "id",
+            "astronomy_show",
+            "planetarium_dome",
+            "show_time",
+            "tickets_sold",
+            "tickets_available",
+        )
 
 
 class ReservationSerializer(serializers.ModelSerializer):
@@ -186,19 +230,30 @@ class ReservationSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "user", "created_at"]
 
 
+class TicketSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Ticket
+        fields = ("id", "row", "seat", "show_session", "reservation")
+
+
+class ReservationTicketSerializer(serializers.ModelSerializer):
+    show_session_info = serializers.CharField(
+        source="show_session.info", read_only=True
+    )
+
+    class Meta:
+        model = Ticket
+        fields = ("id", "row", "seat", "show_session", "show_session_info")
+
+
 class ReservationListSerializer(serializers.ModelSerializer):
     user = serializers.SlugRelatedField(many=False, read_only=True, slug_field="email")
     created_at = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
+    tickets = ReservationTicketSerializer(many=True, read_only=True)
 
     class Meta:
         model = Reservation
-        fields = ("id", "user", "created_at")
-
-
-class TicketSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Ticket
-        fields = ("id", "row", "seat", "show_session", "reservation")
+        fields = ("id", "user", "created_at", "ticket_count", "total_price", "tickets")
 
 
 class TicketListSerializer(serializers.ModelSerializer):
@@ -207,9 +262,14 @@ class TicketListSerializer(serializers.ModelSerializer):
     )
     reservation_info = serializers.SerializerMethodField()
     total_price = serializers.DecimalField(
-        max_digits=6, decimal_places=2, read_only=True
+        source="reservation.total_price",
+        max_digits=8,
+        decimal_places=2,
+        read_only=True,
+    )
+    tickets = serializers.IntegerField(
+        source="reservation.ticket_count", read_only=True
     )
-    tickets = serializers.IntegerField(read_only=True)
 
     def get_reservation_info(self, obj):
         return {
@@ -248,10 +308,9 @@ class TicketCreateSerializer(serializers.ModelSerializer):
         seat = data.get("seat")
         show_session = data.get("show_session")
 
-        if Ticket.objects.filter(
-            show_session=show_session, row=row, seat=seat
-        ).exists():
-            raise ValidationError("This ticket already exists.")
+        request = self.context.get("request")
+        if held_seats(show_session, [(row, seat)], getattr(request, "user", None)):
+            raise ValidationError("This seat is held by another customer.")
 
         planetarium_dome = show_session.planetarium_dome
 
@@ -270,11 +329,142 @@ class TicketCreateSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        if Ticket.objects.filter(
-            show_session=validated_data["show_session"],
-            row=validated_data["row"],
-            seat=validated_data["seat"],
-        ).exists():
-            raise ValidationError("This ticket already exists.")
-
-        return Ticket.objects.create(**validated_data)
+        [ticket] = create_tickets(
+            validated_data["reservation"],
+            validated_data["show_session"],
+            [(validated_data["row"], validated_data["seat"])],
+        )
+        return ticket
+
+
+class SeatSerializer(serializers.Serializer):
+    row = serializers.IntegerField()
+    seat = serializers.IntegerField()
+
+
+class TicketSeatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Ticket
+        fields = ("id", "row", "seat")
+
+
+class SeatsRequestSerializer(serializers.Serializer):
+    show_session = serializers.PrimaryKeyRelatedField(
+        queryset=ShowSession.objects.select_related("planetarium_dome")
+    )
+    seats = SeatSerializer(many=True, allow_empty=False, write_only=True)
+
+    def validate(self, data):
+        planetarium_dome = data["show_session"].planetarium_dome
+        seats = [(seat["row"], seat["seat"]) for seat in data["seats"]]
+
+        if len(set(seats)) != len(seats):
+            raise serializers.ValidationError(
+                {"seats": "Each seat can be requested only once."}
+            )
+        for row, seat in seats:
+            Ticket.validate_ticket(
+                row, seat, planetarium_dome, serializers.ValidationError
+            )
+
+        data["seats"] = seats
+        return data
+
+
+class TicketPurchaseSerializer(SeatsRequestSerializer):
+    seats = SeatSerializer(
+        many=True, allow_empty=False, write_only=True, required=False
+    )
+    auto_allocate = serializers.BooleanField(
+        default=False,
+        write_only=True,
+        help_text="Let the server pick the best block of `count` adjacent seats.",
+    )
+    count = serializers.IntegerField(min_value=1, write_only=True, required=False)
+    reservation = serializers.IntegerField(source="reservation.id", read_only=True)
+    tickets = TicketSeatSerializer(many=True, read_only=True)
+    total_price = serializers.DecimalField(
+        max_digits=8, decimal_places=2, read_only=True
+    )
+
+    def validate(self, data):
+        if not data["auto_allocate"]:
+            if "seats" not in data:
+                raise serializers.ValidationError(
+                    {"seats": "This field is required without auto_allocate."}
+                )
+            return super().validate(data)
+
+        seats_in_row = data["show_session"].planetarium_dome.seats_in_row
+        if "count" not in data:
+            raise serializers.ValidationError(
+                {"count": "This field is required with auto_allocate."}
+            )
+        if data["count"] > seats_in_row:
+            raise serializers.ValidationError(
+                {"count": f"Must not exceed the seats in a row: {seats_in_row}."}
+            )
+        return data
+
+    def create(self, validated_data):
+        if validated_data["auto_allocate"]:
+            return purchase_best_available(
+                self.context["request"].user,
+                validated_data["show_session"],
+                validated_data["count"],
+            )
+        return purchase_tickets(
+            self.context["request"].user,
+            validated_data["show_session"],
+            validated_data["seats"],
+        )
+
+
+class SeatHoldSerializer(SeatsRequestSerializer):
+    token = serializers.UUIDField(read_only=True)
+    seats = SeatSerializer(many=True, allow_empty=False)
+    expires_at = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S", read_only=True)
+
+    def create(self, validated_data):
+        return hold_seats(
+            self.context["request"].user,
+            validated_data["show_session"],
+            validated_data["seats"],
+        )
+
+
+class DailySalesSerializer(serializers.ModelSerializer):
+    show_title = serializers.CharField(source="astronomy_show.title", read_only=True)
+    dome_name = serializers.CharField(source="planetarium_dome.name", read_only=True)
+    occupancy = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = DailySales
+        fields = (
+            "id",
+            "day",
+            "astronomy_show",
+            "show_title",
+            "planetarium_dome",
+            "dome_name",
+            "sessions",
+            "capacity",
+            "sold_seats",
+            "revenue",
+            "occupancy",
+        )
+
+
+class SalesTotalsSerializer(serializers.Serializer):
+    """Totals per ``group``: only the key fields of that group are present."""
+
+    day = serializers.DateField(read_only=True)
+    astronomy_show = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(read_only=True)
+    planetarium_dome = serializers.IntegerField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    sessions = serializers.IntegerField(read_only=True)
+    capacity = serializers.IntegerField(read_only=True)
+    sold_seats = serializers.IntegerField(read_only=True)
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    occupancy = serializers.FloatField(read_only=True)
@@ -0,0 +1,157 @@
+from django.db.models.signals import (
+    post_save,
+    post_delete,
+    pre_delete,
+    pre_save,
+    m2m_changed,
+)
+from django.db.models import QuerySet
+from django.dispatch import receiver
+
+from planetarium.booking import count_sold, count_reserved, release_tickets
+from planetarium.cache import bump_versions
+from planetarium.models import (
+    AstronomyShow,
+    PlanetariumDome,
+    Reservation,
+    ShowSession,
+    ShowTheme,
+    Ticket,
+)
+from planetarium.reports import (
+    count_sales,
+    count_session,
+    refresh_summary,
+    resize_dome,
+    summary_key,
+)
+from planetarium.search import get_search_backend
+
+
+def cascaded(origin) -> bool:
+    """Whether a ticket goes with the deletion of something else."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin is not None and model is not Ticket
+
+
+@receiver(post_save, sender=Ticket)
+def count_saved_ticket(sender, instance, created, raw=False, **kwargs):
+    # fixtures carry their own counters
+    if created and not raw:
+        count_sold(instance.show_session_id, 1)
+        count_reserved(instance.reservation_id, 1, instance.price)
+        count_sales(instance.show_session, 1, instance.price)
+
+
+@receiver(post_delete, sender=Ticket)
+def count_deleted_ticket(sender, instance, origin=None, **kwargs):
+    # cascades are counted once per reservation or session in pre_delete
+    if cascaded(origin):
+        return
+    count_sold(instance.show_session_id, -1)
+    count_reserved(instance.reservation_id, -1, -instance.price)
+    show_session = ShowSession.objects.filter(pk=instance.show_session_id).first()
+    if show_session is not None:
+        count_sales(show_session, -1, -instance.price)
+
+
+@receiver(pre_delete, sender=Reservation)
+@receiver(pre_delete, sender=ShowSession)
+def count_cascaded_tickets(sender, instance, **kwargs):
+    release_tickets(instance.tickets.all(), instance)
+
+
+@receiver(pre_save, sender=ShowSession)
+def collect_summary_key(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if not instance._state.adding:
+        previous = sender.objects.filter(pk=instance.pk).first()
+        instance._summary_key = previous and summary_key(previous)
+
+
+@receiver(post_save, sender=ShowSession)
+def count_saved_session(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        count_session(instance, 1)
+        return
+    # a moved session takes its tickets along, both days are recomputed
+    key = summary_key(instance)
+    previous_key = getattr(instance, "_summary_key", None)
+    if previous_key != key:
+        refresh_summary(**key)
+        if previous_key:
+            refresh_summary(**previous_key)
+
+
+@receiver(post_delete, sender=ShowSession)
+def count_deleted_session(sender, instance, **kwargs):
+    count_session(instance, -1)
+
+
+@receiver(post_save, sender=PlanetariumDome)
+def resize_dome_summaries(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        resize_dome(instance)
+
+
+@receiver(post_save, sender=AstronomyShow)
+@receiver(post_delete, sender=AstronomyShow)
+def index_show(sender, instance, **kwargs):
+    get_search_backend().index([instance.pk])
+
+
+@receiver(m2m_changed, sender=AstronomyShow.theme.through)
+def index_show_themes(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith("post_"):
+            get_search_backend().index([instance.pk])
+    elif action == "pre_clear":
+        collect_theme_shows(sender, instance)
+    elif action == "post_clear":
+        get_search_backend().index(instance._indexed_show_ids)
+    elif action.startswith("post_"):
+        get_search_backend().index(pk_set)
+
+
+@receiver(post_save, sender=ShowTheme)
+def index_theme_shows(sender, instance, created, **kwargs):
+    if not created:
+        get_search_backend().index(instance.shows.values_list("id", flat=True))
+
+
+@receiver(pre_delete, sender=ShowTheme)
+def collect_theme_shows(sender, instance, **kwargs):
+    instance._indexed_show_ids = list(instance.shows.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=ShowTheme)
+def index_deleted_theme_shows(sender, instance, **kwargs):
+    get_search_backend().index(instance._indexed_show_ids)
+
+
+@receiver(post_save, sender=ShowTheme)
+@receiver(post_delete, sender=ShowTheme)
+@receiver(post_save, sender=AstronomyShow)
+@receiver(post_delete, sender=AstronomyShow)
+@receiver(post_save, sender=PlanetariumDome)
+@receiver(post_delete, sender=PlanetariumDome)
+@receiver(post_save, sender=ShowSession)
+@receiver(post_delete, sender=ShowSession)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def invalidate_cached_responses(sender, origin=None, **kwargs):
+    # release_tickets() has bumped Ticket once for a whole cascade
+    if sender is Ticket and cascaded(origin):
+        return
+    bump_versions(sender)
+
+
+@receiver(m2m_changed, sender=AstronomyShow.theme.through)
+def invalidate_cached_show_themes(sender, action, **kwargs):
+    if action.startswith("post_"):
+        bump_versions(AstronomyShow)
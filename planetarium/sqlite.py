@@ -0,0 +1,60 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# re-entrant: purchase_tickets() runs create_tickets() under the same lock
+_write_lock = threading.RLock()
+
+
+class WriteQueueTimeout(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many bookings at once, please retry."
+    default_code = "write_queue_timeout"
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """``connection_created`` receiver applying SQLITE_PRAGMAS."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@contextmanager
+def write_lock():
+    """Queue the writes of this process on one lock instead of on SQLite.
+
+    SQLite has a single writer, and a transaction that read before writing
+    fails with "database is locked" at once, whatever the busy timeout, when
+    another writer got in first. Taking the lock before the transaction
+    starts turns that failure into a short wait.
+    """
+    if connection.vendor != "sqlite" or not getattr(
+        settings, "SQLITE_SERIALIZE_WRITES", False
+    ):
+        yield
+        return
+
+    if not _write_lock.acquire(timeout=settings.SQLITE_WRITE_LOCK_TIMEOUT):
+        raise WriteQueueTimeout()
+    try:
+        yield
+    finally:
+        _write_lock.release()
+
+
+def serialized_writes(func):
+    """Run ``func`` under write_lock()."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with write_lock():
+            return func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,65 @@
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+
+from planetarium.renderers import FastJSONRenderer
+
+TRUE_VALUES = ("1", "true", "yes")
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class StreamingListMixin:
+    """``?stream=1`` turns the list action into one unpaginated JSON array.
+
+    Rows are read with ``queryset.iterator(chunk_size=stream_chunk_size)``
+    and every chunk is serialized and encoded on its own, so memory stays
+    bounded by the chunk size and the first bytes go out immediately.
+    """
+
+    stream_param = "stream"
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get(self.stream_param, "").lower() in TRUE_VALUES:
+            return self.stream_list(request)
+        return super().list(request, *args, **kwargs)
+
+    def serialized_chunks(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = getattr(self.paginator, "ordering", None)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        size = self.stream_chunk_size
+
+        if getattr(self, "use_fast_list", None) and self.use_fast_list(request):
+            serializer = self.fast_list_serializer()
+            rows = (
+                queryset.select_related(None)
+                .prefetch_related(None)
+                .values(*serializer.values)
+                .iterator(chunk_size=size)
+            )
+            for chunk in chunked(rows, size):
+                yield serializer.to_representation(chunk)
+        else:
+            for chunk in chunked(queryset.iterator(chunk_size=size), size):
+                yield self.get_serializer(chunk, many=True).data
+
+    def stream_list(self, request):
+        renderer = FastJSONRenderer()
+
+        def content():
+            yield b"["
+            separator = b""
+            for data in self.serialized_chunks(request):
+                if data:
+                    yield separator + renderer.render(data)[1:-1]
+                    separator = b","
+            yield b"]"
+
+        return StreamingHttpResponse(content(), content_type="application/json")
@@ -1,13 +1,36 @@
+import base64
+import csv
+import gzip
+import json
+import logging
 import os
-from datetime import datetime, timezone
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from unittest import mock, skipUnless
+from io import BytesIO, StringIO
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from rest_framework.test import APIClient
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from django.test import TestCase, override_settings
 from rest_framework import status
 from django.urls import reverse
+from django.utils.http import http_date
+from api.log_handlers import BackgroundFileHandler, BackgroundHandler, JSONFormatter
 from planetarium.models import (
     ShowTheme,
     AstronomyShow,
@@ -15,8 +38,44 @@ from planetarium.models import (
     ShowSession,
     Reservation,
     Ticket,
+    SeatHold,
+    DailySales,
 )
+from planetarium.booking import (
+    SeatsUnavailable,
+    create_tickets,
+    recount_reservation_totals,
+    recount_ticket_counters,
+)
+from planetarium.cache import (
+    check_version_cache,
+    entry_key,
+    get_version_cache,
+    model_versions,
+    read_through,
+    request_key,
+    version_key,
+)
+from planetarium import metrics, renderers
+from planetarium.pagination import ShowSessionPagination
+from planetarium.reports import rebuild_summaries
+from planetarium.renderers import (
+    FastJSONRenderer,
+    MessagePackParser,
+    MessagePackRenderer,
+)
+from planetarium.search import SimpleSearchBackend
+from planetarium.seating import SeatMap, sessions_with_free_block
+from planetarium.sqlite import WriteQueueTimeout, write_lock
 from planetarium.serializers import TicketCreateSerializer
+from planetarium.views import (
+    AstronomyShowViewSet,
+    ExportViewSet,
+    ReservationViewSet,
+    ShowSessionViewSet,
+    ShowThemeView,
+    TicketViewSet,
+)
 
 
 User = get_user_model()
@@ -77,8 +136,8 @@ class ShowThemeTestCase(TestCase):
         ShowTheme.objects.create(name="CosmicShow")
         response = self.client.get(self.list_url, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["name"], "CosmicShow")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["name"], "CosmicShow")
 
     def test_delete_show_theme(self):
         show_theme = ShowTheme.objects.create(name="GalacticTour")
@@ -124,8 +183,8 @@ class AstronomyShowTestCase(TestCase):
         )
         response = self.client.get(self.list_url, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["title"], "Galactic Adventure")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["title"], "Galactic Adventure")
 
     def test_update_astronomy_show(self):
         show = AstronomyShow.objects.create(
@@ -181,8 +240,8 @@ class PlanetariumDomeTestCase(TestCase):
         )
         response = self.client.get(self.list_url, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["name"], "Orion Dome")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["name"], "Orion Dome")
 
     def test_update_planetarium_dome(self):
         dome = PlanetariumDome.objects.create(
@@ -263,14 +322,16 @@ class ShowSessionTestCase(TestCase):
         ShowSession.objects.create(
             astronomy_show=self.astronomy_show,
             planetarium_dome=self.planetarium_dome,
-            show_time=datetime(2023, 10, 15, 18, 0, tzinfo=timezone.utc),
+            show_time=datetime.now(timezone.utc) + timedelta(days=1),
         )
         response = self.client.get(self.list_url, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["astronomy_show"], self.astronomy_show.title)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(
+            response.data["results"][0]["astronomy_show"], self.astronomy_show.title
+        )
         self.assertEqual(
-            response.data[0]["planetarium_dome"], self.planetarium_dome.name
+            response.data["results"][0]["planetarium_dome"], self.planetarium_dome.name
         )
 
     def test_update_show_session(self):
@@ -326,8 +387,8 @@ class ReservationAPITestCase(TestCase):
             reverse("planetarium:reservation-list"), format="json"
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["user"], self.user.email)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["user"], self.user.email)
 
     def test_delete_reservation(self):
         reservation = Reservation.objects.create(user=self.user)
@@ -399,3 +460,1940 @@ class TicketModelTestCase(TestCase):
 
         duplicate_serializer = TicketCreateSerializer(data=data)
         self.assertFalse(duplicate_serializer.is_valid())
+
+    def test_seat_taken_after_validation_is_a_conflict(self):
+        data = {
+            "row": 3,
+            "seat": 5,
+            "show_session": self.session.id,
+            "reservation": self.reservation.id,
+        }
+        serializer = TicketCreateSerializer(data=data)
+        self.assertTrue(serializer.is_valid())
+        create_tickets(self.reservation, self.session, [(3, 5)])
+
+        with self.assertRaises(SeatsUnavailable):
+            serializer.save()
+        self.assertEqual(Ticket.objects.count(), 1)
+
+
+class ShowSessionSeatMapTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        show = AstronomyShow.objects.create(
+            title="Seat Show", description="Seat map description"
+        )
+        dome = PlanetariumDome.objects.create(
+            name="Seat Dome", rows=2, seats_in_row=3, price_per_seat=Decimal("5.00")
+        )
+        self.session = ShowSession.objects.create(
+            astronomy_show=show,
+            planetarium_dome=dome,
+            show_time=datetime(2030, 1, 1, 12, 0, tzinfo=timezone.utc),
+        )
+        reservation = Reservation.objects.create(user=self.user)
+        for row, seat in [(1, 2), (2, 3)]:
+            Ticket.objects.create(
+                row=row, seat=seat, show_session=self.session, reservation=reservation
+            )
+        self.url = reverse(
+            "planetarium:showsession-seats", kwargs={"pk": self.session.id}
+        )
+
+    def test_seat_map_bitset(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["capacity"], 6)
+        self.assertEqual(response.data["taken"], 2)
+        self.assertEqual(response.data["available"], 4)
+        self.assertEqual(response.data["seats"], "Ig==")
+
+    def test_seat_map_rle_and_list(self):
+        response = self.client.get(self.url, {"encoding": "rle"})
+        self.assertEqual(response.data["seats"], [1, 1, 3, 1])
+
+        response = self.client.get(self.url, {"encoding": "list"})
+        self.assertEqual(response.data["seats"], [[1, 2], [2, 3]])
+
+    def test_seat_map_uses_two_queries(self):
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {"encoding": "list"})
+
+    def test_seat_map_unknown_session_and_encoding(self):
+        url = reverse("planetarium:showsession-seats", kwargs={"pk": 999})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(self.url, {"encoding": "png"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TicketPurchaseTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.token = get_user_token()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + self.token)
+        show = AstronomyShow.objects.create(
+            title="Family Show", description="Family show description"
+        )
+        self.dome = PlanetariumDome.objects.create(
+            name="Family Dome", rows=5, seats_in_row=10, price_per_seat=Decimal("4.50")
+        )
+        self.session = ShowSession.objects.create(
+            astronomy_show=show,
+            planetarium_dome=self.dome,
+            show_time=datetime(2030, 1, 1, 12, 0, tzinfo=timezone.utc),
+        )
+        self.url = reverse("planetarium:ticket-purchase")
+
+    def purchase(self, seats):
+        return self.client.post(
+            self.url,
+            {
+                "show_session": self.session.id,
+                "seats": [{"row": row, "seat": seat} for row, seat in seats],
+            },
+            format="json",
+        )
+
+    def test_purchase_creates_reservation_and_tickets(self):
+        response = self.purchase([(2, 3), (2, 4), (2, 5)])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Reservation.objects.count(), 1)
+        reservation = Reservation.objects.get()
+        self.assertEqual(reservation.user, self.user)
+        self.assertEqual(reservation.tickets.count(), 3)
+        self.assertEqual(response.data["reservation"], reservation.id)
+        self.assertEqual(response.data["total_price"], "13.50")
+        self.assertEqual(
+            [(t["row"], t["seat"]) for t in response.data["tickets"]],
+            [(2, 3), (2, 4), (2, 5)],
+        )
+
+    def test_purchase_conflict_reports_taken_seats(self):
+        self.purchase([(1, 1), (1, 2)])
+        response = self.purchase([(1, 2), (1, 3), (1, 1)])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["taken"], [[1, 1], [1, 2]])
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertEqual(Ticket.objects.count(), 2)
+
+    def test_purchase_invalid_seats(self):
+        response = self.purchase([(6, 1)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.purchase([(1, 1), (1, 1)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Reservation.objects.count(), 0)
+
+    def test_purchase_query_count_does_not_grow_with_seats(self):
+        with CaptureQueriesContext(connection) as two_seats:
+            self.purchase([(1, 1), (1, 2)])
+        with CaptureQueriesContext(connection) as six_seats:
+            self.purchase([(3, seat) for seat in range(1, 7)])
+        self.assertEqual(len(two_seats), len(six_seats))
+
+    def test_unique_constraint_conflict_is_reported(self):
+        self.purchase([(4, 4)])
+        reservation = Reservation.objects.create(user=self.user)
+        with self.assertRaises(SeatsUnavailable) as error:
+            create_tickets(reservation, self.session, [(4, 3), (4, 4)])
+        self.assertEqual(error.exception.seats, [(4, 4)])
+        self.assertEqual(Ticket.objects.count(), 1)
+
+
+class SeatHoldTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + get_user_token())
+        self.other_user = User.objects.create_user(
+            email="other@example.com", password="otherpassword"
+        )
+        self.other_client = APIClient()
+        self.other_client.force_authenticate(self.other_user)
+
+        show = AstronomyShow.objects.create(
+            title="Hold Show", description="Hold show description"
+        )
+        dome = PlanetariumDome.objects.create(
+            name="Hold Dome", rows=3, seats_in_row=4, price_per_seat=Decimal("5.00")
+        )
+        self.session = ShowSession.objects.create(
+            astronomy_show=show,
+            planetarium_dome=dome,
+            show_time=datetime(2030, 1, 1, 12, 0, tzinfo=timezone.utc),
+        )
+        self.payload = {
+            "show_session": self.session.id,
+            "seats": [{"row": 2, "seat": 1}, {"row": 2, "seat": 2}],
+        }
+        self.list_url = reverse("planetarium:seathold-list")
+
+    def hold(self):
+        response = self.client.post(self.list_url, self.payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["token"]
+
+    def test_held_seats_are_unavailable_to_others(self):
+        self.hold()
+        response = self.other_client.post(
+            reverse("planetarium:ticket-purchase"), self.payload, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["taken"], [[2, 1], [2, 2]])
+
+        response = self.other_client.post(self.list_url, self.payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        response = self.client.get(
+            reverse("planetarium:showsession-seats", kwargs={"pk": self.session.id}),
+            {"encoding": "list"},
+        )
+        self.assertEqual(response.data["seats"], [[2, 1], [2, 2]])
+
+    def test_confirm_hold_buys_held_seats(self):
+        token = self.hold()
+        response = self.client.get(self.list_url)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data[0]["seats"]), 2)
+
+        url = reverse("planetarium:seathold-confirm", kwargs={"token": token})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["tickets"]), 2)
+        self.assertEqual(SeatHold.objects.count(), 0)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_release_hold(self):
+        token = self.hold()
+        url = reverse("planetarium:seathold-detail", kwargs={"token": token})
+        self.assertEqual(
+            self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT
+        )
+        self.assertEqual(SeatHold.objects.count(), 0)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_expired_holds_are_ignored_and_swept(self):
+        self.hold()
+        SeatHold.objects.update(expires_at=datetime(2020, 1, 1, tzinfo=timezone.utc))
+
+        response = self.other_client.post(self.list_url, self.payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SeatHold.objects.count(), 2)
+
+        SeatHold.objects.update(expires_at=datetime(2020, 1, 1, tzinfo=timezone.utc))
+        call_command("sweep_seat_holds", stdout=StringIO())
+        self.assertEqual(SeatHold.objects.count(), 0)
+
+
+class ShowSessionAvailabilityTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        show = AstronomyShow.objects.create(
+            title="Counter Show", description="Counter show description"
+        )
+        self.dome = PlanetariumDome.objects.create(
+            name="Counter Dome", rows=2, seats_in_row=3, price_per_seat=Decimal("5.00")
+        )
+        self.session = ShowSession.objects.create(
+            astronomy_show=show,
+            planetarium_dome=self.dome,
+            show_time=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+        self.full_session = ShowSession.objects.create(
+            astronomy_show=show,
+            planetarium_dome=self.dome,
+            show_time=datetime.now(timezone.utc) + timedelta(days=2),
+        )
+
+    def purchase(self, session, seats):
+        return self.client.post(
+            reverse("planetarium:ticket-purchase"),
+            {
+                "show_session": session.id,
+                "seats": [{"row": row, "seat": seat} for row, seat in seats],
+            },
+            format="json",
+        )
+
+    def assertCounters(self, session, sold, available):
+        session.refresh_from_db()
+        self.assertEqual(
+            (session.tickets_sold, session.tickets_available), (sold, available)
+        )
+
+    def test_counters_follow_ticket_create_and_delete(self):
+        self.assertCounters(self.session, 0, 6)
+        self.purchase(self.session, [(1, 1), (1, 2)])
+        self.assertCounters(self.session, 2, 4)
+
+        reservation = Reservation.objects.create(user=self.user)
+        ticket = Ticket.objects.create(
+            row=2, seat=1, show_session=self.session, reservation=reservation
+        )
+        self.assertCounters(self.session, 3, 3)
+        ticket.delete()
+        self.assertCounters(self.session, 2, 4)
+
+        Reservation.objects.all().delete()
+        self.assertCounters(self.session, 0, 6)
+
+    def test_reservation_delete_counts_tickets_per_session(self):
+        reservation = Reservation.objects.create(user=self.user)
+        create_tickets(
+            reservation,
+            self.session,
+            [(row, seat) for row in (1, 2) for seat in (1, 2, 3)],
+        )
+        self.assertCounters(self.session, 6, 0)
+
+        with self.assertNumQueries(7):
+            reservation.delete()
+        self.assertCounters(self.session, 0, 6)
+        summary = DailySales.objects.get(day=self.session.show_time.date())
+        self.assertEqual((summary.sold_seats, summary.revenue), (0, 0))
+
+    def test_session_delete_counts_tickets_per_reservation(self):
+        reservation = Reservation.objects.create(user=self.user)
+        create_tickets(reservation, self.session, [(1, 1), (1, 2)])
+        create_tickets(reservation, self.full_session, [(1, 1)])
+
+        self.session.delete()
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.ticket_count, 1)
+        self.assertEqual(reservation.total_price, Decimal("5.00"))
+        self.assertCounters(self.full_session, 1, 5)
+
+    def test_counters_follow_dome_capacity(self):
+        self.purchase(self.session, [(1, 1)])
+        self.dome.rows = 4
+        self.dome.save()
+        self.assertCounters(self.session, 1, 11)
+
+    def test_filter_by_availability(self):
+        self.purchase(
+            self.full_session, [(row, seat) for row in (1, 2) for seat in (1, 2, 3)]
+        )
+        self.purchase(self.session, [(1, 1), (1, 2), (1, 3)])
+        url = reverse("planetarium:showsession-list")
+
+        response = self.client.get(url, {"available": "true"})
+        self.assertEqual([s["id"] for s in response.data["results"]], [self.session.id])
+        self.assertEqual(response.data["results"][0]["tickets_available"], 3)
+
+        response = self.client.get(url, {"min_free": 4})
+        self.assertEqual(response.data["results"], [])
+
+    def test_recount_command_repairs_counters(self):
+        self.purchase(self.session, [(1, 1), (2, 2)])
+        ShowSession.objects.update(tickets_sold=0, tickets_available=0)
+        call_command("recount_tickets", stdout=StringIO())
+        self.assertCounters(self.session, 2, 4)
+        self.assertCounters(self.full_session, 0, 6)
+
+
+class SeatAllocationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        show = AstronomyShow.objects.create(
+            title="Group Show", description="Group show description"
+        )
+        dome = PlanetariumDome.objects.create(
+            name="Group Dome", rows=5, seats_in_row=8, price_per_seat=Decimal("5.00")
+        )
+        self.session = ShowSession.objects.create(
+            astronomy_show=show,
+            planetarium_dome=dome,
+            show_time=datetime(2030, 1, 1, 12, 0, tzinfo=timezone.utc),
+        )
+
+    def test_find_block_prefers_centre(self):
+        seat_map = SeatMap(5, 8)
+        self.assertEqual(seat_map.find_block(2), [(3, 4), (3, 5)])
+        self.assertEqual(seat_map.find_block(3), [(3, 3), (3, 4), (3, 5)])
+
+        seat_map = SeatMap.from_seats(5, 8, [(3, 4)])
+        self.assertEqual(seat_map.find_block(3), [(3, 5), (3, 6), (3, 7)])
+        self.assertEqual(seat_map.find_block(4), [(3, 5), (3, 6), (3, 7), (3, 8)])
+        self.assertEqual(
+            seat_map.find_block(5), [(2, 2), (2, 3), (2, 4), (2, 5), (2, 6)]
+        )
+
+    def test_find_block_without_room(self):
+        seat_map = SeatMap.from_seats(2, 4, [(1, 2), (2, 3)])
+        self.assertIsNone(seat_map.find_block(3))
+        self.assertIsNone(seat_map.find_block(5))
+        self.assertEqual(seat_map.find_block(2), [(1, 3), (1, 4)])
+
+    def test_suggest_endpoint(self):
+        url = reverse("planetarium:showsession-suggest", kwargs={"pk": self.session.id})
+        response = self.client.get(url, {"count": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["seats"], [[3, 4], [3, 5]])
+
+        response = self.client.get(url, {"count": 9})
+        self.assertEqual(response.data["seats"], [])
+
+    def test_purchase_with_auto_allocate(self):
+        url = reverse("planetarium:ticket-purchase")
+        payload = {"show_session": self.session.id, "auto_allocate": True, "count": 6}
+        for expected_row in (3, 2, 4):
+            response = self.client.post(url, payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(
+                [(t["row"], t["seat"]) for t in response.data["tickets"]],
+                [(expected_row, seat) for seat in range(2, 8)],
+            )
+
+        payload["count"] = 9
+        response = self.client.post(url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(
+            url, {"show_session": self.session.id, "auto_allocate": True}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AdjacentSeatsSearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.show = AstronomyShow.objects.create(
+            title="Search Show", description="Search show description"
+        )
+        other_show = AstronomyShow.objects.create(
+            title="Other Show", description="Other show description"
+        )
+        small_dome = PlanetariumDome.objects.create(
+            name="Small Dome", rows=2, seats_in_row=4, price_per_seat=Decimal("5.00")
+        )
+        wide_dome = PlanetariumDome.objects.create(
+            name="Wide Dome", rows=1, seats_in_row=9, price_per_seat=Decimal("5.00")
+        )
+        now = datetime.now(timezone.utc)
+        self.soon = ShowSession.objects.create(
+            astronomy_show=self.show,
+            planetarium_dome=small_dome,
+            show_time=now + timedelta(days=2),
+        )
+        self.sooner = ShowSession.objects.create(
+            astronomy_show=self.show,
+            planetarium_dome=wide_dome,
+            show_time=now + timedelta(days=1),
+        )
+        self.later = ShowSession.objects.create(
+            astronomy_show=self.show,
+            planetarium_dome=small_dome,
+            show_time=now + timedelta(days=30),
+        )
+        self.other = ShowSession.objects.create(
+            astronomy_show=other_show,
+            planetarium_dome=small_dome,
+            show_time=now + timedelta(days=3),
+        )
+        reservation = Reservation.objects.create(user=self.user)
+        for session, seats in [
+            (self.soon, [(1, 2), (2, 3)]),
+            (self.sooner, [(1, 4), (1, 8)]),
+        ]:
+            create_tickets(reservation, session, seats)
+        self.url = reverse("planetarium:showsession-adjacent-seats")
+
+    def test_sessions_with_free_block(self):
+        occupied = [(1, 1, 2), (1, 2, 3), (2, 1, 4), (2, 1, 8)]
+        sessions = [(1, 2, 4), (2, 1, 9), (3, 2, 4)]
+        self.assertEqual(sessions_with_free_block(sessions, occupied, 2), {1, 2, 3})
+        self.assertEqual(sessions_with_free_block(sessions, occupied, 3), {2, 3})
+        self.assertEqual(sessions_with_free_block(sessions, occupied, 4), {3})
+        self.assertEqual(sessions_with_free_block(sessions, occupied, 5), set())
+
+    def test_search_returns_matching_sessions_by_show_time(self):
+        response = self.client.get(self.url, {"count": 2, "show_id": self.show.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [session["id"] for session in response.data],
+            [self.sooner.id, self.soon.id],
+        )
+
+        response = self.client.get(self.url, {"count": 3})
+        self.assertEqual(
+            [session["id"] for session in response.data],
+            [self.sooner.id, self.other.id],
+        )
+
+    def test_search_uses_two_queries(self):
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {"count": 3})
+
+    def test_search_requires_count(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        show = AstronomyShow.objects.create(
+            title="Paged Show", description="Paged show description"
+        )
+        dome = PlanetariumDome.objects.create(
+            name="Paged Dome", rows=5, seats_in_row=5, price_per_seat=Decimal("5.00")
+        )
+        show_time = datetime.now(timezone.utc) + timedelta(days=1)
+        # Pairs of sessions share a show time, so the id breaks the ties.
+        self.sessions = [
+            ShowSession.objects.create(
+                astronomy_show=show,
+                planetarium_dome=dome,
+                show_time=show_time + timedelta(hours=index // 2),
+            )
+            for index in range(7)
+        ]
+        ShowSession.objects.filter(pk=self.sessions[0].pk).update(
+            show_time=show_time + timedelta(hours=10)
+        )
+        self.expected = [session.id for session in self.sessions[1:]] + [
+            self.sessions[0].id
+        ]
+        self.url = reverse("planetarium:showsession-list")
+
+    def test_walk_pages_forward_and_back(self):
+        seen = []
+        pages = []
+        url = self.url + "?limit=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([session["id"] for session in response.data["results"]])
+            seen += pages[-1]
+            url = response.data["next"]
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+        previous = response.data["previous"]
+        response = self.client.get(previous)
+        self.assertEqual(
+            [session["id"] for session in response.data["results"]], pages[1]
+        )
+        response = self.client.get(response.data["previous"])
+        self.assertEqual(
+            [session["id"] for session in response.data["results"]], pages[0]
+        )
+        self.assertIsNone(response.data["previous"])
+
+    def test_page_size_is_capped(self):
+        pagination = ShowSessionPagination()
+        pagination.max_page_size = 2
+        request = APIRequestFactory().get(self.url, {"limit": 100})
+        page = pagination.paginate_queryset(ShowSession.objects.all(), Request(request))
+        self.assertEqual(len(page), 2)
+
+    def test_no_count_or_offset_queries(self):
+        response = self.client.get(self.url, {"limit": 2})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(response.data["next"])
+        sql = " ".join(query["sql"] for query in queries).upper()
+        self.assertNotIn("COUNT(", sql)
+        self.assertNotIn("OFFSET", sql)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_values_are_validated(self):
+        for position in (["abc"], ["notadate", 1], [{}, 1], [None, 1], ["abc", 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps({"p": position}).encode())
+            response = self.client.get(self.url, {"cursor": cursor.decode()})
+            self.assertEqual(
+                response.status_code, status.HTTP_404_NOT_FOUND, position
+            )
+
+
+class AstronomyShowSearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.theme = ShowTheme.objects.create(name="Galaxies")
+        self.jupiter = AstronomyShow.objects.create(
+            title="Jupiter Rising", description="Moons of the giant planet"
+        )
+        self.saturn = AstronomyShow.objects.create(
+            title="Saturn Rings", description="A visit to Jupiter and Saturn"
+        )
+        self.milky_way = AstronomyShow.objects.create(
+            title="Milky Way", description="Our home"
+        )
+        self.milky_way.theme.add(self.theme)
+        self.search_url = reverse("planetarium:astronomyshow-search")
+
+    def search(self, query):
+        response = self.client.get(self.search_url, {"q": query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [show["id"] for show in response.data]
+
+    def test_ranking_and_prefix_match(self):
+        self.assertEqual(self.search("jupiter"), [self.jupiter.id, self.saturn.id])
+        self.assertEqual(self.search("jup"), [self.jupiter.id, self.saturn.id])
+        self.assertEqual(self.search("galax"), [self.milky_way.id])
+        self.assertEqual(self.search("jupiter rings"), [self.saturn.id])
+        self.assertEqual(self.search(""), [])
+
+    def test_index_follows_changes(self):
+        self.jupiter.title = "Mars Rising"
+        self.jupiter.save()
+        self.assertEqual(self.search("mars"), [self.jupiter.id])
+
+        self.theme.name = "Nebulae"
+        self.theme.save()
+        self.assertEqual(self.search("galaxies"), [])
+        self.assertEqual(self.search("nebulae"), [self.milky_way.id])
+
+        self.saturn.theme.add(self.theme)
+        self.assertEqual(len(self.search("nebulae")), 2)
+        self.theme.delete()
+        self.assertEqual(self.search("nebulae"), [])
+
+        self.saturn.delete()
+        self.assertEqual(self.search("jupiter"), [])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM planetarium_astronomyshow_fts")
+        self.assertEqual(self.search("milky"), [])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.search("milky"), [self.milky_way.id])
+
+    def test_list_filter_uses_index(self):
+        response = self.client.get(
+            reverse("planetarium:astronomyshow-list"), {"show": "rings"}
+        )
+        self.assertEqual(
+            [show["id"] for show in response.data["results"]], [self.saturn.id]
+        )
+
+    def test_simple_backend(self):
+        backend = SimpleSearchBackend()
+        self.assertEqual(
+            set(backend.search("jupiter")), {self.jupiter.id, self.saturn.id}
+        )
+        self.assertEqual(backend.search("galax"), [self.milky_way.id])
+
+
+class ShowSessionTimeFilterTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.show = AstronomyShow.objects.create(
+            title="Timed Show", description="Timed show description"
+        )
+        other_show = AstronomyShow.objects.create(
+            title="Other Timed Show", description="Other timed show description"
+        )
+        self.dome = PlanetariumDome.objects.create(
+            name="Timed Dome", rows=5, seats_in_row=5, price_per_seat=Decimal("5.00")
+        )
+        other_dome = PlanetariumDome.objects.create(
+            name="Other Dome", rows=5, seats_in_row=5, price_per_seat=Decimal("5.00")
+        )
+        today = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0)
+        self.past = ShowSession.objects.create(
+            astronomy_show=self.show,
+            planetarium_dome=self.dome,
+            show_time=today - timedelta(days=3),
+        )
+        self.tomorrow = ShowSession.objects.create(
+            astronomy_show=self.show,
+            planetarium_dome=self.dome,
+            show_time=today + timedelta(days=1),
+        )
+        self.next_week = ShowSession.objects.create(
+            astronomy_show=other_show,
+            planetarium_dome=other_dome,
+            show_time=today + timedelta(days=7),
+        )
+        self.url = reverse("planetarium:showsession-list")
+
+    def ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [session["id"] for session in response.data["results"]]
+
+    def test_default_listing_excludes_past_sessions(self):
+        self.assertEqual(self.ids(), [self.tomorrow.id, self.next_week.id])
+        url = reverse("planetarium:showsession-detail", kwargs={"pk": self.past.id})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_time_range_filters(self):
+        start = (self.past.show_time - timedelta(days=1)).isoformat()
+        self.assertEqual(
+            self.ids(**{"from": start}),
+            [self.past.id, self.tomorrow.id, self.next_week.id],
+        )
+        end = (self.tomorrow.show_time + timedelta(hours=1)).isoformat()
+        self.assertEqual(self.ids(to=end), [self.past.id, self.tomorrow.id])
+        self.assertEqual(
+            self.ids(date=self.next_week.show_time.date().isoformat()),
+            [self.next_week.id],
+        )
+
+    def test_id_filters(self):
+        self.assertEqual(self.ids(dome_id=self.dome.id), [self.tomorrow.id])
+        self.assertEqual(self.ids(show_id=self.show.id), [self.tomorrow.id])
+
+    def test_invalid_filters(self):
+        for params in ({"from": "yesterday"}, {"date": "2030-13-01"}, {"dome_id": "x"}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReservationTotalsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.user.telegram_username = "stargazer"
+        self.user.save()
+        self.token = get_user_token()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + self.token)
+        show = AstronomyShow.objects.create(
+            title="Totals Show", description="Totals show description"
+        )
+        dome = PlanetariumDome.objects.create(
+            name="Totals Dome", rows=5, seats_in_row=10, price_per_seat=Decimal("4.50")
+        )
+        self.session = ShowSession.objects.create(
+            astronomy_show=show,
+            planetarium_dome=dome,
+            show_time=datetime(2030, 1, 1, 12, 0, tzinfo=timezone.utc),
+        )
+        self.reservation = Reservation.objects.create(user=self.user)
+
+    def test_bulk_tickets_update_totals(self):
+        create_tickets(self.reservation, self.session, [(1, 1), (1, 2), (1, 3)])
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.ticket_count, 3)
+        self.assertEqual(self.reservation.total_price, Decimal("13.50"))
+
+    def test_single_ticket_save_and_delete_update_totals(self):
+        ticket = Ticket.objects.create(
+            row=2, seat=2, show_session=self.session, reservation=self.reservation
+        )
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.ticket_count, 1)
+        self.assertEqual(self.reservation.total_price, Decimal("4.50"))
+
+        ticket.delete()
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.ticket_count, 0)
+        self.assertEqual(self.reservation.total_price, Decimal("0"))
+
+    def test_delete_after_price_change_takes_off_the_price_paid(self):
+        ticket = Ticket.objects.create(
+            row=2, seat=2, show_session=self.session, reservation=self.reservation
+        )
+        create_tickets(self.reservation, self.session, [(1, 1)])
+        PlanetariumDome.objects.update(price_per_seat=Decimal("9.00"))
+
+        ticket.delete()
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.ticket_count, 1)
+        self.assertEqual(self.reservation.total_price, Decimal("4.50"))
+        self.assertEqual(recount_reservation_totals(), 0)
+
+    def test_stale_instance_save_keeps_totals(self):
+        create_tickets(self.reservation, self.session, [(1, 1), (1, 2)])
+        self.reservation.save()
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.ticket_count, 2)
+
+    def test_ticket_list_reads_stored_totals(self):
+        create_tickets(self.reservation, self.session, [(1, 1), (1, 2)])
+        response = self.client.get(reverse("planetarium:ticket-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for ticket in response.data["results"]:
+            self.assertEqual(ticket["tickets"], 2)
+            self.assertEqual(ticket["total_price"], "9.00")
+
+    def test_reservation_list_prefetches_tickets(self):
+        create_tickets(self.reservation, self.session, [(1, 1), (1, 2)])
+        other = Reservation.objects.create(user=self.user)
+        create_tickets(other, self.session, [(3, 1)])
+
+        client = APIClient()
+        with override_settings(TELEGRAM_SERVICE_TOKEN="bot-secret"):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(
+                    reverse("planetarium:reservation-list"),
+                    {"telegram_username": "stargazer"},
+                    HTTP_X_SERVICE_TOKEN="bot-secret",
+                )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 2)
+        results = {item["id"]: item for item in response.data["results"]}
+        self.assertEqual(results[self.reservation.id]["ticket_count"], 2)
+        self.assertEqual(results[self.reservation.id]["total_price"], "9.00")
+        self.assertEqual(
+            [(t["row"], t["seat"]) for t in results[self.reservation.id]["tickets"]],
+            [(1, 1), (1, 2)],
+        )
+        self.assertEqual(
+            results[other.id]["tickets"][0]["show_session_info"], self.session.info
+        )
+
+    @override_settings(TELEGRAM_SERVICE_TOKEN="bot-secret")
+    def test_reservations_by_telegram_username_need_the_service_token(self):
+        create_tickets(self.reservation, self.session, [(1, 1)])
+        url = reverse("planetarium:reservation-list")
+        params = {"telegram_username": "stargazer"}
+
+        response = APIClient().get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = APIClient().get(url, params, HTTP_X_SERVICE_TOKEN="wrong")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        other = APIClient()
+        other.force_authenticate(
+            User.objects.create_user(email="other@example.com", password="pass1234")
+        )
+        response = other.get(url, params)
+        self.assertEqual(response.data["results"], [])
+
+    @override_settings(TELEGRAM_SERVICE_TOKEN="bot-secret")
+    def test_tickets_by_telegram_username_need_the_service_token(self):
+        create_tickets(self.reservation, self.session, [(1, 1)])
+        url = reverse("planetarium:ticket-list")
+        params = {"telegram_username": "stargazer"}
+
+        response = APIClient().get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = APIClient().get(url, params, HTTP_X_SERVICE_TOKEN="bot-secret")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+
+        other = APIClient()
+        other.force_authenticate(
+            User.objects.create_user(email="other@example.com", password="pass1234")
+        )
+        response = other.get(url, params)
+        self.assertEqual(response.data["results"], [])
+
+    def test_recount_repairs_totals(self):
+        create_tickets(self.reservation, self.session, [(1, 1)])
+        Reservation.objects.update(ticket_count=7, total_price=0)
+        call_command("recount_tickets", stdout=StringIO())
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.ticket_count, 1)
+        self.assertEqual(self.reservation.total_price, Decimal("4.50"))
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.show = AstronomyShow.objects.create(
+            title="Cached Show", description="Cached show description"
+        )
+        self.dome = PlanetariumDome.objects.create(
+            name="Cached Dome", rows=5, seats_in_row=10, price_per_seat=Decimal("5")
+        )
+        self.session = ShowSession.objects.create(
+            astronomy_show=self.show,
+            planetarium_dome=self.dome,
+            show_time=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+
+    def test_repeated_list_is_served_from_cache(self):
+        url = reverse("planetarium:astronomyshow-list")
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+
+    def test_write_invalidates_cached_list(self):
+        url = reverse("planetarium:astronomyshow-list")
+        self.client.get(url)
+        AstronomyShow.objects.create(title="New Show", description="New")
+        response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_theme_change_invalidates_cached_show(self):
+        url = reverse("planetarium:astronomyshow-detail", args=[self.show.id])
+        self.client.get(url)
+        self.show.theme.add(ShowTheme.objects.create(name="Comets"))
+        response = self.client.get(url)
+        self.assertEqual(len(response.data["theme"]), 1)
+
+    def test_ticket_sales_invalidate_cached_sessions(self):
+        url = reverse("planetarium:showsession-list")
+        response = self.client.get(url)
+        self.assertEqual(response.data["results"][0]["tickets_available"], 50)
+        reservation = Reservation.objects.create(user=create_user())
+        create_tickets(reservation, self.session, [(1, 1), (1, 2)])
+        response = self.client.get(url)
+        self.assertEqual(response.data["results"][0]["tickets_available"], 48)
+
+    def test_request_key_ignores_parameter_order(self):
+        factory = APIRequestFactory()
+        first = Request(factory.get("/api/planetarium/shows/?b=2&a=1&a=0"))
+        second = Request(factory.get("/api/planetarium/shows/?a=0&a=1&b=2"))
+        self.assertEqual(request_key(first), request_key(second))
+
+    def hold_lock(self, key):
+        cache.add(entry_key(key, "lock"), 1)
+
+    def test_locked_miss_serves_stale_value(self):
+        read_through("key", [ShowTheme], lambda: "old")
+        ShowTheme.objects.create(name="Bumped")
+        self.hold_lock("key")
+        self.assertEqual(read_through("key", [ShowTheme], lambda: "new"), "old")
+
+    @override_settings(PLANETARIUM_RESPONSE_CACHE_LOCK_TIMEOUT=0.2)
+    def test_locked_miss_without_stale_value_computes_after_wait(self):
+        self.hold_lock("key")
+        self.assertEqual(read_through("key", [ShowTheme], lambda: "new"), "new")
+
+    def test_versions_are_shared_through_the_version_cache(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        backend = "django.core.cache.backends.filebased.FileBasedCache"
+        caches = {
+            "default": settings.CACHES["default"],
+            "versions": {"BACKEND": backend, "LOCATION": directory.name},
+        }
+        with override_settings(CACHES=caches):
+            self.assertEqual(check_version_cache(None), [])
+            before = model_versions([ShowTheme])
+            # another process bumping the version through the same files
+            other = FileBasedCache(directory.name, {})
+            other.set(version_key(ShowTheme), before[0] + 1, None)
+            self.assertEqual(model_versions([ShowTheme]), [before[0] + 1])
+
+        self.assertEqual(
+            [warning.id for warning in check_version_cache(None)],
+            ["planetarium.W001"],
+        )
+
+    def test_recount_invalidates_cached_reservations(self):
+        reservation = Reservation.objects.create(user=create_user())
+        create_tickets(reservation, self.session, [(1, 1)])
+        Reservation.objects.update(ticket_count=0)
+        before = model_versions([Reservation])
+        self.assertEqual(recount_reservation_totals(), 1)
+        self.assertNotEqual(model_versions([Reservation]), before)
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.theme = ShowTheme.objects.create(name="Planets")
+        self.url = reverse("planetarium:showtheme-list")
+
+    def test_matching_etag_returns_304_without_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('"'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f"W/{etag}")
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_write_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        ShowTheme.objects.create(name="Comets")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_query_params_change_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, {"limit": 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def age_version(self, model, seconds):
+        get_version_cache().set(
+            version_key(model), time.time_ns() - seconds * 10**9, None
+        )
+
+    def test_if_modified_since(self):
+        self.age_version(ShowTheme, 5)
+        last_modified = self.client.get(self.url)["Last-Modified"]
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE="Mon, 01 Jan 2001 00:00:00 GMT"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_no_last_modified_within_the_second_of_a_write(self):
+        response = self.client.get(self.url)
+        self.assertNotIn("Last-Modified", response)
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 1)
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_etag_follows_updated_at(self):
+        dome = PlanetariumDome.objects.create(
+            name="Dome", rows=2, seats_in_row=2, price_per_seat=Decimal("1")
+        )
+        url = reverse("planetarium:planetariumdome-detail", args=[dome.id])
+        response = self.client.get(url)
+        self.assertNotIn("updated_at", response.data)
+        etag = response["ETag"]
+
+        # a write whose version bump this process did not see
+        PlanetariumDome.objects.filter(pk=dome.pk).update(
+            updated_at=dome.updated_at + timedelta(microseconds=1)
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+
+    def test_per_user_etags_follow_purchases(self):
+        user = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + get_user_token())
+        url = reverse("planetarium:ticket-list")
+        response = self.client.get(url)
+        self.assertIn("Authorization", response["Vary"])
+        etag = response["ETag"]
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+
+        show = AstronomyShow.objects.create(title="Show", description="Show")
+        dome = PlanetariumDome.objects.create(
+            name="Dome", rows=2, seats_in_row=2, price_per_seat=Decimal("1")
+        )
+        session = ShowSession.objects.create(
+            astronomy_show=show,
+            planetarium_dome=dome,
+            show_time=datetime(2030, 1, 1, 12, 0, tzinfo=timezone.utc),
+        )
+        create_tickets(Reservation.objects.create(user=user), session, [(1, 1)])
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_200_OK,
+        )
+
+
+class SparseFieldsetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.theme = ShowTheme.objects.create(name="Galaxies")
+        self.show = AstronomyShow.objects.create(
+            title="Deep Field", description="A very long description"
+        )
+        self.show.theme.add(self.theme)
+        self.dome = PlanetariumDome.objects.create(
+            name="Main Dome", rows=4, seats_in_row=6, price_per_seat=Decimal("3")
+        )
+        self.session = ShowSession.objects.create(
+            astronomy_show=self.show,
+            planetarium_dome=self.dome,
+            show_time=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+        self.url = reverse("planetarium:showsession-list")
+
+    def test_fields_trims_output_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {"fields": "id,show_time"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data["results"][0]), {"id", "show_time"})
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]["sql"]
+        self.assertNotIn("planetarium_astronomyshow", sql)
+        self.assertNotIn("tickets_available", sql.split("WHERE")[0])
+
+    def test_expand_nested_relation(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                self.url,
+                {"fields": "id,astronomy_show", "expand": "astronomy_show.theme"},
+            )
+        session = response.data["results"][0]
+        self.assertEqual(set(session), {"id", "astronomy_show"})
+        self.assertEqual(session["astronomy_show"]["title"], "Deep Field")
+        self.assertEqual(
+            session["astronomy_show"]["theme"],
+            [{"id": self.theme.id, "name": "Galaxies"}],
+        )
+        self.assertEqual(len(queries), 2)
+
+    def test_dotted_fields_reach_nested_serializers(self):
+        response = self.client.get(
+            reverse("planetarium:showsession-detail", args=[self.session.id]),
+            {"fields": "id,astronomy_show.title,planetarium_dome.capacity"},
+        )
+        self.assertEqual(
+            response.data,
+            {
+                "id": self.session.id,
+                "astronomy_show": {"title": "Deep Field"},
+                "planetarium_dome": {"capacity": 24},
+            },
+        )
+
+    def test_unshaped_request_is_unchanged(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["results"][0]["astronomy_show"], self.show.title)
+        self.assertIn("tickets_available", response.data["results"][0])
+
+
+class FastListParityTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + get_user_token())
+
+        themes = [ShowTheme.objects.create(name=name) for name in ("Moons", "Stars")]
+        domes = [
+            PlanetariumDome.objects.create(
+                name=f"Dome {index}",
+                rows=5,
+                seats_in_row=5,
+                price_per_seat=Decimal(price),
+            )
+            for index, price in enumerate(("2.50", "10", "7.25"))
+        ]
+        now = datetime.now(timezone.utc).replace(microsecond=123456)
+        for index in range(6):
+            show = AstronomyShow.objects.create(
+                title=f"Show {index}", description=f"Description {index}"
+            )
+            show.theme.set(themes[: index % 3])
+            for offset in range(3):
+                session = ShowSession.objects.create(
+                    astronomy_show=show,
+                    planetarium_dome=domes[(index + offset) % 3],
+                    show_time=now + timedelta(days=offset + 1, hours=index),
+                )
+                create_tickets(
+                    Reservation.objects.create(user=self.user),
+                    session,
+                    [(row, offset + 1) for row in range(1, index % 3 + 2)],
+                )
+
+    def assert_parity(self, viewset, url, params=None):
+        for query in (params or {}, {**(params or {}), "limit": 4}):
+            cache.clear()
+            fast = self.client.get(url, query)
+            cache.clear()
+            with mock.patch.object(viewset, "fast_list", False):
+                slow = self.client.get(url, query)
+            self.assertEqual(fast.status_code, status.HTTP_200_OK)
+            self.assertEqual(fast.content, slow.content)
+
+            next_url = fast.data["next"]
+            if next_url:
+                cache.clear()
+                fast = self.client.get(next_url)
+                cache.clear()
+                with mock.patch.object(viewset, "fast_list", False):
+                    slow = self.client.get(next_url)
+                self.assertEqual(fast.content, slow.content)
+
+    def test_show_session_list(self):
+        self.assert_parity(ShowSessionViewSet, reverse("planetarium:showsession-list"))
+        self.assert_parity(
+            ShowSessionViewSet,
+            reverse("planetarium:showsession-list"),
+            {"min_free": 23},
+        )
+
+    def test_astronomy_show_list(self):
+        self.assert_parity(
+            AstronomyShowViewSet, reverse("planetarium:astronomyshow-list")
+        )
+        self.assert_parity(
+            AstronomyShowViewSet,
+            reverse("planetarium:astronomyshow-list"),
+            {"show": "show"},
+        )
+
+    def test_ticket_list(self):
+        self.assert_parity(TicketViewSet, reverse("planetarium:ticket-list"))
+
+    def test_fast_path_skips_per_row_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("planetarium:ticket-list"))
+        # user lookup of the token + one values() query over tickets
+        self.assertEqual(len(queries), 2)
+
+    def test_shaped_requests_use_regular_serializers(self):
+        response = self.client.get(
+            reverse("planetarium:showsession-list"), {"fields": "id"}
+        )
+        self.assertEqual(set(response.data["results"][0]), {"id"})
+
+
+class RendererTestCase(TestCase):
+    payload = {
+        "id": 1,
+        "price": Decimal("12.50"),
+        "when": datetime(2030, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc),
+        "day": datetime(2030, 1, 1).date(),
+        "token": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "title": "Ünïcödé stars",
+        "nested": [{"a": None, "b": True, 3: 1.5}],
+    }
+
+    def test_fast_json_matches_stdlib_json(self):
+        self.assertEqual(
+            FastJSONRenderer().render(self.payload),
+            JSONRenderer().render(self.payload),
+        )
+
+    def test_fast_json_falls_back_for_big_integers(self):
+        payload = {"big": 2**70}
+        self.assertEqual(
+            FastJSONRenderer().render(payload), JSONRenderer().render(payload)
+        )
+
+    def test_api_uses_fast_json_renderer(self):
+        response = APIClient().get(reverse("planetarium:showtheme-list"))
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+
+    @skipUnless(renderers.msgpack, "msgpack is not installed")
+    def test_msgpack_round_trip(self):
+        payload = {key: value for key, value in self.payload.items() if key != "nested"}
+        body = MessagePackRenderer().render(payload)
+        data = MessagePackParser().parse(BytesIO(body))
+        self.assertEqual(data["price"], 12.5)
+        self.assertEqual(data["when"], "2030-01-01T12:00:00.123456Z")
+
+    @skipUnless(renderers.msgpack, "msgpack is not installed")
+    def test_msgpack_content_negotiation(self):
+        ShowTheme.objects.create(name="Pulsars")
+        response = APIClient().get(
+            reverse("planetarium:showtheme-list"), HTTP_ACCEPT="application/msgpack"
+        )
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        data = MessagePackParser().parse(BytesIO(response.content))
+        self.assertEqual(data["results"][0]["name"], "Pulsars")
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("benchmark_renderers", number=1, limit=5, stdout=out)
+        self.assertIn("json (stdlib)", out.getvalue())
+
+
+class StreamingListTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + get_user_token())
+        show = AstronomyShow.objects.create(title="Stream", description="Stream")
+        dome = PlanetariumDome.objects.create(
+            name="Stream Dome", rows=3, seats_in_row=4, price_per_seat=Decimal("2")
+        )
+        session = ShowSession.objects.create(
+            astronomy_show=show,
+            planetarium_dome=dome,
+            show_time=datetime(2030, 1, 1, 12, 0, tzinfo=timezone.utc),
+        )
+        for row in range(1, 4):
+            create_tickets(
+                Reservation.objects.create(user=self.user),
+                session,
+                [(row, seat) for seat in range(1, row + 1)],
+            )
+
+    def paginated(self, url):
+        return self.client.get(url, {"limit": 500}).data["results"]
+
+    def streamed(self, url):
+        response = self.client.get(url, {"stream": "1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_ticket_stream_matches_paginated_list(self):
+        url = reverse("planetarium:ticket-list")
+        with mock.patch.object(TicketViewSet, "stream_chunk_size", 2):
+            streamed = self.streamed(url)
+        self.assertEqual(len(streamed), 6)
+        self.assertEqual(streamed, json.loads(json.dumps(self.paginated(url))))
+
+    def test_ticket_stream_without_fast_path(self):
+        url = reverse("planetarium:ticket-list")
+        with mock.patch.object(TicketViewSet, "stream_chunk_size", 4):
+            with mock.patch.object(TicketViewSet, "fast_list", False):
+                streamed = self.streamed(url)
+        self.assertEqual(streamed, json.loads(json.dumps(self.paginated(url))))
+
+    def test_reservation_stream_prefetches_per_chunk(self):
+        url = reverse("planetarium:reservation-list")
+        with mock.patch.object(ReservationViewSet, "stream_chunk_size", 2):
+            streamed = self.streamed(url)
+        self.assertEqual([len(item["tickets"]) for item in streamed], [1, 2, 3])
+
+    def test_empty_stream(self):
+        Ticket.objects.all().delete()
+        self.assertEqual(self.streamed(reverse("planetarium:ticket-list")), [])
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = create_admin_user()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + get_admin_token())
+        show = AstronomyShow.objects.create(title="Export", description="Export")
+        self.domes = [
+            PlanetariumDome.objects.create(
+                name=f"Dome {index}",
+                rows=3,
+                seats_in_row=3,
+                price_per_seat=Decimal("4.25"),
+            )
+            for index in range(2)
+        ]
+        for day, dome in enumerate(self.domes, start=1):
+            session = ShowSession.objects.create(
+                astronomy_show=show,
+                planetarium_dome=dome,
+                show_time=datetime(2030, 1, day, 12, 0, tzinfo=timezone.utc),
+            )
+            create_tickets(
+                Reservation.objects.create(user=self.admin),
+                session,
+                [(1, 1), (1, 2)],
+            )
+        self.url = reverse("planetarium:export-detail", args=["tickets"])
+
+    def content(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content)
+
+    def test_csv_export(self):
+        body = self.content(self.client.get(self.url)).decode()
+        rows = list(csv.reader(StringIO(body)))
+        self.assertEqual(rows[0][:3], ["id", "row", "seat"])
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1][5:8], ["Dome 0", "2030-01-01T12:00:00+00:00", "4.25"])
+        self.assertEqual(rows[1][9], self.admin.email)
+
+    def test_export_has_the_price_paid(self):
+        PlanetariumDome.objects.update(price_per_seat=Decimal("9.00"))
+        body = self.content(self.client.get(self.url)).decode()
+        rows = list(csv.reader(StringIO(body)))
+        self.assertEqual({row[7] for row in rows[1:]}, {"4.25"})
+
+    def test_ndjson_export_with_filters(self):
+        response = self.client.get(
+            self.url,
+            {
+                "type": "ndjson",
+                "from": "2030-01-02",
+                "dome_id": self.domes[1].id,
+            },
+        )
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = self.content(response).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])["dome"], "Dome 1")
+        self.assertEqual(json.loads(lines[0])["price"], "4.25")
+
+    def test_gzip_export(self):
+        response = self.client.get(
+            reverse("planetarium:export-detail", args=["reservations"]),
+            {"gzip": "1"},
+        )
+        self.assertIn("reservations.csv.gz", response["Content-Disposition"])
+        rows = gzip.decompress(self.content(response)).decode().splitlines()
+        self.assertEqual(rows[0], "id,user_email,created_at,ticket_count,total_price")
+        self.assertTrue(rows[1].endswith(",2,8.50"))
+
+    def test_export_requires_staff(self):
+        create_user()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Bearer " + get_user_token())
+        self.assertEqual(client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_unknown_export_and_type(self):
+        url = reverse("planetarium:export-detail", args=["nothing"])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(self.url, {"type": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_schema_generator_gets_no_serializer(self):
+        # drf-spectacular calls get_serializer() on any view that has one
+        self.assertIsNone(ExportViewSet().get_serializer())
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sessions.ndjson.gz")
+            call_command(
+                "export_data",
+                "show_sessions",
+                "--type=ndjson",
+                "--gzip",
+                f"--output={path}",
+                "--to=2030-01-02",
+                stderr=StringIO(),
+            )
+            with gzip.open(path, "rt") as export:
+                lines = export.read().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["tickets_sold"], 2)
+
+
+class SalesSummaryTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = create_admin_user()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + get_admin_token())
+        self.show = AstronomyShow.objects.create(title="Sales", description="Sales")
+        self.dome = PlanetariumDome.objects.create(
+            name="Sales Dome", rows=2, seats_in_row=5, price_per_seat=Decimal("8.00")
+        )
+        self.sessions = [
+            ShowSession.objects.create(
+                astronomy_show=self.show,
+                planetarium_dome=self.dome,
+                show_time=datetime(2030, 1, 1, hour, 0, tzinfo=timezone.utc),
+            )
+            for hour in (12, 18)
+        ]
+        self.reservation = Reservation.objects.create(user=self.admin)
+        create_tickets(self.reservation, self.sessions[0], [(1, 1), (1, 2), (1, 3)])
+        Ticket.objects.create(
+            row=2, seat=1, show_session=self.sessions[1], reservation=self.reservation
+        )
+
+    def summary(self):
+        return DailySales.objects.values_list(
+            "day", "sessions", "capacity", "sold_seats", "revenue"
+        ).get()
+
+    def test_summary_follows_sales(self):
+        self.assertEqual(
+            self.summary(), (datetime(2030, 1, 1).date(), 2, 20, 4, Decimal("32.00"))
+        )
+        Ticket.objects.filter(row=1, seat=3).get().delete()
+        self.assertEqual(self.summary()[3:], (3, Decimal("24.00")))
+
+    def test_summary_follows_sessions_and_domes(self):
+        self.dome.rows = 4
+        self.dome.save()
+        self.assertEqual(self.summary()[1:3], (2, 40))
+
+        self.sessions[1].delete()
+        self.assertEqual(self.summary()[1:4], (1, 20, 3))
+
+        self.sessions[0].show_time = datetime(2030, 1, 2, 12, 0, tzinfo=timezone.utc)
+        self.sessions[0].save()
+        self.assertEqual(self.summary()[:4], (datetime(2030, 1, 2).date(), 1, 20, 3))
+
+        self.sessions[0].delete()
+        self.assertFalse(DailySales.objects.exists())
+
+    def test_rebuild_matches_incremental_summary(self):
+        incremental = self.summary()
+        DailySales.objects.update(sold_seats=0, revenue=0)
+        self.assertEqual(rebuild_summaries(), 1)
+        self.assertEqual(self.summary(), incremental)
+
+    def test_price_change_keeps_revenue_at_prices_paid(self):
+        self.dome.price_per_seat = Decimal("9.00")
+        self.dome.save()
+        Ticket.objects.filter(row=1, seat=3).get().delete()
+        self.assertEqual(self.summary()[3:], (3, Decimal("24.00")))
+
+        incremental = self.summary()
+        self.assertEqual(rebuild_summaries(), 1)
+        self.assertEqual(self.summary(), incremental)
+
+    def test_dome_delete_drops_summaries(self):
+        self.dome.delete()
+        self.assertFalse(DailySales.objects.exists())
+
+    def test_sales_endpoints(self):
+        response = self.client.get(
+            reverse("planetarium:dailysales-list"), {"from": "2030-01-01"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        row = response.data["results"][0]
+        self.assertEqual(row["show_title"], "Sales")
+        self.assertEqual(row["revenue"], "32.00")
+        self.assertEqual(row["occupancy"], 0.2)
+
+        response = self.client.get(
+            reverse("planetarium:dailysales-totals"), {"group": "dome"}
+        )
+        self.assertEqual(
+            response.data,
+            [
+                {
+                    "planetarium_dome": self.dome.id,
+                    "name": "Sales Dome",
+                    "sessions": 2,
+                    "capacity": 20,
+                    "sold_seats": 4,
+                    "revenue": "32.00",
+                    "occupancy": 0.2,
+                }
+            ],
+        )
+        response = self.client.get(
+            reverse("planetarium:dailysales-totals"), {"group": "week"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sales_endpoints_are_staff_only(self):
+        self.client.credentials()
+        response = self.client.get(reverse("planetarium:dailysales-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class FixtureLoadTestCase(TestCase):
+    fixture_files = ["fixtures/user.json", "fixtures/planetarium.json"]
+
+    def load(self):
+        call_command("loaddata", *self.fixture_files, verbosity=0)
+
+    def test_fixtures_load_again(self):
+        self.load()
+        self.load()
+        self.assertEqual(ShowSession.objects.count(), 15)
+
+    def test_fixture_counters_match_tickets(self):
+        self.load()
+        session = ShowSession.objects.select_related("planetarium_dome").get(pk=1)
+        self.assertEqual(session.tickets_sold, session.tickets.count())
+        self.assertEqual(
+            session.tickets_available,
+            session.planetarium_dome.capacity - session.tickets_sold,
+        )
+        self.assertEqual(recount_ticket_counters(), 0)
+        self.assertEqual(recount_reservation_totals(), 0)
+
+
+class AsyncReadViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        theme = ShowTheme.objects.create(name="Async")
+        self.show = AstronomyShow.objects.create(title="Async", description="Async")
+        self.show.theme.add(theme)
+        self.dome = PlanetariumDome.objects.create(
+            name="Async Dome", rows=3, seats_in_row=4, price_per_seat=Decimal("5.00")
+        )
+        self.session = ShowSession.objects.create(
+            astronomy_show=self.show,
+            planetarium_dome=self.dome,
+            show_time=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+        Ticket.objects.create(
+            row=1,
+            seat=2,
+            show_session=self.session,
+            reservation=Reservation.objects.create(user=create_user()),
+        )
+
+    async def test_async_routes_match_sync_routes(self):
+        routes = [
+            ("showtheme-list", []),
+            ("astronomyshow-list", []),
+            ("astronomyshow-detail", [self.show.id]),
+            ("planetariumdome-list", []),
+            ("planetariumdome-detail", [self.dome.id]),
+            ("showsession-list", []),
+            ("showsession-detail", [self.session.id]),
+            ("showsession-seats", [self.session.id]),
+        ]
+        for name, args in routes:
+            with self.subTest(name):
+                response = await self.async_client.get(
+                    reverse(f"planetarium:async-{name}", args=args)
+                )
+                expected = await sync_to_async(self.client.get)(
+                    reverse(f"planetarium:{name}", args=args)
+                )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.json(), expected.json())
+
+    async def test_async_list_keeps_filters_and_shaping(self):
+        response = await self.async_client.get(
+            reverse("planetarium:async-astronomyshow-list"),
+            {"fields": "id,theme", "limit": 1},
+        )
+        self.assertEqual(
+            response.json()["results"], [{"id": self.show.id, "theme": ["Async"]}]
+        )
+        response = await self.async_client.get(
+            reverse("planetarium:async-showsession-list"), {"dome_id": 999}
+        )
+        self.assertEqual(response.json()["results"], [])
+
+    async def test_async_errors_and_not_modified(self):
+        response = await self.async_client.get(
+            reverse("planetarium:async-astronomyshow-detail", args=[999])
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await self.async_client.get(
+            reverse("planetarium:async-showsession-seats", args=[self.session.id]),
+            {"encoding": "png"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        url = reverse("planetarium:async-planetariumdome-list")
+        etag = (await self.async_client.get(url))["ETag"]
+        response = await self.async_client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class SQLiteProfileTestCase(TestCase):
+    def test_pragmas_are_applied_to_new_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(cursor.fetchone()[0], -64 * 1024)
+
+    @override_settings(SQLITE_WRITE_LOCK_TIMEOUT=0.01)
+    def test_write_lock_times_out_while_another_thread_writes(self):
+        holding, done = threading.Event(), threading.Event()
+
+        def writer():
+            with write_lock():
+                holding.set()
+                done.wait()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        holding.wait()
+        try:
+            with self.assertRaises(WriteQueueTimeout):
+                with write_lock():
+                    pass
+        finally:
+            done.set()
+            thread.join()
+        with write_lock(), write_lock():
+            pass
+
+    @override_settings(SQLITE_SERIALIZE_WRITES=False, SQLITE_WRITE_LOCK_TIMEOUT=0)
+    def test_write_lock_can_be_turned_off(self):
+        with mock.patch("planetarium.sqlite._write_lock") as lock:
+            with write_lock():
+                pass
+        lock.acquire.assert_not_called()
+
+
+class ServerTimingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_user()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + get_user_token())
+        self.show = AstronomyShow.objects.create(title="Timed", description="Timed")
+        self.show.theme.add(ShowTheme.objects.create(name="Timed"))
+        self.dome = PlanetariumDome.objects.create(
+            name="Timed Dome", rows=3, seats_in_row=4, price_per_seat=Decimal("5.00")
+        )
+        self.session = ShowSession.objects.create(
+            astronomy_show=self.show,
+            planetarium_dome=self.dome,
+            show_time=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+
+    def test_header_reports_every_span(self):
+        response = self.client.get(reverse("planetarium:astronomyshow-list"))
+        spans = dict(
+            entry.split(";", 1)[0:2]
+            for entry in response["Server-Timing"].split(", ")
+        )
+        self.assertEqual(
+            list(spans), ["db", "view", "serializer", "render", "total"]
+        )
+        self.assertIn('desc="3 queries"', spans["db"])
+
+    def test_catalog_reads_stay_within_query_budget(self):
+        routes = [
+            ("showtheme-list", []),
+            ("astronomyshow-list", []),
+            ("astronomyshow-detail", [self.show.id]),
+            ("planetariumdome-list", []),
+            ("planetariumdome-detail", [self.dome.id]),
+            ("showsession-list", []),
+            ("showsession-detail", [self.session.id]),
+            ("showsession-seats", [self.session.id]),
+            ("ticket-list", []),
+            ("reservation-list", []),
+        ]
+        for name, args in routes:
+            with self.subTest(name), self.assertNoLogs("planetarium.timing", "WARNING"):
+                cache.clear()
+                self.client.get(reverse(f"planetarium:{name}", args=args))
+
+    def test_over_budget_request_is_logged(self):
+        with mock.patch.object(ShowThemeView, "query_budget", {"list": 0}):
+            with self.assertLogs("planetarium.timing", "WARNING") as logs:
+                self.client.get(reverse("planetarium:showtheme-list"))
+        self.assertIn("view=planetarium:showtheme-list", logs.output[0])
+        self.assertIn("query_budget=0", logs.output[0])
+
+    async def test_async_requests_are_timed(self):
+        response = await self.async_client.get(
+            reverse("planetarium:async-planetariumdome-list")
+        )
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="1 queries"')
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_user()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + get_user_token())
+        self.dome = PlanetariumDome.objects.create(
+            name="Metrics Dome", rows=3, seats_in_row=4, price_per_seat=Decimal("5.00")
+        )
+        self.session = ShowSession.objects.create(
+            astronomy_show=AstronomyShow.objects.create(
+                title="Metrics", description="Metrics"
+            ),
+            planetarium_dome=self.dome,
+            show_time=datetime(2030, 1, 1, 12, 0, tzinfo=timezone.utc),
+        )
+
+    def scrape(self) -> dict:
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        return {
+            series: float(value)
+            for series, value in (
+                line.rsplit(" ", 1)
+                for line in response.content.decode().splitlines()
+                if not line.startswith("#")
+            )
+        }
+
+    def purchase(self, seats):
+        return self.client.post(
+            reverse("planetarium:ticket-purchase"),
+            {
+                "show_session": self.session.id,
+                "seats": [{"row": row, "seat": seat} for row, seat in seats],
+            },
+            format="json",
+        )
+
+    def test_scrape_reports_requests_cache_and_bookings(self):
+        before = self.scrape()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.purchase([(1, 1), (1, 2)])
+        self.purchase([(1, 2)])
+        self.client.get(reverse("planetarium:planetariumdome-list"))
+        self.client.get(reverse("planetarium:planetariumdome-list"))
+        after = self.scrape()
+
+        def delta(series):
+            return after.get(series, 0) - before.get(series, 0)
+
+        self.assertEqual(delta("seats_sold_total"), 2)
+        self.assertEqual(delta("booking_conflicts_total"), 1)
+        route = 'route="planetarium:ticket-purchase"'
+        self.assertEqual(
+            delta(f'http_requests_total{{method="POST",{route},status="409"}}'), 1
+        )
+        self.assertEqual(
+            delta(
+                'http_request_duration_seconds_count{route="planetarium:planetariumdome-list"}'
+            ),
+            2,
+        )
+        self.assertEqual(
+            delta('db_queries_per_request_bucket{route="metrics",le="0"}'), 1
+        )
+        self.assertEqual(delta('response_cache_requests_total{result="hit"}'), 1)
+        self.assertGreater(after["response_cache_hit_ratio"], 0)
+
+    def test_scrape_is_limited_to_allowed_addresses(self):
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="10.1.2.3")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_thread_shards_are_merged_at_scrape(self):
+        registry = metrics.Registry()
+        registry.describe("jobs_total", "counter", "Jobs.")
+        registry.describe("job_seconds", "histogram", "Job time.", (0.1, 1.0))
+
+        def work():
+            for _ in range(1000):
+                registry.inc("jobs_total", kind="test")
+            registry.observe("job_seconds", 0.5)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        text = registry.render()
+        # the finished threads were folded into the retired shard
+        self.assertEqual(registry.shards, [])
+        self.assertEqual(registry.render(), text)
+        self.assertIn('jobs_total{kind="test"} 4000', text)
+        self.assertIn('job_seconds_bucket{le="0.1"} 0', text)
+        self.assertIn('job_seconds_bucket{le="1.0"} 4', text)
+        self.assertIn("job_seconds_sum 2.0", text)
+
+
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        create_user()
+        self.token = get_user_token()
+
+    def client_with(self, **profiling):
+        settings = {
+            "PROFILING_ENABLED": True,
+            "PROFILING_SAMPLE_RATE": 0,
+            "PROFILING_DIR": self.directory.name,
+            **profiling,
+        }
+        self.enterContext(override_settings(**settings))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Bearer " + self.token)
+        return client
+
+    def profiles(self):
+        return sorted(os.listdir(self.directory.name))
+
+    def test_routes_are_profiled_and_reported_per_view(self):
+        client = self.client_with(
+            PROFILING_ROUTES=["planetarium:ticket-list"],
+            PROFILING_MEMORY_ROUTES=["planetarium:planetariumdome-list"],
+        )
+        client.get(reverse("planetarium:ticket-list"))
+        client.get(reverse("planetarium:ticket-list"))
+        client.get(reverse("planetarium:planetariumdome-list"))
+        client.get(reverse("planetarium:showtheme-list"))
+
+        profiles = self.profiles()
+        self.assertEqual(len(profiles), 3)
+        self.assertEqual(
+            sum(name.startswith("planetarium.ticket-list__") for name in profiles), 2
+        )
+
+        out = StringIO()
+        call_command("profile_report", dir=self.directory.name, stdout=out)
+        report = out.getvalue()
+        self.assertIn("planetarium.ticket-list: 2 profiles", report)
+        self.assertIn("planetarium.planetariumdome-list: 1 memory profiles", report)
+
+    async def test_asgi_requests_are_not_profiled(self):
+        self.client_with(PROFILING_ROUTES=["planetarium:showtheme-list"])
+        with self.assertLogs("planetarium.profiling", "WARNING"):
+            response = await self.async_client.get(
+                reverse("planetarium:showtheme-list"),
+                headers={"authorization": "Bearer " + self.token},
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.profiles(), [])
+
+    def test_header_sampling_and_rotation(self):
+        client = self.client_with(PROFILING_SAMPLE_RATE=2, PROFILING_MAX_FILES=2)
+        url = reverse("planetarium:showtheme-list")
+        for _ in range(4):
+            client.get(url)
+        self.assertEqual(len(self.profiles()), 2)
+
+        client.get(url, headers={"x-profile": "memory"})
+        self.assertTrue(self.profiles()[-1].endswith(".mem.json"))
+        self.assertEqual(len(self.profiles()), 2)
+
+        before = self.profiles()
+        client = self.client_with(PROFILING_MAX_FILES=2)
+        client.get(url, headers={"x-profile": "cpu"}, REMOTE_ADDR="10.0.0.9")
+        self.assertEqual(self.profiles(), before)
+
+
+class BackgroundLoggingTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.filename = os.path.join(self.directory.name, "test.log")
+
+    def make_record(self, msg, *args, **extra):
+        record = logging.makeLogRecord(
+            {"name": "planetarium.test", "levelno": logging.ERROR, "msg": msg}
+        )
+        record.levelname, record.args = "ERROR", args
+        record.__dict__.update(extra)
+        return record
+
+    def test_records_are_written_as_json_after_flush(self):
+        handler = BackgroundFileHandler(self.filename)
+        self.addCleanup(handler.close)
+        handler.setFormatter(JSONFormatter())
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = self.make_record("seat %s", 7, view="ticket-list")
+            record.exc_info = sys.exc_info()
+        handler.handle(record)
+        handler.flush()
+
+        with open(self.filename) as file:
+            entry = json.loads(file.readline())
+        self.assertEqual(entry["level"], "ERROR")
+        self.assertEqual(entry["logger"], "planetarium.test")
+        self.assertEqual(entry["message"], "seat 7")
+        self.assertEqual(entry["view"], "ticket-list")
+        self.assertIn("ValueError: boom", entry["exception"])
+
+    def test_rotated_files_are_gzipped(self):
+        handler = BackgroundFileHandler(self.filename, max_bytes=200, backup_count=2)
+        self.addCleanup(handler.close)
+        handler.setFormatter(JSONFormatter())
+        for number in range(20):
+            handler.handle(self.make_record("record %s", number))
+        handler.flush()
+
+        self.assertEqual(
+            sorted(os.listdir(self.directory.name)),
+            ["test.log", "test.log.1.gz", "test.log.2.gz"],
+        )
+        with gzip.open(self.filename + ".1.gz", "rt") as file:
+            self.assertIn("record", json.loads(file.readline())["message"])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        writing, release = threading.Event(), threading.Event()
+
+        class StuckHandler(logging.Handler):
+            def emit(self, record):
+                writing.set()
+                release.wait()
+
+        handler = BackgroundHandler(StuckHandler(), queue_size=2)
+        self.addCleanup(handler.close)
+        self.addCleanup(release.set)
+        handler.handle(self.make_record("first"))
+        self.assertTrue(writing.wait(5))
+        for number in range(9):
+            handler.handle(self.make_record("record %s", number))
+
+        # the first record is with the writer, two more fit in the queue
+        self.assertEqual(handler.dropped, 7)
@@ -0,0 +1,218 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from planetarium.metrics import record_request
+
+logger = logging.getLogger(__name__)
+
+current_timings = ContextVar("current_timings", default=None)
+
+
+class RequestTimings:
+    """Database, view, serializer and render time of one request.
+
+    The serializer span runs from the first get_serializer() call to the
+    end of the view, minus the queries it ran (lazy prefetches, saves).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.view_started = None
+        self.view_time = None
+        self.view_finished = None
+        self.serializer_started = None
+        self.serializer_db_time = 0.0
+        self.serializer_time = None
+        self.render_time = None
+        self.query_budget = None
+
+    def start_view(self):
+        self.view_started = time.perf_counter()
+
+    def start_serializer(self):
+        if self.serializer_started is None and self.view_finished is None:
+            self.serializer_started = time.perf_counter()
+            self.serializer_db_time = self.db_time
+
+    def finish_view(self, response):
+        now = self.view_finished = time.perf_counter()
+        self.view_time = now - self.view_started
+        if self.serializer_started is not None:
+            self.serializer_time = max(
+                now
+                - self.serializer_started
+                - (self.db_time - self.serializer_db_time),
+                0.0,
+            )
+        if hasattr(response, "add_post_render_callback"):
+            response.add_post_render_callback(self.finish_render)
+
+    def finish_render(self, response):
+        self.render_time = time.perf_counter() - self.view_finished
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def over_budget(self) -> bool:
+        return self.query_budget is not None and self.queries > self.query_budget
+
+    def metrics(self) -> dict:
+        """Milliseconds per span, None for the spans that did not happen."""
+        spans = {
+            "db": self.db_time,
+            "view": self.view_time,
+            "serializer": self.serializer_time,
+            "render": self.render_time,
+            "total": self.elapsed,
+        }
+        return {
+            name: None if value is None else round(value * 1000, 3)
+            for name, value in spans.items()
+        }
+
+
+def count_query(execute, sql, params, many, context):
+    """Execute wrapper adding every query to the timings of its request."""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_time += time.perf_counter() - started
+        timings.queries += 1
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """``connection_created`` receiver adding count_query to the connection.
+
+    Installed for good rather than with ``connection.execute_wrapper()`` in
+    the middleware: under ASGI the queries run on the connection of an
+    executor thread, which the middleware cannot reach. First in the list
+    so that the context manager popping its own wrapper does not take it.
+    """
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+def mark_serializer():
+    """Start the serializer span of the current request, if any."""
+    timings = current_timings.get()
+    if timings is not None:
+        timings.start_serializer()
+
+
+class ServerTimingMixin:
+    """Viewset side of ServerTimingMiddleware.
+
+    Marks the view, serializer and render spans and declares the number of
+    queries an action should need in ``query_budget``, either one number
+    for every action or a dict keyed by action.
+    """
+
+    query_budget = None
+
+    def get_query_budget(self):
+        if isinstance(self.query_budget, dict):
+            return self.query_budget.get(self.action)
+        return self.query_budget
+
+    def initial(self, request, *args, **kwargs):
+        timings = current_timings.get()
+        if timings is not None:
+            timings.start_view()
+        super().initial(request, *args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        mark_serializer()
+        # a plain ViewSet has none, but the schema generator asks for one
+        get_serializer = getattr(super(), "get_serializer", None)
+        if get_serializer is None:
+            return None
+        return get_serializer(*args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        timings = current_timings.get()
+        if timings is not None and timings.view_started is not None:
+            timings.query_budget = self.get_query_budget()
+            timings.finish_view(response)
+        return response
+
+
+class ServerTimingMiddleware:
+    """Report the timings of every request.
+
+    They go out as a Server-Timing header, into the /metrics histograms and
+    as one log line on the ``planetarium.timing`` logger, at WARNING when the
+    request ran more queries than the ``query_budget`` of its view.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.report(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.report(request, response, timings)
+
+    def report(self, request, response, timings):
+        record_request(request, response, timings)
+        metrics = timings.metrics()
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={metrics["db"]};desc="{timings.queries} queries"',
+                *(
+                    f"{name};dur={value}"
+                    for name, value in metrics.items()
+                    if name != "db" and value is not None
+                ),
+            ]
+        )
+
+        level = logging.WARNING if timings.over_budget else logging.INFO
+        if logger.isEnabledFor(level):
+            match = request.resolver_match
+            fields = {
+                "method": request.method,
+                "path": request.path,
+                "view": match.view_name if match else None,
+                "status": response.status_code,
+                "queries": timings.queries,
+                "query_budget": timings.query_budget,
+                **{f"{name}_ms": value for name, value in metrics.items()},
+            }
+            logger.log(
+                level,
+                " ".join(f"{name}={value}" for name, value in fields.items()),
+                extra={"timings": fields},
+            )
+        return response
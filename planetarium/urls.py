@@ -1,5 +1,7 @@
 from django.urls import path, include
 from rest_framework import routers
+
+from planetarium.async_views import AsyncReadView, AsyncSeatMapView
 from planetarium.views import (
     ShowThemeView,
     AstronomyShowViewSet,
@@ -7,6 +9,9 @@ from planetarium.views import (
     ShowSessionViewSet,
     ReservationViewSet,
     TicketViewSet,
+    SeatHoldViewSet,
+    ExportViewSet,
+    SalesReportViewSet,
 )
 
 
@@ -21,4 +26,59 @@ router.register("domes", PlanetariumDomeViewSet)
 router.register("show_sessions", ShowSessionViewSet)
 router.register("reservations", ReservationViewSet)
 router.register("tickets", TicketViewSet)
-urlpatterns = [path("", include(router.urls))]
+router.register("holds", SeatHoldViewSet)
+router.register("exports", ExportViewSet, basename="export")
+router.register("sales", SalesReportViewSet)
+
+# async twins of the catalog read routes, for ASGI deployments
+async_urlpatterns = [
+    path(
+        "themes/",
+        AsyncReadView.as_view(viewset=ShowThemeView),
+        name="async-showtheme-list",
+    ),
+    path(
+        "shows/",
+        AsyncReadView.as_view(viewset=AstronomyShowViewSet),
+        name="async-astronomyshow-list",
+    ),
+    path(
+        "shows/<int:pk>/",
+        AsyncReadView.as_view(viewset=AstronomyShowViewSet, action="retrieve"),
+        name="async-astronomyshow-detail",
+    ),
+    path(
+        "domes/",
+        AsyncReadView.as_view(viewset=PlanetariumDomeViewSet),
+        name="async-planetariumdome-list",
+    ),
+    path(
+        "domes/<int:pk>/",
+        AsyncReadView.as_view(viewset=PlanetariumDomeViewSet, action="retrieve"),
+        name="async-planetariumdome-detail",
+    ),
+    path(
+        "show_sessions/",
+        AsyncReadView.as_view(viewset=ShowSessionViewSet),
+        name="async-showsession-list",
+    ),
+    path(
+        "show_sessions/<int:pk>/",
+        AsyncReadView.as_view(
+            viewset=ShowSessionViewSet,
+            action="retrieve",
+            prefetch=("astronomy_show__theme",),
+        ),
+        name="async-showsession-detail",
+    ),
+    path(
+        "show_sessions/<int:pk>/seats/",
+        AsyncSeatMapView.as_view(viewset=ShowSessionViewSet),
+        name="async-showsession-seats",
+    ),
+]
+
+urlpatterns = [
+    path("async/", include(async_urlpatterns)),
+    path("", include(router.urls)),
+]
@@ -1,5 +1,16 @@
-from django.db.models import Count, F
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from datetime import datetime, time, timedelta
+
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import (
+    IsAuthenticated,
+    IsAdminUser,
+)
+from rest_framework.response import Response
 
 
 from planetarium.models import (
@@ -9,8 +20,23 @@ from planetarium.models import (
     ShowSession,
     Reservation,
     Ticket,
+    SeatHold,
+    DailySales,
 )
 
+from planetarium.booking import active_holds, release_hold, confirm_hold
+from planetarium.cache import CachedResponseMixin
+from planetarium.conditional import ConditionalGetMixin
+from planetarium.exports import EXPORTS, FORMATS, export_chunks
+from planetarium.fastpath import (
+    FastListMixin,
+    AstronomyShowListFastSerializer,
+    ShowSessionListFastSerializer,
+    TicketListFastSerializer,
+)
+from planetarium.fieldsets import DynamicFieldsViewMixin
+from planetarium.streaming import StreamingListMixin
+from planetarium.timing import ServerTimingMixin
 from planetarium.schemas import (
     ticket_schema,
     reservation_schema,
@@ -18,11 +44,15 @@ from planetarium.schemas import (
     pl_dome_schema,
     astronomy_show_schema,
     show_theme_schema,
+    seat_hold_schema,
+    export_schema,
+    sales_report_schema,
 )
 
-from rest_framework import viewsets, mixins
+from rest_framework import viewsets, mixins, status
 
-from planetarium.permissions import IsAdminOrReadOnly
+from planetarium.pagination import DailySalesPagination, ShowSessionPagination
+from planetarium.permissions import IsAdminOrReadOnly, IsTelegramService
 from planetarium.serializers import (
     ShowThemeSerializer,
     AstronomyShowSerializer,
@@ -38,11 +68,71 @@ from planetarium.serializers import (
     ReservationListSerializer,
     TicketListSerializer,
     TicketCreateSerializer,
+    TicketPurchaseSerializer,
+    SeatHoldSerializer,
+    DailySalesSerializer,
+    SalesTotalsSerializer,
+)
+from planetarium.reports import GROUPS, sales_totals
+from planetarium.search import get_search_backend
+from planetarium.seating import (
+    SeatMap,
+    load_seat_map,
+    occupied_seats_by_session,
+    sessions_with_free_block,
 )
 
 
+def positive_int_param(request, name, default=None):
+    value = request.query_params.get(name, default)
+    if value is None:
+        return None
+    if not str(value).isdigit() or int(value) < 1:
+        raise ValidationError({name: "Must be a positive integer."})
+    return int(value)
+
+
+def date_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Must be an ISO 8601 date (YYYY-MM-DD)."})
+    return parsed
+
+
+def datetime_param(request, name):
+    """Parse an ISO date or datetime query parameter into an aware datetime."""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = day and datetime.combine(day, time.min)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Must be an ISO 8601 date or datetime."})
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
 @show_theme_schema
 class ShowThemeView(
+    ServerTimingMixin,
+    ConditionalGetMixin,
+    CachedResponseMixin,
+    DynamicFieldsViewMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.DestroyModelMixin,
@@ -51,13 +141,28 @@ class ShowThemeView(
     queryset = ShowTheme.objects.all()
     serializer_class = ShowThemeSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    version_models = (ShowTheme,)
+    query_budget = {"list": 2}
 
 
 @astronomy_show_schema
-class AstronomyShowViewSet(viewsets.ModelViewSet):
+class AstronomyShowViewSet(
+    ServerTimingMixin,
+    ConditionalGetMixin,
+    CachedResponseMixin,
+    DynamicFieldsViewMixin,
+    FastListMixin,
+    viewsets.ModelViewSet,
+):
     queryset = AstronomyShow.objects.prefetch_related("theme")
     serializer_class = AstronomyShowSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    cache_actions = ("list", "retrieve", "search")
+    conditional_actions = ("list", "retrieve", "search")
+    version_models = (AstronomyShow, ShowTheme)
+    etag_timestamps = ("updated_at",)
+    fast_list_serializer = AstronomyShowListFastSerializer
+    query_budget = {"list": 3, "retrieve": 4, "search": 4}
 
     def get_queryset(self):
         show = self.request.query_params.get("show")
@@ -65,7 +170,7 @@ class AstronomyShowViewSet(viewsets.ModelViewSet):
         queryset = self.queryset
 
         if show:
-            queryset = queryset.filter(title__icontains=show)
+            queryset = get_search_backend().filter(queryset, show)
 
         return queryset
 
@@ -76,13 +181,37 @@ class AstronomyShowViewSet(viewsets.ModelViewSet):
         if self.action == "retrieve":
             return AstronomyShowRetrieveSerializer
 
+        if self.action == "search":
+            return AstronomyShowListSerializer
+
         return super().get_serializer_class()
 
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        query = request.query_params.get("q", "")
+        limit = min(positive_int_param(request, "limit", default=20), 100)
+
+        show_ids = get_search_backend().search(query, limit)
+        shows = self.queryset.in_bulk(show_ids)
+        serializer = self.get_serializer(
+            [shows[show_id] for show_id in show_ids if show_id in shows], many=True
+        )
+        return Response(serializer.data)
+
 
 @pl_dome_schema
-class PlanetariumDomeViewSet(viewsets.ModelViewSet):
+class PlanetariumDomeViewSet(
+    ServerTimingMixin,
+    ConditionalGetMixin,
+    CachedResponseMixin,
+    DynamicFieldsViewMixin,
+    viewsets.ModelViewSet,
+):
     queryset = PlanetariumDome.objects.all()
     serializer_class = PlanetariumDomeSerializer
+    version_models = (PlanetariumDome,)
+    etag_timestamps = ("updated_at",)
+    query_budget = {"list": 2, "retrieve": 3}
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -95,11 +224,36 @@ class PlanetariumDomeViewSet(viewsets.ModelViewSet):
 
 
 @show_session_schema
-class ShowSessionViewSet(viewsets.ModelViewSet):
+class ShowSessionViewSet(
+    ServerTimingMixin,
+    ConditionalGetMixin,
+    CachedResponseMixin,
+    DynamicFieldsViewMixin,
+    FastListMixin,
+    viewsets.ModelViewSet,
+):
     queryset = ShowSession.objects.select_related("astronomy_show",
                                                   "planetarium_dome")
     serializer_class = ShowSessionSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    pagination_class = ShowSessionPagination
+    cache_actions = ("list",)
+    version_models = (ShowSession, AstronomyShow, PlanetariumDome, ShowTheme)
+    etag_timestamps = (
+        "updated_at",
+        "astronomy_show__updated_at",
+        "planetarium_dome__updated_at",
+    )
+    # the list hides sessions that already started
+    etag_ttl = 60
+    fast_list_serializer = ShowSessionListFastSerializer
+    query_budget = {
+        "list": 2,
+        "retrieve": 4,
+        "seats": 3,
+        "suggest": 3,
+        "adjacent_seats": 2,
+    }
 
     def get_queryset(self):
         show = self.request.query_params.get("astronomy_show")
@@ -108,10 +262,48 @@ class ShowSessionViewSet(viewsets.ModelViewSet):
         queryset = self.queryset
 
         if show:
-            queryset = queryset.filter(astronomy_show__title__icontains=show)
+            queryset = queryset.filter(
+                astronomy_show__in=get_search_backend()
+                .filter(AstronomyShow.objects.all(), show)
+                .values("id")
+            )
         if dome:
             queryset = queryset.filter(planetarium_dome__name__icontains=dome)
 
+        available = self.request.query_params.get("available")
+        min_free = self.request.query_params.get("min_free")
+
+        if available in ("true", "1"):
+            queryset = queryset.filter(tickets_available__gt=0)
+        elif available in ("false", "0"):
+            queryset = queryset.filter(tickets_available__lte=0)
+        if min_free:
+            queryset = queryset.filter(
+                tickets_available__gte=positive_int_param(self.request, "min_free")
+            )
+
+        show_id = positive_int_param(self.request, "show_id")
+        dome_id = positive_int_param(self.request, "dome_id")
+
+        if show_id:
+            queryset = queryset.filter(astronomy_show_id=show_id)
+        if dome_id:
+            queryset = queryset.filter(planetarium_dome_id=dome_id)
+
+        start = datetime_param(self.request, "from")
+        end = datetime_param(self.request, "to")
+        day = date_param(self.request, "date")
+
+        if day:
+            start = timezone.make_aware(datetime.combine(day, time.min))
+            end = start + timedelta(days=1)
+        if start is None and end is None and self.action == "list":
+            start = timezone.now()
+        if start:
+            queryset = queryset.filter(show_time__gte=start)
+        if end:
+            queryset = queryset.filter(show_time__lt=end)
+
         return queryset
 
     def get_serializer_class(self):
@@ -122,9 +314,76 @@ class ShowSessionViewSet(viewsets.ModelViewSet):
 
         return super().get_serializer_class()
 
+    @action(detail=True, methods=["get"])
+    def seats(self, request, pk=None):
+        encoding = request.query_params.get("encoding", "bitset")
+        if encoding not in SeatMap.ENCODINGS:
+            raise ValidationError(
+                {"encoding": f"Must be one of: {', '.join(SeatMap.ENCODINGS)}"}
+            )
+
+        if not pk.isdigit():
+            raise Http404
+        seat_map = load_seat_map(int(pk))
+        if seat_map is None:
+            raise Http404
+
+        return Response(seat_map.to_representation(int(pk), encoding))
+
+    @action(detail=True, methods=["get"])
+    def suggest(self, request, pk=None):
+        count = positive_int_param(request, "count", default=1)
+
+        if not pk.isdigit():
+            raise Http404
+        seat_map = load_seat_map(int(pk))
+        if seat_map is None:
+            raise Http404
+
+        seats = seat_map.find_block(count)
+        return Response(
+            {
+                "show_session": int(pk),
+                "count": count,
+                "seats": [[row, seat] for row, seat in seats or []],
+            }
+        )
+
+    @action(detail=False, methods=["get"])
+    def adjacent_seats(self, request):
+        count = positive_int_param(request, "count")
+        if count is None:
+            raise ValidationError({"count": "This parameter is required."})
+        start = datetime_param(request, "from") or timezone.now()
+        end = datetime_param(request, "to") or start + timedelta(days=14)
+
+        queryset = self.get_queryset().filter(
+            show_time__gte=start, show_time__lt=end, tickets_available__gte=count
+        )
+
+        sessions = list(queryset)
+        layout = [
+            (
+                session.id,
+                session.planetarium_dome.rows,
+                session.planetarium_dome.seats_in_row,
+            )
+            for session in sessions
+        ]
+        matching = sessions_with_free_block(
+            layout, occupied_seats_by_session(queryset.values("id")), count
+        )
+        serializer = ShowSessionListSerializer(
+            [session for session in sessions if session.id in matching], many=True
+        )
+        return Response(serializer.data)
+
 
 @reservation_schema
 class ReservationViewSet(
+    ServerTimingMixin,
+    ConditionalGetMixin,
+    StreamingListMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.DestroyModelMixin,
@@ -132,15 +391,41 @@ class ReservationViewSet(
 ):
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
-    permission_classes = [
-        IsAuthenticated,
-    ]
+    version_models = (
+        Reservation,
+        Ticket,
+        ShowSession,
+        AstronomyShow,
+        PlanetariumDome,
+    )
+    etag_per_user = True
+    permission_classes = [IsAuthenticated | IsTelegramService]
+    query_budget = {"list": 3, "create": 2}
 
     def get_queryset(self):
+        queryset = self.queryset
+        if self.action == "list":
+            queryset = queryset.select_related("user").prefetch_related(
+                Prefetch(
+                    "tickets",
+                    queryset=Ticket.objects.select_related(
+                        "show_session__astronomy_show",
+                        "show_session__planetarium_dome",
+                    ),
+                )
+            )
+
         user = self.request.user
-        if user.is_staff:
-            return Reservation.objects.all()
-        return Reservation.objects.filter(user=user)
+        if user.is_authenticated:
+            if user.is_staff:
+                return queryset
+            return queryset.filter(user=user)
+
+        # the telegram bot, allowed in by IsTelegramService
+        telegram_username = self.request.query_params.get("telegram_username")
+        if not telegram_username:
+            return queryset.none()
+        return queryset.filter(user__telegram_username=telegram_username)
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -149,47 +434,182 @@ class ReservationViewSet(
 
 
 @ticket_schema
-class TicketViewSet(viewsets.ModelViewSet):
-    queryset = (
-        Ticket.objects.select_related(
-            "show_session__planetarium_dome",
-            "show_session__astronomy_show",
-            "reservation__user",
-        )
-        .prefetch_related("show_session__astronomy_show__theme")
-        .annotate(
-            ticket_count=Count("reservation__tickets"),
-            total_price=F("show_session__planetarium_dome__price_per_seat")
-            * Count("reservation__tickets"),
-        )
+class TicketViewSet(
+    ServerTimingMixin,
+    ConditionalGetMixin,
+    StreamingListMixin,
+    FastListMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Ticket.objects.select_related(
+        "show_session__planetarium_dome",
+        "show_session__astronomy_show",
+        "reservation__user",
+    ).prefetch_related("show_session__astronomy_show__theme")
+    version_models = (
+        Reservation,
+        Ticket,
+        ShowSession,
+        AstronomyShow,
+        PlanetariumDome,
     )
-
-    def get_permissions(self):
-        if self.request.query_params.get("telegram_username", None):
-            self.permission_classes = [AllowAny]
-        else:
-            self.permission_classes = [IsAuthenticated]
-        return super().get_permissions()
+    etag_per_user = True
+    fast_list_serializer = TicketListFastSerializer
+    query_budget = {"list": 2, "purchase": 13}
+    permission_classes = [IsAuthenticated | IsTelegramService]
 
     def get_queryset(self):
-        telegram_username = self.request.query_params.get("telegram_username", None)
         queryset = self.queryset
 
-        if telegram_username:
-            return queryset.filter(
-                reservation__user__telegram_username=telegram_username
-            ).select_related("show_session", "reservation")
-
         user = self.request.user
-        if user.is_staff:
-            return queryset
-        return queryset.filter(reservation__user=user).select_related(
-            "show_session", "reservation"
-        )
+        if user.is_authenticated:
+            if user.is_staff:
+                return queryset
+            return queryset.filter(reservation__user=user)
+
+        # the telegram bot, allowed in by IsTelegramService
+        telegram_username = self.request.query_params.get("telegram_username")
+        if not telegram_username:
+            return queryset.none()
+        return queryset.filter(reservation__user__telegram_username=telegram_username)
 
     def get_serializer_class(self):
         if self.action == "list":
             return TicketListSerializer
         if self.action == "create":
             return TicketCreateSerializer
+        if self.action == "purchase":
+            return TicketPurchaseSerializer
         return super().get_serializer_class()
+
+    @action(detail=False, methods=["post"])
+    def purchase(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+@seat_hold_schema
+class SeatHoldViewSet(
+    ServerTimingMixin,
+    ConditionalGetMixin,
+    mixins.CreateModelMixin,
+    viewsets.GenericViewSet,
+):
+    queryset = SeatHold.objects.all()
+    serializer_class = SeatHoldSerializer
+    permission_classes = (IsAuthenticated,)
+    lookup_field = "token"
+    conditional_actions = ("list",)
+    version_models = (SeatHold,)
+    etag_per_user = True
+    # holds expire without a write
+    etag_ttl = 60
+    query_budget = {"list": 2, "create": 8, "confirm": 13}
+
+    def get_queryset(self):
+        return self.queryset.filter(
+            user=self.request.user, expires_at__gt=timezone.now()
+        )
+
+    def get_serializer_class(self):
+        if self.action == "confirm":
+            return TicketPurchaseSerializer
+        return super().get_serializer_class()
+
+    def list(self, request):
+        serializer = self.get_serializer(active_holds(request.user), many=True)
+        return Response(serializer.data)
+
+    def destroy(self, request, token=None):
+        if not release_hold(request.user, token):
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=["post"])
+    def confirm(self, request, token=None):
+        purchase = confirm_hold(request.user, token)
+        serializer = self.get_serializer(purchase)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+@export_schema
+class ExportViewSet(ServerTimingMixin, viewsets.ViewSet):
+    """Streaming CSV/NDJSON exports of sales data for staff."""
+
+    permission_classes = (IsAdminUser,)
+    lookup_value_regex = "[a-z_]+"
+
+    def list(self, request):
+        return Response(sorted(EXPORTS))
+
+    def retrieve(self, request, pk=None):
+        if pk not in EXPORTS:
+            raise Http404
+        export_format = request.query_params.get("type", "csv")
+        if export_format not in FORMATS:
+            raise ValidationError({"type": f"Must be one of: {', '.join(FORMATS)}."})
+        compress = request.query_params.get("gzip", "").lower() in ("1", "true")
+
+        chunks = export_chunks(
+            pk,
+            export_format,
+            compress,
+            start=datetime_param(request, "from"),
+            end=datetime_param(request, "to"),
+            dome_id=positive_int_param(request, "dome_id"),
+        )
+        filename = f"{pk}.{export_format}"
+        content_type = FORMATS[export_format]
+        if compress:
+            filename += ".gz"
+            content_type = "application/gzip"
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+@sales_report_schema
+class SalesReportViewSet(
+    ServerTimingMixin,
+    ConditionalGetMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Daily sales summaries for staff dashboards, read from DailySales only."""
+
+    queryset = DailySales.objects.select_related("astronomy_show", "planetarium_dome")
+    serializer_class = DailySalesSerializer
+    permission_classes = (IsAdminUser,)
+    pagination_class = DailySalesPagination
+    conditional_actions = ("list", "totals")
+    version_models = (DailySales, AstronomyShow, PlanetariumDome)
+    query_budget = {"list": 2, "totals": 2}
+
+    def get_queryset(self):
+        queryset = self.queryset
+        start = date_param(self.request, "from")
+        end = date_param(self.request, "to")
+        show_id = positive_int_param(self.request, "show_id")
+        dome_id = positive_int_param(self.request, "dome_id")
+
+        if start:
+            queryset = queryset.filter(day__gte=start)
+        if end:
+            queryset = queryset.filter(day__lte=end)
+        if show_id:
+            queryset = queryset.filter(astronomy_show_id=show_id)
+        if dome_id:
+            queryset = queryset.filter(planetarium_dome_id=dome_id)
+        return queryset
+
+    @action(detail=False)
+    def totals(self, request):
+        group = request.query_params.get("group", "show")
+        if group not in GROUPS:
+            raise ValidationError({"group": f"Must be one of: {', '.join(GROUPS)}."})
+        serializer = SalesTotalsSerializer(
+            sales_totals(self.get_queryset(), group), many=True
+        )
+        return Response(serializer.data)
@@ -30,8 +30,30 @@ THEMES_URL = f'{DOCKER_HOST}/api/planetarium/themes/'
 SESSIONS_URL = f'{DOCKER_HOST}/api/planetarium/show_sessions/'
 ASTRO_SHOWS_URL = f'{DOCKER_HOST}/api/planetarium/shows/'
 TICKETS_URL = f'{DOCKER_HOST}/api/planetarium/tickets/'
+RESERVATIONS_URL = f'{DOCKER_HOST}/api/planetarium/reservations/'
 DOMES_URL = f'{DOCKER_HOST}/api/planetarium/domes/'
 
+# sent with reservation reads, must match TG_SERVICE_TOKEN of the API
+SERVICE_HEADERS = {'X-Service-Token': config('TG_SERVICE_TOKEN', default='')}
+
+# list endpoints are cursor-paginated, follow `next` up to MAX_PAGES pages
+PAGE_LIMIT = 50
+MAX_PAGES = 20
+
+
+def fetch_all(url, params=None, headers=None):
+    results = []
+    params = {**(params or {}), 'limit': PAGE_LIMIT}
+    for _ in range(MAX_PAGES):
+        response = requests.get(url, params=params, headers=headers)
+        response.raise_for_status()
+        page = response.json()
+        results.extend(page['results'])
+        url, params = page['next'], None
+        if not url:
+            break
+    return results
+
 
 def build_menu():
     return [
@@ -57,17 +79,16 @@ async def menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
 async def handle_list_sessions():
     try:
-        response = requests.get(SESSIONS_URL)
-        response.raise_for_status()
-        sessions = response.json()
+        sessions = fetch_all(SESSIONS_URL)
 
         if isinstance(sessions, list):
             session_list = ''
             for session in sessions:
                 session_list += (
                     f"Session ID: {session['id']}\n"
-                    f"Show ID: {session['show']}\n"
-                    f"Date and Time: {session['date_time']}\n\n"
+                    f"Show: {session['astronomy_show']}\n"
+                    f"Dome: {session['planetarium_dome']}\n"
+                    f"Date and Time: {session['show_time']}\n\n"
                 )
             return f"List of available sessions:\n{session_list}" if session_list else "Sessions not found"
         else:
@@ -78,9 +99,7 @@ async def handle_list_sessions():
 
 async def handle_list_astronomy_shows():
     try:
-        response = requests.get(ASTRO_SHOWS_URL)
-        response.raise_for_status()
-        shows = response.json()
+        shows = fetch_all(ASTRO_SHOWS_URL)
 
         if isinstance(shows, list):
             show_list = ''
@@ -101,9 +120,7 @@ async def handle_list_astronomy_shows():
 
 async def handle_list_themes():
     try:
-        response = requests.get(THEMES_URL)
-        response.raise_for_status()
-        themes = response.json()
+        themes = fetch_all(THEMES_URL)
 
         if isinstance(themes, list):
             theme_list = ''
@@ -118,9 +135,7 @@ async def handle_list_themes():
 
 async def handle_list_domes():
     try:
-        response = requests.get(DOMES_URL)
-        response.raise_for_status()
-        domes = response.json()
+        domes = fetch_all(DOMES_URL)
 
         if isinstance(domes, list):
             dome_list = ''
@@ -166,22 +181,22 @@ async def button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
 async def show_tickets(update: Update, context: ContextTypes.DEFAULT_TYPE, telegram_username: str) -> None:
     try:
-        response = requests.get(TICKETS_URL, params={'telegram_username': telegram_username})
-        response.raise_for_status()
-        tickets = response.json()
+        reservations = fetch_all(
+            RESERVATIONS_URL, params={'telegram_username': telegram_username}, headers=SERVICE_HEADERS
+        )
 
-        if isinstance(tickets, list) and tickets:
+        if isinstance(reservations, list) and reservations:
             ticket_list = ''
-            for ticket in tickets:
-                reservation_info = ticket.get('reservation_info', {})
-                ticket_list += (
-                    f"Ticket ID: {ticket['id']}\n"
-                    f"Row: {ticket['row']}\n"
-                    f"Seat: {ticket['seat']}\n"
-                    f"Show Session: {ticket['show_session_info']}\n"
-                    f"Reservation Created At: {reservation_info.get('created_at', 'N/A')}\n"
-                    f"---\n"
-                )
+            for reservation in reservations:
+                for ticket in reservation.get('tickets', []):
+                    ticket_list += (
+                        f"Ticket ID: {ticket['id']}\n"
+                        f"Row: {ticket['row']}\n"
+                        f"Seat: {ticket['seat']}\n"
+                        f"Show Session: {ticket['show_session_info']}\n"
+                        f"Reservation Created At: {reservation.get('created_at', 'N/A')}\n"
+                        f"---\n"
+                    )
             message = f"Your tickets:\n{ticket_list}" if ticket_list else "You have no purchased tickets"
         else:
             message = "You have no purchased tickets"
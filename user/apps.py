@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "user"
+
+    def ready(self):
+        from django.contrib.auth.signals import user_login_failed
+
+        from user.login_attempts import count_login_failure
+
+        user_login_failed.connect(count_login_failure, dispatch_uid="login_failures")
@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+FAILURE_PREFIX = "user:login_failures"
+# failures kept per key, enough for the backoff to reach LOGIN_LOCKOUT_MAX
+MAX_TRACKED = 32
+
+
+class LocalFailureStore:
+    """Failure timestamps per key in a bounded in-process LRU.
+
+    At most ``max_keys`` keys are kept, so a flood of distinct usernames
+    evicts the oldest entries instead of growing the process.
+    """
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, since) -> list:
+        with self.lock:
+            return [stamp for stamp in self.entries.get(key, ()) if stamp > since]
+
+    def add(self, key, now, since) -> list:
+        with self.lock:
+            stamps = [stamp for stamp in self.entries.pop(key, ()) if stamp > since]
+            stamps = [*stamps, now][-MAX_TRACKED:]
+            self.entries[key] = stamps
+            while len(self.entries) > self.max_keys:
+                self.entries.popitem(last=False)
+            return stamps
+
+    def clear(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+class CacheFailureStore:
+    """Failure timestamps per key in a cache shared by every process."""
+
+    def __init__(self, alias, window):
+        self.cache = caches[alias]
+        self.window = window
+
+    @staticmethod
+    def cache_key(key) -> str:
+        return f"{FAILURE_PREFIX}:{hashlib.sha1(key.encode()).hexdigest()}"
+
+    def get(self, key, since) -> list:
+        stamps = self.cache.get(self.cache_key(key), ())
+        return [stamp for stamp in stamps if stamp > since]
+
+    def add(self, key, now, since) -> list:
+        stamps = [*self.get(key, since), now][-MAX_TRACKED:]
+        self.cache.set(self.cache_key(key), stamps, self.window)
+        return stamps
+
+    def clear(self, key):
+        self.cache.delete(self.cache_key(key))
+
+
+_local_store = None
+
+
+def get_store():
+    global _local_store
+
+    alias = getattr(settings, "LOGIN_FAILURE_CACHE_ALIAS", None)
+    if alias:
+        return CacheFailureStore(alias, settings.LOGIN_FAILURE_WINDOW)
+    if _local_store is None:
+        _local_store = LocalFailureStore(settings.LOGIN_FAILURE_MAX_KEYS)
+    return _local_store
+
+
+def client_ident(request) -> str:
+    return BaseThrottle().get_ident(request) or ""
+
+
+def failure_keys(username, request) -> list:
+    """One counter per account and one per client address."""
+    keys = []
+    if username:
+        keys.append(f"user:{username.strip().lower()}")
+    if request is not None:
+        keys.append(f"ip:{client_ident(request)}")
+    return keys
+
+
+def lockout_remaining(stamps, now) -> float:
+    """Seconds left before the owner of ``stamps`` may try again.
+
+    Every failure past LOGIN_FAILURE_LIMIT within the window doubles the
+    lockout, starting at LOGIN_LOCKOUT_BASE and capped at LOGIN_LOCKOUT_MAX.
+    """
+    excess = len(stamps) - settings.LOGIN_FAILURE_LIMIT
+    if excess < 0:
+        return 0
+    lockout = min(settings.LOGIN_LOCKOUT_BASE * 2**excess, settings.LOGIN_LOCKOUT_MAX)
+    return max(stamps[-1] + lockout - now, 0)
+
+
+def record_failure(username, request):
+    now = time.time()
+    since = now - settings.LOGIN_FAILURE_WINDOW
+    store = get_store()
+    for key in failure_keys(username, request):
+        failures = len(store.add(key, now, since))
+        if failures == settings.LOGIN_FAILURE_LIMIT:
+            logger.warning("%s has failed to log in %d times.", key, failures)
+
+
+def reset_failures(username):
+    for key in failure_keys(username, None):
+        get_store().clear(key)
+
+
+def retry_after(username, request) -> float:
+    """Longest lockout among the counters of ``username`` and ``request``."""
+    now = time.time()
+    since = now - settings.LOGIN_FAILURE_WINDOW
+    store = get_store()
+    return max(
+        (
+            lockout_remaining(store.get(key, since), now)
+            for key in failure_keys(username, request)
+        ),
+        default=0,
+    )
+
+
+def count_login_failure(sender, credentials, request=None, **kwargs):
+    """``user_login_failed`` receiver."""
+    record_failure(credentials.get(get_user_model().USERNAME_FIELD), request)
+
+
+class LoginFailureThrottle(BaseThrottle):
+    """Refuse login attempts of a locked out account or client address.
+
+    Locked out attempts never reach the password hasher.
+    """
+
+    def allow_request(self, request, view):
+        username = None
+        if isinstance(request.data, Mapping):
+            username = request.data.get(get_user_model().USERNAME_FIELD)
+        if not isinstance(username, str):
+            username = None
+        self.remaining = retry_after(username, request)
+        return not self.remaining
+
+    def wait(self):
+        return self.remaining
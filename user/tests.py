@@ -1 +1,81 @@
-from django.test import TestCase
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import login_attempts
+from user.login_attempts import LocalFailureStore, lockout_remaining
+
+
+@override_settings(LOGIN_FAILURE_LIMIT=3, LOGIN_LOCKOUT_BASE=30, LOGIN_LOCKOUT_MAX=120)
+class LoginFailureTestCase(TestCase):
+    def setUp(self):
+        login_attempts._local_store = None
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse("user:token_obtain_pair")
+        get_user_model().objects.create_user(email="user@user.com", password="secret")
+
+    def login(self, password, email="user@user.com", address="10.0.0.1"):
+        return self.client.post(
+            self.url, {"email": email, "password": password}, REMOTE_ADDR=address
+        )
+
+    def test_account_is_locked_out_after_repeated_failures(self):
+        for _ in range(3):
+            response = self.login("wrong")
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.login("secret", address="10.0.0.2")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "30")
+
+    def test_client_address_is_locked_out_across_accounts(self):
+        for number in range(3):
+            self.login("wrong", email=f"guess{number}@user.com")
+        response = self.login("secret")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        response = self.login("secret", address="10.0.0.2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_success_clears_account_failures(self):
+        self.login("wrong")
+        self.login("wrong")
+        self.assertEqual(self.login("secret").status_code, status.HTTP_200_OK)
+        self.login("wrong", address="10.0.0.2")
+        response = self.login("secret", address="10.0.0.3")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_password_is_checked_once_per_attempt(self):
+        with mock.patch.object(
+            get_user_model(), "check_password", autospec=True, return_value=False
+        ) as check_password:
+            self.login("wrong")
+        self.assertEqual(check_password.call_count, 1)
+
+    @override_settings(LOGIN_FAILURE_CACHE_ALIAS="default")
+    def test_shared_cache_store(self):
+        for _ in range(3):
+            self.login("wrong")
+        self.assertIsNone(login_attempts._local_store)
+        response = self.login("secret", address="10.0.0.2")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        self.assertEqual(lockout_remaining([1, 2], 2), 0)
+        self.assertEqual(lockout_remaining([1, 2, 3], 3), 30)
+        self.assertEqual(lockout_remaining([1, 2, 3, 4], 4), 60)
+        self.assertEqual(lockout_remaining([1, 2, 3, 4, 5, 6], 6), 120)
+        self.assertEqual(lockout_remaining([1, 2, 3], 50), 0)
+
+    def test_local_store_is_bounded(self):
+        store = LocalFailureStore(max_keys=2)
+        for key in ("a", "b", "c"):
+            store.add(key, now=10, since=0)
+        self.assertEqual(store.get("a", since=0), [])
+        self.assertEqual(store.get("c", since=0), [10])
+        self.assertEqual(store.get("c", since=10), [])
@@ -1,8 +1,11 @@
+from django.contrib.auth import get_user_model
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from rest_framework_simplejwt.views import TokenObtainPairView
 
+from user.login_attempts import LoginFailureThrottle, reset_failures
 from user.serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -15,6 +18,22 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
 
 
+class LoginTokenObtainPairView(TokenObtainPairView):
+    """Token pair login refusing locked out accounts and client addresses.
+
+    Failures are counted by the ``user_login_failed`` receiver, a success
+    clears the failures of the account.
+    """
+
+    def get_throttles(self):
+        return [*super().get_throttles(), LoginFailureThrottle()]
+
+    def post(self, request, *args, **kwargs):
+        response = super().post(request, *args, **kwargs)
+        reset_failures(request.data.get(get_user_model().USERNAME_FIELD))
+        return response
+
+
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticated,)